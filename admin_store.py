@@ -0,0 +1,164 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+ADMIN_DB = "database/admin.db"
+POOL_SIZE = 5
+USER_CACHE_TTL = 300  # seconds
+
+class ConnectionPool:
+    """Thread-safe pool of SQLite connections that are opened once and reused"""
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+        self.available = threading.Semaphore(size)
+        self.data_versions = {}  # connection -> PRAGMA data_version when it last checked
+
+    def _open(self):
+        # Each connection is only ever used by one thread at a time
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    @contextmanager
+    def connection(self):
+        self.available.acquire()
+        try:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                conn = self._open()
+                with self.lock:
+                    self.created += 1
+            try:
+                yield conn
+            except Exception:
+                # A connection that failed mid-use is not handed out again
+                self._discard(conn)
+                raise
+            self.idle.put(conn)
+        finally:
+            self.available.release()
+
+    def _discard(self, conn):
+        conn.close()
+        with self.lock:
+            self.created -= 1
+            self.data_versions.pop(conn, None)
+
+    def changed(self, conn):
+        """
+        True if another connection, in this process or any other, has
+        committed to the database since conn last checked (or conn is new)
+        """
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        with self.lock:
+            changed = self.data_versions.get(conn) != version
+            self.data_versions[conn] = version
+        return changed
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self.idle.get_nowait())
+            except queue.Empty:
+                break
+
+class TTLCache:
+    """Small thread-safe cache whose entries expire after ttl seconds"""
+
+    def __init__(self, ttl=USER_CACHE_TTL):
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return (hit, value)"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return False, None
+            return True, value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+pool = ConnectionPool(ADMIN_DB)
+admin_cache = TTLCache()
+
+def _cached_admin(column, value):
+    """
+    Admin row (or None) by column, served from the cache when possible
+
+    manage_admins.py and other tools change admin.db from their own
+    processes, so the whole cache is dropped whenever anyone else has
+    committed since this connection last looked.
+    """
+    key = (column, str(value))
+    with pool.connection() as conn:
+        if pool.changed(conn):
+            admin_cache.clear()
+        hit, admin = admin_cache.get(key)
+        if not hit:
+            admin = conn.execute(f"SELECT * FROM admins WHERE {column} = ?", (value,)).fetchone()
+            admin_cache.set(key, admin)
+    return admin
+
+def get_admin_by_id(admin_id):
+    """Admin row by id, served from the cache when possible"""
+    return _cached_admin("id", admin_id)
+
+def get_admin_by_username(username):
+    """Admin row by username, served from the cache when possible"""
+    return _cached_admin("username", username)
+
+def invalidate_admin(admin_id=None, username=None):
+    """Drop cached entries for an admin after it changes"""
+    if admin_id is not None:
+        hit, admin = admin_cache.get(("id", str(admin_id)))
+        if hit and admin:
+            admin_cache.invalidate(("username", admin[1]))
+        admin_cache.invalidate(("id", str(admin_id)))
+    if username is not None:
+        hit, admin = admin_cache.get(("username", username))
+        if hit and admin:
+            admin_cache.invalidate(("id", str(admin[0])))
+        admin_cache.invalidate(("username", username))
+
+def get_all_admins():
+    with pool.connection() as conn:
+        return conn.execute("SELECT id, username FROM admins").fetchall()
+
+def add_admin(username, password_hash):
+    with pool.connection() as conn:
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO admins (username, password_hash) VALUES (?, ?)", (username, password_hash)
+            )
+    # A failed login may have cached this username as missing
+    invalidate_admin(admin_id=cursor.lastrowid, username=username)
+    return cursor.lastrowid
+
+def delete_admin(admin_id):
+    with pool.connection() as conn:
+        row = conn.execute("SELECT username FROM admins WHERE id = ?", (admin_id,)).fetchone()
+        with conn:
+            conn.execute("DELETE FROM admins WHERE id = ?", (admin_id,))
+    invalidate_admin(admin_id=admin_id, username=row[0] if row else None)
@@ -1,11 +1,23 @@
-from flask import Flask, render_template, redirect, url_for, request, flash, session
+from flask import Flask, render_template, redirect, url_for, request, flash, session, Response, stream_with_context, make_response, jsonify, send_file, g
 from flask_login import LoginManager, UserMixin, login_user, login_required, current_user, logout_user
 from werkzeug.security import check_password_hash
-import sqlite3
-import pandas as pd
-import plotly.graph_objects as go
+import plotly  # Just the version; plotly.graph_objects loads on first use or in the prewarm below
 import subprocess
 import os
+import json
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from export_reports import stream_sales_history
+from log_aggregator import AccessLogAggregator
+from rollup_logs import fetch_rollup_totals, prepare_rollups
+from admin_store import get_admin_by_id, get_admin_by_username
+from export_jobs import ExportJobManager
+import metrics
+import prewarm
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'  # Change this to a strong secret key
@@ -14,6 +26,33 @@ login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = "login"  # Redirects to login page if user is not authenticated
 
+# Per-route latency for every request, exposed with the other metrics at /metrics
+if metrics.ENABLED:
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_time(response):
+        started = g.pop("request_started", None)
+        if started is not None:
+            metrics.histogram("app_request_seconds", "Flask request latency by route").observe(
+                time.perf_counter() - started,
+                endpoint=request.endpoint or "unmatched", method=request.method, status=response.status_code
+            )
+        return response
+
+# Scrapers that cannot log in send "Authorization: Bearer <METRICS_TOKEN>" instead
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+@app.route("/metrics")
+def prometheus_metrics():
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not (METRICS_TOKEN and hmac.compare_digest(token, METRICS_TOKEN)) and not current_user.is_authenticated:
+        return login_manager.unauthorized()
+    # Prometheus text format: this process plus the textfiles from the generator and dashboard
+    return Response(metrics.render_all(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Define the User class
 class User(UserMixin):
     def __init__(self, id, username, password_hash):
@@ -23,23 +62,15 @@ class User(UserMixin):
 
 @login_manager.user_loader
 def load_user(user_id):
-    conn = sqlite3.connect('database/admin.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM admins WHERE id = ?", (user_id,))
-    user = cursor.fetchone()
-    conn.close()
+    # Cached with a TTL and read through the pooled admin.db connections
+    user = get_admin_by_id(user_id)
     if user:
         return User(user[0], user[1], user[2])
     return None
 
 # Function to get admin details
 def get_admin(username):
-    conn = sqlite3.connect("database/admin.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM admins WHERE username = ?", (username,))
-    admin = cursor.fetchone()
-    conn.close()
-    return admin
+    return get_admin_by_username(username)
 
 # Root route redirects to login
 @app.route("/")
@@ -77,33 +108,73 @@ def logout():
     logout_user()
     return redirect(url_for("login"))
 
-# Function to fetch dashboard data
-def fetch_data_for_dashboard():
-    logs = pd.read_csv('synthetic_logs.csv')
+# Shared across requests so the log is only ever read once
+log_aggregator = AccessLogAggregator('synthetic_logs.csv')
 
-    total_requests = len(logs)
-    unique_visitors = logs["IP Address"].nunique()
-    
-    # Status Code Counts
-    status_counts = logs["Status Code"].value_counts().to_dict()
-    
-    # Top 5 Endpoints by Request Count
-    endpoint_counts = logs["Endpoint"].value_counts().head(5).to_dict()
+# Time ranges offered on the dashboard
+DASHBOARD_RANGES = {
+    "1h": timedelta(hours=1),
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+    "all": None
+}
+
+# Created once per worker rather than checked on every /dashboard request
+prepare_rollups()
+
+# Function to fetch dashboard data
+@metrics.timed("app_fetch_dashboard_data_seconds", "Time to gather the /dashboard data")
+def fetch_data_for_dashboard(time_range="all"):
+    span = DASHBOARD_RANGES.get(time_range)
+    start = datetime.now() - span if span else None
 
-    data = {
-        "total_requests": total_requests,
-        "unique_visitors": unique_visitors,
-        "status_counts": status_counts,
-        "top_endpoints": endpoint_counts
-    }
+    # Totals, status code counts and top 5 endpoints summed from the rollup buckets,
+    # unique visitors from their merged HyperLogLog sketches
+    data = fetch_rollup_totals(start)
+    if data is None:
+        # Nothing rolled up yet - fall back to tailing the raw log file
+        metrics.count("app_dashboard_data_source_total", help="Where /dashboard data was read from", source="log_file")
+        return log_aggregator.snapshot()
 
+    metrics.count("app_dashboard_data_source_total", help="Where /dashboard data was read from", source="rollups")
     return data
 
-# Dashboard Route
-@app.route("/dashboard")
-@login_required
-def dashboard():
-    data = fetch_data_for_dashboard()
+# plotly.js is served once as a versioned, long-lived asset instead of
+# being inlined into every chart
+PLOTLY_JS_URL = f"/assets/plotly-{plotly.__version__}.min.js"
+_plotly_js = None
+
+def load_plotly_js():
+    global _plotly_js
+    if _plotly_js is None:
+        import plotly.offline
+        _plotly_js = plotly.offline.get_plotlyjs()
+    return _plotly_js
+
+@app.route("/assets/plotly-<version>.min.js")
+def plotly_js(version):
+    response = Response(load_plotly_js(), mimetype="application/javascript")
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    response.set_etag(plotly.__version__)
+    return response.make_conditional(request)
+
+# Rendered chart HTML keyed by a hash of the data behind it
+CHART_CACHE_SIZE = 32
+chart_cache = OrderedDict()
+chart_cache_lock = threading.Lock()
+
+def dashboard_digest(data):
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def render_dashboard_charts(data, digest):
+    """Build the dashboard charts, reusing the HTML when the data has not changed"""
+    with chart_cache_lock:
+        if digest in chart_cache:
+            chart_cache.move_to_end(digest)
+            return chart_cache[digest]
+
+    import plotly.graph_objects as go
 
     # Bar Chart for Status Code Distribution
     status_fig = go.Figure([go.Bar(
@@ -111,21 +182,137 @@ def dashboard():
         y=list(data["status_counts"].values()),
         marker_color="blue"
     )])
-    status_chart = status_fig.to_html(full_html=False)
+    status_chart = status_fig.to_html(full_html=False, include_plotlyjs=PLOTLY_JS_URL)
 
     # Pie Chart for Top 5 Endpoints
     endpoint_fig = go.Figure([go.Pie(
         labels=list(data["top_endpoints"].keys()),
         values=list(data["top_endpoints"].values())
     )])
-    endpoint_chart = endpoint_fig.to_html(full_html=False)
+    if data.get("top_endpoints_error"):
+        # Counts come from fixed-size summaries and may overstate by up to this much
+        endpoint_fig.update_layout(title_text=f"Counts within ±{data['top_endpoints_error']:,.0f} requests")
+    endpoint_chart = endpoint_fig.to_html(full_html=False, include_plotlyjs=False)
+
+    # Line Chart for Requests over Time (only available from the rollups)
+    traffic_chart = None
+    if data.get("requests_over_time"):
+        buckets, requests = zip(*data["requests_over_time"])
+        traffic_fig = go.Figure([go.Scatter(x=buckets, y=requests, mode="lines", line_color="blue")])
+        traffic_chart = traffic_fig.to_html(full_html=False, include_plotlyjs=False)
+
+    charts = {"status_chart": status_chart, "endpoint_chart": endpoint_chart, "traffic_chart": traffic_chart}
+    with chart_cache_lock:
+        chart_cache[digest] = charts
+        while len(chart_cache) > CHART_CACHE_SIZE:
+            chart_cache.popitem(last=False)
+    return charts
 
-    return render_template("dashboard.html", data=data, status_chart=status_chart, endpoint_chart=endpoint_chart)
+# Dashboard Route
+@app.route("/dashboard")
+@login_required
+def dashboard():
+    time_range = request.args.get("range", "all")
+    data = fetch_data_for_dashboard(time_range)
+
+    # Unchanged dashboards are answered with 304 Not Modified
+    digest = dashboard_digest(data)
+    etag = f"{digest[:32]}-{current_user.id}"
+    if etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    charts = render_dashboard_charts(data, digest)
+    # The status chart carries the only <script src> for plotly.js
+    response = make_response(render_template("dashboard.html", data=data, time_range=time_range, **charts))
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+# Full sales history download, streamed from SQLite in chunks
+@app.route("/download/history")
+@login_required
+def download_history():
+    compress = request.args.get("gzip") == "1"
+    filename = "full_sales_history.csv.gz" if compress else "full_sales_history.csv"
+    return Response(
+        stream_with_context(stream_sales_history(compress=compress)),
+        mimetype="application/gzip" if compress else "text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+# Background export jobs run in a bounded process pool
+export_jobs = ExportJobManager()
+
+@app.route("/exports", methods=["POST"])
+@login_required
+def create_export():
+    params = request.get_json(silent=True) or request.form
+    time_range = params.get("range", "last_hour")
+    if params.get("start") or params.get("end"):
+        time_range = (params.get("start"), params.get("end"))
+
+    try:
+        job_id = export_jobs.submit(
+            dataset=params.get("dataset", "sales"),
+            file_format=params.get("format", "csv"),
+            time_range=time_range,
+            compression=params.get("compression") or None
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 429
+
+    return jsonify({
+        "job_id": job_id,
+        "status_url": url_for("export_status", job_id=job_id),
+        "download_url": url_for("download_export", job_id=job_id)
+    }), 202
+
+@app.route("/exports/<job_id>")
+@login_required
+def export_status(job_id):
+    status = export_jobs.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown export"}), 404
+    return jsonify(status)
+
+@app.route("/exports/<job_id>/download")
+@login_required
+def download_export(job_id):
+    path = export_jobs.download_path(job_id)
+    if path is None:
+        return jsonify({"error": "Export is not ready"}), 409
+    return send_file(os.path.abspath(path), as_attachment=True)
+
+# Workers answer requests as soon as Flask is imported; plotly and the first
+# dashboard snapshot load in a background thread meanwhile
+PREWARM = os.environ.get("APP_PREWARM", "1").lower() not in ("0", "false", "no", "off")
+
+def prewarm_charts():
+    import plotly.graph_objects as go
+    go.Figure([go.Bar(x=[0], y=[0])]).to_html(full_html=False, include_plotlyjs=False)
+    load_plotly_js()
+
+def prewarm_dashboard():
+    data = fetch_data_for_dashboard()
+    render_dashboard_charts(data, dashboard_digest(data))
+
+if PREWARM:
+    prewarm.start("app", [("charts", prewarm_charts), ("dashboard_data", prewarm_dashboard)])
 
 def start_background_processes():
     # Start data generator
     subprocess.Popen(["python", "data_generator.py"], creationflags=subprocess.CREATE_NEW_CONSOLE)
 
+    # Load access logs as they are written and roll them up every minute
+    subprocess.Popen(["python", "upload_logs.py", "synthetic_logs.csv", "--follow"],
+                     creationflags=subprocess.CREATE_NEW_CONSOLE)
+    subprocess.Popen(["python", "rollup_logs.py", "--interval", "60"],
+                     creationflags=subprocess.CREATE_NEW_CONSOLE)
+
     # Start Streamlit dashboard
     subprocess.Popen([
         "streamlit", "run", "dashboard.py", "--server.headless", "true"
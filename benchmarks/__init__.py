@@ -0,0 +1,8 @@
+"""
+Reproducible performance benchmarks for the sales and log pipelines
+
+Run from the repository root:
+
+    python -m benchmarks --sizes 10k 100k 1m --output benchmarks/baseline.json
+    python -m benchmarks --sizes 10k --compare benchmarks/baseline.json --threshold 0.2
+"""
@@ -0,0 +1,52 @@
+import argparse
+import sys
+
+from benchmarks.harness import compare_results, format_result, load_results, save_results
+from benchmarks.scenarios import GROUPS, run_size
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the generator, dashboard, Flask routes and exports")
+    parser.add_argument("--sizes", nargs="+", choices=SIZES, default=["10k", "100k", "1m"],
+                        help="Row counts to run (default: all)")
+    parser.add_argument("--only", nargs="+", choices=GROUPS,
+                        help="Scenario groups to run (default: all)")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="Flag regressions against a saved baseline")
+    parser.add_argument("--current", metavar="RESULTS",
+                        help="Compare a saved results file instead of running the benchmarks")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative change that counts as a regression (default: 0.2)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    if args.current:
+        results = load_results(args.current)
+    else:
+        results = {}
+        for label in args.sizes:
+            print(f"⏱️ Running {label} scenarios...")
+            for name, result in run_size(SIZES[label], label, args.only):
+                results[name] = result
+                print(format_result(name, result))
+        if args.output:
+            save_results(args.output, results, args.sizes)
+            print(f"✅ Results saved to {args.output}")
+
+    if args.compare:
+        regressions = compare_results(load_results(args.compare), results, args.threshold)
+        if not regressions:
+            print(f"✅ No regressions beyond {args.threshold:.0%}")
+            return 0
+        print(f"❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for name, metric, old, new, change in regressions:
+            print(f"   {name:<40} {metric:<16} {old:>14,.2f} -> {new:>14,.2f} ({change:+.0%})")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import os
+import random
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+import data_generator
+
+SEED = 333
+INSERT_BATCH = 1000
+
+LOG_METHODS = ["GET", "POST"]
+LOG_STATUS_CODES = [200, 200, 200, 200, 201, 301, 304, 400, 401, 403, 404, 500]
+LOG_ENDPOINTS = [
+    "/index.php", "/event.php", "/scheduledemo.php", "/aboutus.php", "/contactus.php",
+    "/prototype.php", "/ai-assistant.php", "/jobs.php", "/pricing.php", "/login.php"
+]
+
+@contextmanager
+def workspace():
+    """Run the block inside a fresh temporary directory, since every module uses cwd-relative paths"""
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="cet333-bench-") as path:
+        os.chdir(path)
+        try:
+            yield path
+        finally:
+            os.chdir(previous)
+
+def sales_batches(rows, batch_size=INSERT_BATCH):
+    """Yield generated sales records in batches until rows have been produced"""
+    produced = 0
+    while produced < rows:
+        size = min(batch_size, rows - produced)
+        yield data_generator.generate_batch_data(size)
+        produced += size
+
+def build_sales_db(rows):
+    """Create sales_data.db in the cwd and fill it with rows generated records"""
+    data_generator.create_sales_database()
+    with data_generator.SalesWriter(commit_size=50000) as writer:
+        for batch in sales_batches(rows):
+            writer.write(batch)
+
+def build_log_csv(rows, path="synthetic_logs.csv", seed=SEED):
+    """Write rows synthetic access log lines spread over the day so far"""
+    rng = random.Random(seed)
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    seconds = max(1, int((datetime.now() - start).total_seconds()))
+    with open(path, "w", newline="") as f:
+        f.write("Timestamp,IP Address,Method,Endpoint,Status Code\n")
+        for _ in range(rows):
+            moment = start + timedelta(seconds=rng.randrange(seconds))
+            ip = f"{rng.randint(1, 255)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}"
+            f.write(f"{moment:%H:%M:%S},{ip},{rng.choice(LOG_METHODS)},"
+                    f"{rng.choice(LOG_ENDPOINTS)},{rng.choice(LOG_STATUS_CODES)}\n")
+
+def build_admin_db(path="database/admin.db", username="bench"):
+    """Create the admins table with a single user and return its id"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS admins (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL
+        )
+        """)
+        cursor = conn.execute("INSERT INTO admins (username, password_hash) VALUES (?, ?)",
+                              (username, generate_password_hash("bench")))
+    conn.close()
+    return cursor.lastrowid
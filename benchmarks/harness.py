@@ -0,0 +1,105 @@
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def measure(fn, repeat=5, rows=None, setup=None):
+    """
+    Time fn over several runs and record one more run under tracemalloc
+
+    setup, if given, runs before every call outside the timed region.
+    rows is the number of rows one call processes, used for throughput.
+    Peak memory is measured separately so tracing does not skew latency.
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return summarise(timings, peak, rows)
+
+def summarise(timings, peak, rows=None, seconds=None):
+    """
+    Latency percentiles, peak memory and throughput for a list of timings
+
+    Throughput is rows over seconds, which defaults to the median run.
+    """
+    result = {
+        "runs": len(timings),
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p95_ms": percentile(timings, 95) * 1000,
+        "mean_ms": statistics.mean(timings) * 1000,
+        "peak_mb": peak / (1024 * 1024)
+    }
+    if rows:
+        result["rows"] = rows
+        result["rows_per_second"] = rows / (seconds or percentile(timings, 50))
+    return result
+
+def environment():
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "recorded_at": datetime.now().isoformat(timespec="seconds")
+    }
+
+def save_results(path, results, sizes):
+    with open(path, "w") as f:
+        json.dump({"meta": {**environment(), "sizes": sizes}, "results": results}, f, indent=2, sort_keys=True)
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)["results"]
+
+# Metrics that get worse when they go up, and those that get worse when they go down
+HIGHER_IS_WORSE = ["p50_ms", "p95_ms", "peak_mb"]
+LOWER_IS_WORSE = ["rows_per_second"]
+
+def compare_results(baseline, current, threshold=0.2):
+    """
+    Return (scenario, metric, old, new, change) for every metric that moved
+    past the threshold in the wrong direction
+    """
+    regressions = []
+    for name, metrics in sorted(current.items()):
+        old_metrics = baseline.get(name)
+        if not old_metrics:
+            continue
+        for metric in HIGHER_IS_WORSE + LOWER_IS_WORSE:
+            old, new = old_metrics.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (metric in HIGHER_IS_WORSE and change > threshold) or \
+               (metric in LOWER_IS_WORSE and change < -threshold):
+                regressions.append((name, metric, old, new, change))
+    return regressions
+
+def format_result(name, result):
+    line = f"{name:<40} p50 {result['p50_ms']:>10.2f} ms  p95 {result['p95_ms']:>10.2f} ms  peak {result['peak_mb']:>8.2f} MB"
+    if "rows_per_second" in result:
+        line += f"  {result['rows_per_second']:>12,.0f} rows/s"
+    return line
@@ -0,0 +1,291 @@
+import contextlib
+import io
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import timedelta
+
+from jinja2 import FileSystemLoader
+
+import admin_store
+import data_generator
+from bulk_generator import BulkSalesGenerator
+import export_reports
+import rollup_logs
+import upload_logs
+from sales_aggregates import REVENUE_COLUMN, SalesAggregates
+
+from benchmarks.datasets import (INSERT_BATCH, SEED, build_admin_db, build_log_csv, build_sales_db,
+                                 sales_batches, workspace)
+from benchmarks.harness import measure, summarise
+from sales_schema import SALES_DB
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECORD_POOL = 10000  # Distinct records reused to fill large aggregation windows
+STARTUP_RUNS = 5
+DASHBOARD_WINDOW = 1000  # Rows in the dashboard's default live window, "Last 1,000 sales"
+
+# Run in a fresh interpreter each time; they print the seconds from the first import to the response
+APP_FIRST_BYTE = """
+import time
+started = time.perf_counter()
+import app
+response = app.app.test_client().get("/")
+assert response.status_code == 302, response.status_code
+print("startup_seconds", time.perf_counter() - started)
+"""
+DASHBOARD_FIRST_RUN = """
+import time
+from streamlit.testing.v1 import AppTest
+started = time.perf_counter()
+test = AppTest.from_file({path!r}, default_timeout=120).run()
+assert not test.exception, test.exception
+print("startup_seconds", time.perf_counter() - started)
+"""
+
+def repeat_for(rows):
+    """Fewer repeats for the larger scenarios so a full run stays practical"""
+    if rows <= 10_000:
+        return 7
+    if rows <= 100_000:
+        return 5
+    return 3
+
+def bench_generator_insert(rows):
+    """
+    Build sales_data.db through SalesWriter, timing each batch insert
+
+    Record generation is not timed; peak memory covers the write calls only.
+    """
+    data_generator.create_sales_database()
+    timings = []
+    peak = 0
+    tracemalloc.start()
+    try:
+        with data_generator.SalesWriter(commit_size=INSERT_BATCH) as writer:
+            for batch in sales_batches(rows):
+                tracemalloc.reset_peak()
+                started = time.perf_counter()
+                writer.write(batch)
+                timings.append(time.perf_counter() - started)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+    return summarise(timings, peak, rows, seconds=sum(timings))
+
+def bench_generator_bulk(rows):
+    """Columnar batches from BulkSalesGenerator, generation only"""
+    generator = BulkSalesGenerator(SEED, timedelta(days=7))
+    def generate():
+        for _ in generator.sales_batches(rows):
+            pass
+    return measure(generate, repeat_for(rows), rows=rows)
+
+def filled_aggregates(rows):
+    """A SalesAggregates window of rows records built from a reused pool of generated records"""
+    pool = data_generator.generate_batch_data(min(rows, RECORD_POOL))
+    aggregates = SalesAggregates(window=rows)
+    for start in range(0, rows, len(pool)):
+        aggregates.add(pool[:rows - start])
+    return aggregates, pool
+
+def bench_aggregates(rows):
+    """The per-rerun work dashboard.py does: fold in new records, read KPIs and series, build the frame"""
+    aggregates, pool = filled_aggregates(rows)
+    batch = pool[:max(100, rows // 100)]
+    repeat = repeat_for(rows)
+
+    # The same reads as one dashboard rerun
+    def update():
+        aggregates.add(batch)
+        aggregates.total_revenue
+        aggregates.avg_order
+        aggregates.top_product
+        aggregates.revenue_by('region_of_sales')
+        aggregates.counts_by('product_category')
+        aggregates.revenue_by('customer_type')
+        aggregates.counts_by('payment_method')
+        aggregates.top_products(5)
+        aggregates.sales_rep_performance()
+
+    results = {"aggregates_update": measure(update, repeat, rows=len(batch))}
+
+    # frame() is cached per version, so fold in one record before each build
+    results["aggregates_frame"] = measure(aggregates.frame, repeat, rows=rows,
+                                          setup=lambda: aggregates.add(pool[:1]))
+
+    # The full pandas recompute the dashboard used before the incremental totals
+    df = aggregates.frame()
+    def pandas_groupby():
+        df[REVENUE_COLUMN].sum()
+        df[REVENUE_COLUMN].mean()
+        df['product_name'].mode()
+        df.groupby('region_of_sales', observed=True)[REVENUE_COLUMN].sum()
+        df['product_category'].value_counts()
+        df.groupby('customer_type', observed=True)[REVENUE_COLUMN].sum()
+        df['payment_method'].value_counts()
+        df.groupby('product_name')[REVENUE_COLUMN].sum().nlargest(5)
+        df.groupby('sales_rep', observed=True).agg({REVENUE_COLUMN: 'sum', 'number_of_transactions': 'sum'})
+
+    results["aggregates_pandas_groupby"] = measure(pandas_groupby, repeat, rows=rows)
+    return results
+
+def bench_fetch_dashboard(app_module, rows):
+    """fetch_data_for_dashboard from the raw CSV (cold and tailing) and from the rollups"""
+    repeat = repeat_for(rows)
+    aggregator = app_module.log_aggregator
+    results = {
+        "fetch_dashboard_csv_cold": measure(app_module.fetch_data_for_dashboard, repeat, rows=rows,
+                                            setup=aggregator.reset),
+        "fetch_dashboard_csv_warm": measure(app_module.fetch_data_for_dashboard, repeat)
+    }
+
+    upload_logs.ingest_file("synthetic_logs.csv")
+    rollup_logs.update_rollups()
+    results["fetch_dashboard_rollups"] = measure(app_module.fetch_data_for_dashboard, repeat, rows=rows)
+    return results
+
+def bench_dashboard_route(app_module, rows):
+    """/dashboard render time with a cold chart cache, a warm one, and a conditional request"""
+    flask_app = app_module.app
+    if not os.path.exists(os.path.join(flask_app.root_path, flask_app.template_folder, "dashboard.html")):
+        # The repo does not ship its templates, so render a minimal stand-in
+        flask_app.jinja_loader = FileSystemLoader(TEMPLATE_DIR)
+
+    user_id = build_admin_db()
+    client = flask_app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+    def get(headers=None):
+        response = client.get("/dashboard", headers=headers)
+        assert response.status_code in (200, 304), response.status_code
+        return response
+
+    repeat = repeat_for(rows)
+    results = {
+        "dashboard_render_cold": measure(get, repeat, setup=app_module.chart_cache.clear),
+        "dashboard_render_warm": measure(get, repeat)
+    }
+    etag = get().headers["ETag"]
+    results["dashboard_render_304"] = measure(lambda: get({"If-None-Match": etag}), repeat)
+    return results
+
+def pyarrow_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def bench_exports(rows):
+    """export_data for every row format over the whole sales table"""
+    formats = ["csv", "jsonl"] + (["parquet", "feather"] if pyarrow_available() else [])
+    repeat = min(3, repeat_for(rows))
+    results = {}
+    for file_format in formats:
+        def export():
+            with contextlib.redirect_stdout(io.StringIO()):
+                ok, detail = export_reports.export_data(file_format, time_range="all", dataset="sales")
+            assert ok, detail
+        results[f"export_{file_format}"] = measure(export, repeat, rows=rows)
+    return results
+
+GROUPS = ["generator", "aggregates", "fetch", "dashboard", "exports", "startup"]
+
+def time_fresh_process(code, runs=STARTUP_RUNS):
+    """Run code in new interpreters (cwd = the workspace) and summarise the seconds each one prints"""
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, APP_PREWARM="1")
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+        # Prewarm threads may print too, so look for the tagged line
+        line = next(line for line in result.stdout.splitlines() if line.startswith("startup_seconds "))
+        timings.append(float(line.split()[1]))
+    return summarise(timings, 0)
+
+@contextlib.contextmanager
+def sales_db_set_aside():
+    """Give the block an empty sales_data.db, putting the populated one back afterwards"""
+    aside = SALES_DB + ".bench"
+    os.replace(SALES_DB, aside)
+    try:
+        data_generator.create_sales_database()
+        yield
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(SALES_DB + suffix):
+                os.remove(SALES_DB + suffix)
+        os.replace(aside, SALES_DB)
+
+def bench_startup():
+    """
+    Cold start, which a new or restarted worker pays before serving anyone:
+    importing app.py up to its first response, and a new dashboard.py
+    process running its first session, against an empty sales database and
+    then one holding a full default live window
+    """
+    dashboard = DASHBOARD_FIRST_RUN.format(path=os.path.join(REPO_DIR, "dashboard.py"))
+    results = {"startup_app_first_byte": time_fresh_process(APP_FIRST_BYTE)}
+    with sales_db_set_aside():
+        results["startup_dashboard_waiting"] = time_fresh_process(dashboard)
+        with data_generator.SalesWriter(commit_size=DASHBOARD_WINDOW) as writer:
+            writer.write(data_generator.generate_batch_data(DASHBOARD_WINDOW))
+        results["startup_dashboard_first_run"] = time_fresh_process(dashboard)
+    return results
+
+def run_size(rows, label, groups=None):
+    """
+    Run the scenarios against a fresh workspace of rows rows
+
+    Yields ('scenario@label', result) pairs. Skipped groups still build the
+    data that later groups depend on.
+    """
+    # A prewarm thread would race the scenarios below for the workspace files
+    os.environ["APP_PREWARM"] = "0"
+
+    groups = groups or GROUPS
+    with workspace():
+        # Importing app prepares the rollup schema in the cwd, so never in the checkout
+        import app as app_module
+
+        # Connections and caches held by the app must not outlive the workspace
+        admin_store.pool.close()
+        admin_store.admin_cache.clear()
+        app_module.log_aggregator.reset()
+        app_module.chart_cache.clear()
+        random.seed(SEED)
+
+        if "generator" in groups:
+            yield f"generator_insert@{label}", bench_generator_insert(rows)
+            yield f"generator_bulk@{label}", bench_generator_bulk(rows)
+        else:
+            build_sales_db(rows)
+
+        if "aggregates" in groups:
+            yield from label_results(bench_aggregates(rows), label)
+
+        build_log_csv(rows)
+        if "fetch" in groups:
+            yield from label_results(bench_fetch_dashboard(app_module, rows), label)
+        else:
+            upload_logs.ingest_file("synthetic_logs.csv")
+            rollup_logs.update_rollups()
+
+        if "dashboard" in groups:
+            yield from label_results(bench_dashboard_route(app_module, rows), label)
+        if "exports" in groups:
+            yield from label_results(bench_exports(rows), label)
+        if "startup" in groups:
+            yield from label_results(bench_startup(), label)
+
+        admin_store.pool.close()
+
+def label_results(results, label):
+    for name, result in results.items():
+        yield f"{name}@{label}", result
@@ -0,0 +1,326 @@
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from data_generator import (CITIES, COUNTRIES, CUSTOMER_TYPES, DIMENSION_VOCABULARIES, DISCOUNTS, INDUSTRIES,
+                            METHODS, PAYMENT_METHODS, PRODUCT_BASES, PRODUCT_CATEGORIES, PRODUCT_PREFIXES,
+                            REGIONS, RESPONSE_CODES, SALES_REPS, USER_AGENTS)
+from live_data import bump_data_version
+from sales_schema import (DIMENSION_COLUMNS, SALES_COLUMNS, SALES_DB, DimensionEncoder, create_indexes,
+                          create_partition, create_sales_schema, drop_sales_schema, fix_null_total_keys,
+                          has_null_total_keys, insert_fact_sql, list_partitions, migrate_sales_table,
+                          partition_fact_table, partition_table, partition_tables, rebuild_day_totals,
+                          refresh_sales_view, summarize_partition)
+
+BATCH_ROWS = 100_000  # Rows generated (and committed) at a time
+SPAN_UNITS = {"m": 60, "h": 3600, "d": 86400}
+# Default files for --target csv/logs, kept apart from the checked-in synthetic_logs.csv
+DEFAULT_OUTPUTS = {"csv": "bulk_sales.csv", "logs": "bulk_logs.csv"}
+
+# Categorical sales columns and the values random.choice picks from in generate_sales_record
+CHOICES = {
+    "product_category": PRODUCT_CATEGORIES,
+    "payment_method": PAYMENT_METHODS,
+    "country": COUNTRIES,
+    "region_of_sales": REGIONS,
+    "city": CITIES,
+    "customer_type": CUSTOMER_TYPES,
+    "industry": INDUSTRIES,
+    "sales_rep": SALES_REPS,
+    "method": METHODS,
+    "user_agent": USER_AGENTS
+}
+
+# The mix of synthetic_logs.csv
+LOG_COLUMNS = ["Timestamp", "IP Address", "Method", "Endpoint", "Status Code"]
+LOG_METHODS = ["GET"]
+LOG_ENDPOINTS = ["/event.php", "/images/banner.jpg", "/api/track", "/index.html", "/prototype.php", "/scheduledemo.php"]
+LOG_STATUS_CODES = [200, 304, 404, 500]
+LOG_STATUS_WEIGHTS = [0.8, 0.1, 0.05, 0.05]
+
+OCTETS = np.array([str(i) for i in range(256)], dtype=object)
+
+def parse_span(text):
+    """'30m', '24h' or '7d' as a timedelta"""
+    text = text.strip().lower()
+    if text[-1:] not in SPAN_UNITS:
+        raise argparse.ArgumentTypeError(f"Span must end in one of {', '.join(SPAN_UNITS)}: {text}")
+    try:
+        seconds = float(text[:-1]) * SPAN_UNITS[text[-1]]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid span: {text}")
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError("Span must be positive")
+    return timedelta(seconds=seconds)
+
+def product_catalog():
+    """Every possible product name, grouped by category, with each category's (offset, size) in the list"""
+    names, blocks = [], []
+    for category in PRODUCT_CATEGORIES:
+        block = [
+            f"{prefix} {base} v{major}.{minor}"
+            for prefix in PRODUCT_PREFIXES[category]
+            for base in PRODUCT_BASES[category]
+            for major in range(1, 6)
+            for minor in range(10)
+        ]
+        blocks.append((len(names), len(block)))
+        names.extend(block)
+    return names, np.array(blocks)
+
+def ip_addresses(rng, rows):
+    """Random IPv4 addresses, first octet 1-255 and the rest 0-255"""
+    octets = rng.integers(0, 256, size=(4, rows))
+    octets[0] = rng.integers(1, 256, size=rows)
+    a, b, c, d = (OCTETS[row] for row in octets)
+    return a + "." + b + "." + c + "." + d
+
+def time_slices(start, end, rows, batch_rows=BATCH_ROWS):
+    """Split rows evenly over [start, end) into (slice start, slice end, rows) batches, oldest first"""
+    batches = max(1, -(-rows // batch_rows))
+    step = (end - start) / batches
+    for i in range(batches):
+        count = rows * (i + 1) // batches - rows * i // batches
+        yield start + step * i, start + step * (i + 1), count
+
+def random_times(rng, start, end, rows):
+    """Sorted local datetime64[us] values uniform over [start, end), plus their Unix times in ms"""
+    span_us = max(1, int((end - start) / timedelta(microseconds=1)))
+    offsets = np.sort(rng.integers(0, span_us, size=rows))
+    local = np.datetime64(start, "us") + offsets.astype("timedelta64[us]")
+    epoch_ms = int(start.timestamp() * 1000) + offsets // 1000
+    return local, epoch_ms
+
+class BulkSalesGenerator:
+    """
+    Seeded, vectorized counterpart of generate_sales_record
+
+    Produces the same columns with the same distributions, a batch of rows
+    at a time, as pandas frames whose low-cardinality columns are
+    categoricals. Rows come out in timestamp order, spread uniformly over
+    [end - span, end).
+    """
+
+    def __init__(self, seed=None, span=timedelta(days=1), end=None, batch_rows=BATCH_ROWS):
+        self.rng = np.random.default_rng(seed)
+        self.end = end or datetime.now()
+        self.start = self.end - span
+        self.batch_rows = batch_rows
+        self.sequence = int(self.rng.integers(0, 9000))  # Same role as _sale_sequence
+        self.products, self.product_blocks = product_catalog()
+
+    def choice(self, values, rows):
+        return pd.Categorical.from_codes(self.rng.integers(0, len(values), size=rows), categories=values)
+
+    def sales_batch(self, start, end, rows):
+        rng = self.rng
+        local, epoch_ms = random_times(rng, start, end, rows)
+        timestamps = np.datetime_as_string(local, unit="us")
+        sequence = 1000 + (self.sequence + np.arange(rows)) % 9000
+        self.sequence += rows
+
+        categories = rng.integers(0, len(PRODUCT_CATEGORIES), size=rows)
+        offsets, sizes = self.product_blocks[categories].T
+        products = offsets + (rng.random(rows) * sizes).astype(np.int64)
+
+        unit_price = np.round(rng.uniform(1000, 25000, size=rows), 2)
+        quantity = rng.integers(1, 6, size=rows)
+        discount = rng.choice(DISCOUNTS, size=rows)
+        total_sales = unit_price * quantity
+
+        columns = {
+            "sales_id": "SALE-" + epoch_ms.astype(str).astype(object) + "-" + sequence.astype(str).astype(object),
+            "product_id": "AI-" + rng.integers(1000, 10000, size=rows).astype(str).astype(object),
+            "product_name": pd.Categorical.from_codes(products, categories=self.products),
+            "product_category": pd.Categorical.from_codes(categories, categories=PRODUCT_CATEGORIES),
+            "total_sales_revenue": np.round(total_sales, 2),
+            "number_of_transactions": np.ones(rows, dtype=np.int64),
+            "quantity_sold": quantity,
+            "unit_price": unit_price,
+            "discount_applied_pct": discount,
+            "final_price_after_discount": np.round(total_sales * (1 - discount / 100), 2),
+            "timestamp": timestamps.astype(object),
+            "date": timestamps.astype("U10").astype(object),
+            "ip_address": ip_addresses(rng, rows),
+            "page_accessed": "/solution/" + rng.integers(1000, 10000, size=rows).astype(str).astype(object),
+            "response_code": rng.choice(RESPONSE_CODES, size=rows)
+        }
+        for column, values in CHOICES.items():
+            if column != "product_category":
+                columns[column] = self.choice(values, rows)
+        return pd.DataFrame({name: columns[name] for name, _ in SALES_COLUMNS})
+
+    def log_batch(self, start, end, rows, time_format):
+        rng = self.rng
+        local, _ = random_times(rng, start, end, rows)
+        moments = pd.Series(local.astype("datetime64[s]"))
+        return pd.DataFrame({
+            "Timestamp": moments.dt.strftime(time_format),
+            "IP Address": ip_addresses(rng, rows),
+            "Method": self.choice(LOG_METHODS, rows),
+            "Endpoint": self.choice(LOG_ENDPOINTS, rows),
+            "Status Code": rng.choice(LOG_STATUS_CODES, size=rows, p=LOG_STATUS_WEIGHTS)
+        })
+
+    def sales_batches(self, rows):
+        for start, end, count in time_slices(self.start, self.end, rows, self.batch_rows):
+            yield self.sales_batch(start, end, count)
+
+    def log_batches(self, rows):
+        # Like synthetic_logs.csv, only the time of day is written when every line falls on one day
+        same_day = self.start.date() == (self.end - timedelta(microseconds=1)).date()
+        time_format = "%H:%M:%S" if same_day else "%Y-%m-%d %H:%M:%S"
+        for start, end, count in time_slices(self.start, self.end, rows, self.batch_rows):
+            yield self.log_batch(start, end, count, time_format)
+
+def encode_frame(frame, encoder):
+    """Fact table rows for a frame: dimension categories become their codes in the dimension tables"""
+    columns = []
+    for name, _ in SALES_COLUMNS:
+        values = frame[name]
+        if name in DIMENSION_COLUMNS:
+            lookup = np.array([encoder.code(name, value) for value in values.cat.categories])
+            columns.append(lookup[values.cat.codes.to_numpy()].tolist())
+        elif isinstance(values.dtype, pd.CategoricalDtype):
+            columns.append(values.astype(object).tolist())
+        else:
+            columns.append(values.tolist())
+    return list(zip(*columns))
+
+def prepare_database(conn, reset=False):
+    """Bring the sales database to the partitioned schema, emptying it first if asked"""
+    if reset:
+        drop_sales_schema(conn)
+    elif migrate_sales_table(conn, DIMENSION_VOCABULARIES) is None:
+        partition_fact_table(conn, DIMENSION_VOCABULARIES)
+    create_sales_schema(conn, DIMENSION_VOCABULARIES)
+    for table in partition_tables(conn):
+        create_indexes(conn, table)  # Finishes the indexes of a partition an interrupted load left behind
+    with conn:
+        conn.execute("BEGIN")
+        rebuild_day_totals(conn)  # Likewise its day totals
+        if has_null_total_keys(conn):
+            fix_null_total_keys(conn)
+    conn.commit()
+
+def write_database(generator, rows, db_path=SALES_DB, reset=False):
+    """
+    Insert rows generated sales into the day partitions, committing once per batch
+
+    Partitions created by the load are indexed and summed into the day
+    totals once their day is complete rather than row by row, which more
+    than halves the load time.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        prepare_database(conn, reset)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        encoder = DimensionEncoder(conn)
+        known = {day for day, _ in list_partitions(conn)}
+        unindexed = {}  # day -> partition created by this load that still needs its indexes
+
+        written = 0
+        for frame in generator.sales_batches(rows):
+            days = frame["date"].to_numpy()
+            # Rows are in time order, so each day is one contiguous run
+            bounds = np.flatnonzero(days[1:] != days[:-1]) + 1
+            encoded = encode_frame(frame, encoder)
+            last_batch = written + len(frame) >= rows
+            conn.execute("BEGIN")
+            try:
+                for lower, upper in zip(np.r_[0, bounds], np.r_[bounds, len(frame)]):
+                    day = days[lower]
+                    if day not in known:
+                        unindexed[day] = create_partition(
+                            conn, day, refresh_view=False, indexed=False, summarized=False
+                        )
+                    conn.executemany(insert_fact_sql(partition_table(day)), encoded[lower:upper])
+                for day in [day for day in unindexed if day < days[-1] or last_batch]:
+                    table = unindexed.pop(day)
+                    create_indexes(conn, table)
+                    summarize_partition(conn, table)
+                new_days = set(days[np.r_[0, bounds]]) - known
+                if new_days:
+                    refresh_sales_view(conn)
+                    known |= new_days
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+            written += len(frame)
+            yield written
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+    bump_data_version()  # Open dashboards pick up the new rows
+
+def write_csv(batches, path):
+    """Write frames to one CSV file with a single header, yielding the rows written so far"""
+    written = 0
+    with open(path, "w", newline="") as f:
+        for frame in batches:
+            frame.to_csv(f, header=written == 0, index=False)
+            written += len(frame)
+            yield written
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate large synthetic sales or access log datasets quickly")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows to generate (default: 1,000,000)")
+    parser.add_argument("--span", type=parse_span, default=parse_span("7d"),
+                        help="Time range the rows are spread over, ending now, e.g. 30m, 24h, 7d (default: 7d)")
+    parser.add_argument("--end", type=datetime.fromisoformat, default=None,
+                        help="End of the time range as an ISO date/time (default: now)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed, for reproducible datasets")
+    parser.add_argument("--target", choices=["db", "csv", "logs"], default="db",
+                        help="db: insert into the sales database; csv: sales CSV; logs: access log CSV")
+    parser.add_argument("--db", default=SALES_DB, help="Sales database for --target db")
+    parser.add_argument("--output", default=None,
+                        help="File for --target csv/logs (default: bulk_sales.csv / bulk_logs.csv)")
+    parser.add_argument("--force", action="store_true", help="Overwrite the --target csv/logs file if it exists")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS, help="Rows generated at a time")
+    parser.add_argument("--reset", action="store_true", help="Empty the sales database before inserting")
+    args = parser.parse_args()
+    if args.target != "db":
+        args.output = args.output or DEFAULT_OUTPUTS[args.target]
+        if os.path.exists(args.output) and not args.force:
+            parser.error(f"{args.output} already exists; pass --force to overwrite it or choose another --output")
+    return args
+
+def main():
+    args = parse_args()
+    generator = BulkSalesGenerator(args.seed, args.span, args.end, max(1, args.batch_rows))
+
+    if args.target == "db":
+        destination = args.db
+        progress = write_database(generator, args.rows, args.db, args.reset)
+    elif args.target == "csv":
+        destination = args.output
+        progress = write_csv(generator.sales_batches(args.rows), destination)
+    else:
+        destination = args.output
+        progress = write_csv(generator.log_batches(args.rows), destination)
+
+    print(f"🏭 Generating {args.rows:,} rows from {generator.start:%Y-%m-%d %H:%M} to {generator.end:%Y-%m-%d %H:%M}")
+    started = time.perf_counter()
+    written = 0
+    try:
+        for written in progress:
+            elapsed = time.perf_counter() - started
+            print(f"⚡ {written:,}/{args.rows:,} rows | {written / max(elapsed, 1e-9):,.0f} rows/s")
+    except sqlite3.IntegrityError as e:
+        # Sales ids come from the seed and the timestamps, so the same --seed, --span and --end
+        # generate the same ids again; the failed batch was rolled back
+        raise SystemExit(f"❌ {e}: {destination} already holds rows generated with these settings. "
+                         f"Pass --reset to start over, or a different --seed or --end.")
+    elapsed = time.perf_counter() - started
+    print(f"✅ Wrote {written:,} rows to {destination} in {elapsed:.1f}s "
+          f"({os.path.getsize(destination) / 1e6:,.1f} MB)")
+
+if __name__ == "__main__":
+    main()
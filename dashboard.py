@@ -1,22 +1,28 @@
 import os
-from pathlib import Path
 import streamlit as st
-import json
-import time
-import plotly.graph_objects as go
-import plotly.express as px
-import pandas as pd
 import sqlite3
-from datetime import datetime
-from io import StringIO
+from datetime import datetime, timedelta
+from sales_aggregates import SalesAggregates
+from export_reports import export_sales_history
+from sales_queries import fetch_kpis, fetch_revenue_by
+from live_data import SalesDatabaseReader, read_data_version
+import metrics
+import prewarm
 
 # Set page config
 st.set_page_config(page_title="Real-Time Sales Dashboard", layout="wide")
 
+@st.cache_resource
+def start_prewarm():
+    """Once per server process: load pandas and plotly in the background while the first page draws"""
+    return prewarm.start("dashboard", [("plotting", prewarm.plotting)])
+
+start_prewarm()
+
 # Initialize session state
-if 'sales_data' not in st.session_state:
-    st.session_state.sales_data = []
-    st.session_state.last_update = 0
+if 'live_window' not in st.session_state:
+    st.session_state.live_window = None
+    st.session_state.figures = {}
 
 # Custom CSS
 st.markdown("""
@@ -59,38 +65,65 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@metrics.timed("dashboard_load_sales_data_seconds", "Time to read the sales rows committed since the last rerun")
 def load_sales_data():
-    """Load and validate sales data"""
+    """Read the sales rows committed to sales_data.db since the last rerun"""
     try:
-        filepath = os.path.abspath("sales_dashboard_data.json")
-        if not os.path.exists(filepath):
-            with open(filepath, 'w') as f:
-                json.dump([], f)
-            return []
-        
-        current_mod_time = os.path.getmtime(filepath)
-        if current_mod_time > st.session_state.last_update:
-            with open(filepath, 'r') as f:
-                data = json.load(f)
-                if not isinstance(data, list):  # Ensure proper format
-                    return []
-                st.session_state.last_update = current_mod_time
-                return data
-        return st.session_state.sales_data
+        return st.session_state.db_reader.poll()
     except Exception as e:
         st.error(f"Data loading error: {str(e)}")
-        return []
+        return {}
+
+@metrics.timed("dashboard_historical_export_seconds", "Time to export the full history")
+def prepare_historical_export(compress, regions, categories):
+    """Stream the (filtered) full history from SQLite to a file under exports/"""
+    try:
+        return export_sales_history(compress=compress, regions=regions, categories=categories)
+    except Exception as e:
+        st.error(f"Error exporting historical data: {str(e)}")
+        return None
+
+# Current views larger than this are only written to CSV when asked for
+CURRENT_VIEW_PREPARE_ROWS = 10_000
+
+# Live windows as (most rows, time span). Each rerun only reads the rows
+# committed since the last one, so a larger window costs memory, not queries.
+LIVE_WINDOW_MAX_ROWS = 100_000
+LIVE_WINDOWS = {
+    "Last 100 sales": (100, None),
+    "Last 1,000 sales": (1_000, None),
+    "Last 10,000 sales": (10_000, None),
+    "Last 100,000 sales": (100_000, None),
+    "Last 15 minutes": (LIVE_WINDOW_MAX_ROWS, timedelta(minutes=15)),
+    "Last hour": (LIVE_WINDOW_MAX_ROWS, timedelta(hours=1))
+}
 
-def get_historical_data():
-    """Fetch all historical data from SQLite database"""
+# History windows; each only reads the day partitions it overlaps
+HISTORY_WINDOWS = {
+    "Last 24 hours": timedelta(hours=24),
+    "Last 7 days": timedelta(days=7),
+    "Last 30 days": timedelta(days=30),
+    "All time": None
+}
+
+@metrics.timed("dashboard_historical_totals_seconds", "Time to group the sales history in SQLite")
+def get_historical_totals(regions, categories, start=None):
+    """KPIs and revenue by region/category since start (or over the full history), grouped inside SQLite"""
     try:
         conn = sqlite3.connect('sales_data.db')
-        query = "SELECT * FROM sales ORDER BY timestamp DESC"
-        df = pd.read_sql(query, conn)
-        return df
+        kpis = fetch_kpis(conn, regions, categories, start)
+        by_region = pd.DataFrame(
+            fetch_revenue_by(conn, 'region_of_sales', regions, categories, start),
+            columns=['region_of_sales', 'final_price_after_discount', 'orders']
+        )
+        by_category = pd.DataFrame(
+            fetch_revenue_by(conn, 'product_category', regions, categories, start),
+            columns=['product_category', 'final_price_after_discount', 'orders']
+        )
+        return kpis, by_region, by_category
     except Exception as e:
         st.error(f"Error loading historical data: {str(e)}")
-        return pd.DataFrame()
+        return None, pd.DataFrame(), pd.DataFrame()
     finally:
         if 'conn' in locals():
             conn.close()
@@ -114,90 +147,17 @@ def create_chart(chart_type, data, **kwargs):
     )
     return fig
 
-# Main dashboard
-st.title("📊 Real-Time Sales Dashboard")
-st.markdown("---")
-
-# Navigation filters
-col1, col2 = st.columns(2)
-with col1:
-    region_filter = st.multiselect(
-        "Select Regions",
-        options=["North", "South", "East", "West", "Central"],
-        default=[]
-    )
-with col2:
-    category_filter = st.multiselect(
-        "Select Categories",
-        options=["Business Intelligence", 
-    "Data Analytics", 
-    "AI Solutions", 
-    "ICT Infrastructure",
-    "Cloud Services",
-    "Predictive Modeling"],
-        default=[]
-    )
-
-# Load and filter data
-sales_data = load_sales_data()
-if not sales_data:
-    st.warning("Waiting for initial data...")
-    time.sleep(2)
-    st.rerun()
-
-df = pd.DataFrame(sales_data)
+def cached_figure(name, data, build, key=None):
+    """Rebuild a chart only when the data behind it changed since the last rerun"""
+    if key is None:
+        key = data.to_json()
+    cached = st.session_state.figures.get(name)
+    if cached is None or cached[0] != key:
+        cached = (key, build(data))
+        st.session_state.figures[name] = cached
+    return cached[1]
 
-if region_filter or category_filter:
-    df = df[
-        (df['region_of_sales'].isin(region_filter) if region_filter else True) & 
-        (df['product_category'].isin(category_filter) if category_filter else True)
-    ]
-
-# ✅ Data Export Section (after df is defined)
-st.markdown("### Data Export")
-col_exp1, col_exp2 = st.columns(2)
-
-with col_exp1:
-    csv_current = df.to_csv(index=False).encode('utf-8') if not df.empty else None
-    st.download_button(
-        label="⬇️ Download Current View",
-        data=csv_current,
-        file_name='current_sales_data.csv',
-        mime='text/csv',
-        disabled=csv_current is None,
-        help="Download currently filtered data"
-    )
-
-with col_exp2:
-    historical_df = get_historical_data()
-    csv_historical = historical_df.to_csv(index=False).encode('utf-8') if not historical_df.empty else None
-    st.download_button(
-        label="⬇️ Download Full History",
-        data=csv_historical,
-        file_name='full_sales_history.csv',
-        mime='text/csv',
-        disabled=csv_historical is None,
-        help="Download complete historical data from database"
-    )
-
-# KPI Cards - Removed Transactions and Top Region cards
-st.subheader("Key Metrics")
-kpi1, kpi2, kpi3 = st.columns(3)
-with kpi1:
-    create_kpi_card(f"P{df['final_price_after_discount'].sum():,.2f}", "Total Revenue")
-with kpi2:
-    create_kpi_card(f"P{df['final_price_after_discount'].mean():,.2f}", "Avg Order")
-with kpi3:
-    create_kpi_card(df['product_name'].mode()[0], "Top Product")
-
-# Charts with added headings
-st.subheader("Sales Analytics")
-
-# First row of charts
-col1, col2 = st.columns(2)
-with col1:
-    st.markdown("#### Revenue by Region")
-    region_sales = df.groupby('region_of_sales')['final_price_after_discount'].sum().reset_index()
+def build_region_chart(region_sales):
     fig = px.bar(region_sales, x='region_of_sales', y='final_price_after_discount')
     
     # Add regional target line (20% above mean)
@@ -211,23 +171,9 @@ with col1:
         paper_bgcolor='rgba(20, 20, 40, 0.7)',
         font_color='white'
     )
-    st.plotly_chart(fig, use_container_width=True)
-
-with col2:
-    st.markdown("#### Product Category Distribution")
-    category_sales = df['product_category'].value_counts().reset_index()
-    category_sales.columns = ['product_category', 'count']
-    st.plotly_chart(
-        create_chart('pie', category_sales, names='product_category', values='count'),
-        use_container_width=True
-    )
+    return fig
 
-# Second row of charts
-col3, col4 = st.columns(2)
-with col3:
-    st.markdown("#### Revenue by Customer Type")
-    customer_sales = df.groupby('customer_type')['final_price_after_discount'].sum().reset_index()
-    
+def build_customer_chart(customer_sales):
     # Create line graph with proper connections
     fig = px.line(customer_sales, 
                  x='customer_type', 
@@ -261,23 +207,13 @@ with col3:
         plot_bgcolor='rgba(20, 20, 40, 0.7)',
         paper_bgcolor='rgba(20, 20, 40, 0.7)'
     )
-    
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
-with col4:
-    st.markdown("#### Payment Method Distribution")
-    payment_counts = df['payment_method'].value_counts().reset_index()
-    payment_counts.columns = ['payment_method', 'count']
-    fig = px.pie(payment_counts, names='payment_method', values='count', 
-                 hole=0.3, template='plotly_dark')
-    st.plotly_chart(fig, use_container_width=True)
+def build_payment_chart(payment_counts):
+    return px.pie(payment_counts, names='payment_method', values='count', 
+                  hole=0.3, template='plotly_dark')
 
-# Third row of charts
-col5, col6 = st.columns(2)
-with col5:
-    st.markdown("#### Top 5 Products by Revenue")
-    top_products = df.groupby('product_name')['final_price_after_discount'].sum().nlargest(5).reset_index()
-    
+def build_top_products_chart(top_products):
     # Calculate single target (average of top 5 + 20%)
     avg_top5 = top_products['final_price_after_discount'].mean()
     target = avg_top5 * 1.2
@@ -296,21 +232,57 @@ with col5:
         plot_bgcolor='rgba(20, 20, 40, 0.7)',
         paper_bgcolor='rgba(20, 20, 40, 0.7)'
     )
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
-with col6:
-    st.markdown("#### Price vs Quantity Scatter Plot")
+# Above this many rows the scatter plot draws binned totals instead of one
+# marker per sale, so its payload stops growing with the live window
+SCATTER_MAX_POINTS = 2_000
+SCATTER_BINS = 50  # Bins per axis; an axis with no more distinct values than this is left as is
+
+def bin_axis(values, bins=SCATTER_BINS):
+    """Replace each value by the centre of its bin among `bins` equal-width bins"""
+    if values.nunique() <= bins:
+        return values
+    low, high = values.min(), values.max()
+    width = (high - low) / bins or 1
+    index = ((values - low) // width).clip(upper=bins - 1)
+    return low + (index + 0.5) * width
+
+def bin_scatter(df, bins=SCATTER_BINS):
+    """Revenue and sale count per price bin, quantity bin and category: at most bins² markers per category"""
+    binned = pd.DataFrame({
+        'unit_price': bin_axis(df['unit_price'], bins),
+        'quantity_sold': bin_axis(df['quantity_sold'], bins),
+        'product_category': df['product_category'],
+        'final_price_after_discount': df['final_price_after_discount']
+    })
+    return binned.groupby(['unit_price', 'quantity_sold', 'product_category'], observed=True).agg(
+        final_price_after_discount=('final_price_after_discount', 'sum'),
+        sales=('final_price_after_discount', 'size')
+    ).reset_index()
+
+def build_scatter_chart(df):
     # Create scatter plot of unit price vs quantity sold, colored by product category
-    fig = px.scatter(df, x='unit_price', y='quantity_sold',
-                     color='product_category',
-                     size='final_price_after_discount',
-                     hover_name='product_name',
-                     template='plotly_dark',
-                     labels={
-                         'unit_price': 'Unit Price (P)',
-                         'quantity_sold': 'Quantity Sold',
-                         'product_category': 'Category'
-                     })
+    labels = {
+        'unit_price': 'Unit Price (P)',
+        'quantity_sold': 'Quantity Sold',
+        'product_category': 'Category'
+    }
+    if len(df) > SCATTER_MAX_POINTS:
+        # One marker per bin and category, sized by the revenue of the sales in it
+        fig = px.scatter(bin_scatter(df), x='unit_price', y='quantity_sold',
+                         color='product_category',
+                         size='final_price_after_discount',
+                         hover_data={'sales': True},
+                         template='plotly_dark',
+                         labels={**labels, 'final_price_after_discount': 'Revenue (P)', 'sales': 'Sales'})
+    else:
+        fig = px.scatter(df, x='unit_price', y='quantity_sold',
+                         color='product_category',
+                         size='final_price_after_discount',
+                         hover_name='product_name',
+                         template='plotly_dark',
+                         labels=labels)
     
     # Add target zones
     fig.add_vrect(x0=5000, x1=10000, fillcolor="#00f2ff", opacity=0.1,
@@ -318,29 +290,230 @@ with col6:
     
     fig.add_hrect(y0=3, y1=6, fillcolor="#ff00e6", opacity=0.1,
                  annotation_text="Bulk Range", annotation_position="bottom right")
-    
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
-# Fourth row - Sales Rep Performance with Targets
-st.markdown("#### Sales Performance by Representative")
-sales_rep_performance = df.groupby('sales_rep').agg({
-    'final_price_after_discount': 'sum',
-    'number_of_transactions': 'count'
-}).reset_index()
+def build_sales_rep_chart(sales_rep_performance):
+    # Calculate target (mean + 15%)
+    rep_target = sales_rep_performance['final_price_after_discount'].mean() * 1.15
+
+    fig = px.bar(sales_rep_performance, x='sales_rep', y='final_price_after_discount',
+                 hover_data=['number_of_transactions'], template='plotly_dark',
+                 labels={'final_price_after_discount': 'Total Revenue'})
+
+    # Add target line and highlight top performers
+    fig.add_hline(y=rep_target, line_dash="dot", line_color="#00f2ff",
+                 annotation_text=f"Target: P{rep_target:,.2f}")
+    return fig
+
+@st.fragment(run_every=1)
+def watch_for_new_data():
+    """Cheap per-second check of the data version; reruns the page only when it moves"""
+    if read_data_version() != st.session_state.data_version:
+        st.rerun()
+
+# Main dashboard
+st.title("📊 Real-Time Sales Dashboard")
+st.markdown("---")
+
+# Navigation filters
+col1, col2, col3 = st.columns(3)
+with col1:
+    region_filter = st.multiselect(
+        "Select Regions",
+        options=["North", "South", "East", "West", "Central"],
+        default=[]
+    )
+with col2:
+    category_filter = st.multiselect(
+        "Select Categories",
+        options=["Business Intelligence", 
+    "Data Analytics", 
+    "AI Solutions", 
+    "ICT Infrastructure",
+    "Cloud Services",
+    "Predictive Modeling"],
+        default=[]
+    )
+with col3:
+    live_window = st.selectbox("Live window", list(LIVE_WINDOWS), index=1)
+
+# Aggregates are kept between reruns and only fold in records that are new
+window_rows, window_span = LIVE_WINDOWS[live_window]
+filter_key = (tuple(region_filter), tuple(category_filter))
+if st.session_state.live_window != live_window:
+    # A different window is read from the database afresh
+    st.session_state.db_reader = SalesDatabaseReader(rows=window_rows, span=window_span)
+    st.session_state.aggregates = SalesAggregates(
+        window=window_rows, span=window_span, regions=region_filter, categories=category_filter
+    )
+    st.session_state.live_window = live_window
+    st.session_state.aggregates_filters = filter_key
+elif st.session_state.aggregates_filters != filter_key:
+    # Re-filter the window already held in memory
+    window = st.session_state.aggregates
+    st.session_state.aggregates = SalesAggregates(
+        window=window_rows, span=window_span, regions=region_filter, categories=category_filter
+    )
+    st.session_state.aggregates.add_columns(window.columns)
+    st.session_state.aggregates_filters = filter_key
+aggregates = st.session_state.aggregates
 
-# Calculate target (mean + 15%)
-rep_target = sales_rep_performance['final_price_after_discount'].mean() * 1.15
+# Note the version before reading so anything published after it triggers a rerun
+st.session_state.data_version = read_data_version()
+aggregates.add_columns(load_sales_data())
+aggregates.evict()  # A time window also moves on when nothing new arrived
+watch_for_new_data()
 
-fig = px.bar(sales_rep_performance, x='sales_rep', y='final_price_after_discount',
-             hover_data=['number_of_transactions'], template='plotly_dark',
-             labels={'final_price_after_discount': 'Total Revenue'})
+if not len(aggregates):
+    st.warning("Waiting for initial data...")
+    st.stop()
+
+# Everything below needs pandas and plotly. They are imported only now, once the header
+# and filters are on screen, and the background prewarm has usually loaded them already.
+import pandas as pd
+import plotly.express as px
+
+df = aggregates.frame()
+
+# ✅ Data Export Section (after df is defined)
+st.markdown("### Data Export")
+col_exp1, col_exp2 = st.columns(2)
+
+with col_exp1:
+    # Small views are written on every rerun; larger ones only when asked for
+    if len(df) > CURRENT_VIEW_PREPARE_ROWS and st.button(
+        "📄 Prepare Current View", help=f"Views over {CURRENT_VIEW_PREPARE_ROWS:,} rows are written on request"
+    ):
+        # A snapshot: it is kept as prepared while new sales keep arriving
+        st.session_state.current_view = df.to_csv(index=False).encode('utf-8')
+    if len(df) <= CURRENT_VIEW_PREPARE_ROWS:
+        csv_current = df.to_csv(index=False).encode('utf-8') if not df.empty else None
+    else:
+        csv_current = st.session_state.get('current_view')
+    st.download_button(
+        label="⬇️ Download Current View",
+        data=csv_current,
+        file_name='current_sales_data.csv',
+        mime='text/csv',
+        disabled=csv_current is None,
+        help="Download currently filtered data"
+    )
+
+with col_exp2:
+    # The full history is only read from the database when someone asks for it
+    compress_history = st.checkbox("Gzip full history", value=False)
+    if st.button("📦 Prepare Full History", help="Export historical data matching the selected filters from database"):
+        st.session_state.history_export = prepare_historical_export(
+            compress_history, region_filter, category_filter
+        )
+
+    history_path = st.session_state.get('history_export')
+    if history_path and os.path.exists(history_path):
+        with open(history_path, 'rb') as f:
+            st.download_button(
+                label="⬇️ Download Full History",
+                data=f,
+                file_name=os.path.basename(history_path),
+                mime='application/gzip' if history_path.endswith('.gz') else 'text/csv',
+                help="Download complete historical data from database"
+            )
+
+# KPI Cards - Removed Transactions and Top Region cards
+st.subheader("Key Metrics")
+kpi1, kpi2, kpi3 = st.columns(3)
+with kpi1:
+    create_kpi_card(f"P{aggregates.total_revenue:,.2f}", "Total Revenue")
+with kpi2:
+    create_kpi_card(f"P{aggregates.avg_order:,.2f}", "Avg Order")
+with kpi3:
+    create_kpi_card(aggregates.top_product or "N/A", "Top Product")
+
+# Charts with added headings
+st.subheader("Sales Analytics")
+
+# First row of charts
+col1, col2 = st.columns(2)
+with col1:
+    st.markdown("#### Revenue by Region")
+    with metrics.span("dashboard_chart_seconds", "Time to aggregate, build and render one chart block", chart="region"):
+        region_sales = aggregates.revenue_by('region_of_sales')
+        st.plotly_chart(cached_figure('region', region_sales, build_region_chart), use_container_width=True)
+
+with col2:
+    st.markdown("#### Product Category Distribution")
+    with metrics.span("dashboard_chart_seconds", "Time to aggregate, build and render one chart block", chart="category"):
+        category_sales = aggregates.counts_by('product_category')
+        st.plotly_chart(
+            cached_figure('category', category_sales,
+                          lambda data: create_chart('pie', data, names='product_category', values='count')),
+            use_container_width=True
+        )
+
+# Second row of charts
+col3, col4 = st.columns(2)
+with col3:
+    st.markdown("#### Revenue by Customer Type")
+    with metrics.span("dashboard_chart_seconds", "Time to aggregate, build and render one chart block", chart="customer"):
+        customer_sales = aggregates.revenue_by('customer_type')
+        st.plotly_chart(cached_figure('customer', customer_sales, build_customer_chart), use_container_width=True)
+
+with col4:
+    st.markdown("#### Payment Method Distribution")
+    with metrics.span("dashboard_chart_seconds", "Time to aggregate, build and render one chart block", chart="payment"):
+        payment_counts = aggregates.counts_by('payment_method')
+        st.plotly_chart(cached_figure('payment', payment_counts, build_payment_chart), use_container_width=True)
+
+# Third row of charts
+col5, col6 = st.columns(2)
+with col5:
+    st.markdown("#### Top 5 Products by Revenue")
+    with metrics.span("dashboard_chart_seconds", "Time to aggregate, build and render one chart block", chart="top_products"):
+        top_products = aggregates.top_products(5)
+        st.plotly_chart(cached_figure('top_products', top_products, build_top_products_chart),
+                        use_container_width=True)
+
+with col6:
+    st.markdown("#### Price vs Quantity Scatter Plot")
+    with metrics.span("dashboard_chart_seconds", "Time to aggregate, build and render one chart block", chart="scatter"):
+        st.plotly_chart(cached_figure('scatter', df, build_scatter_chart, key=aggregates.version),
+                        use_container_width=True)
+        if len(df) > SCATTER_MAX_POINTS:
+            st.caption(f"{len(df):,} sales binned by price and quantity; marker size is the bin's revenue")
+
+# Fourth row - Sales Rep Performance with Targets
+st.markdown("#### Sales Performance by Representative")
+with metrics.span("dashboard_chart_seconds", "Time to aggregate, build and render one chart block", chart="sales_rep"):
+    sales_rep_performance = aggregates.sales_rep_performance()
+    st.plotly_chart(cached_figure('sales_rep', sales_rep_performance, build_sales_rep_chart),
+                    use_container_width=True)
 
-# Add target line and highlight top performers
-fig.add_hline(y=rep_target, line_dash="dot", line_color="#00f2ff",
-             annotation_text=f"Target: P{rep_target:,.2f}")
+# Historical totals - only grouped rows cross from SQLite into Python
+st.markdown("#### Historical Revenue")
+if st.checkbox("Show totals from the sales history", value=False):
+    history_window = st.selectbox("History window", list(HISTORY_WINDOWS))
+    window_span = HISTORY_WINDOWS[history_window]
+    history_start = datetime.now() - window_span if window_span else None
+    hist_kpis, hist_regions, hist_categories = get_historical_totals(region_filter, category_filter, history_start)
+    if hist_kpis and hist_kpis['orders']:
+        hist1, hist2, hist3 = st.columns(3)
+        with hist1:
+            create_kpi_card(f"{hist_kpis['orders']:,}", "Orders")
+        with hist2:
+            create_kpi_card(f"P{hist_kpis['total_revenue']:,.2f}", "Total Revenue")
+        with hist3:
+            create_kpi_card(f"P{hist_kpis['avg_order']:,.2f}", "Avg Order")
 
-st.plotly_chart(fig, use_container_width=True)
+        hist_col1, hist_col2 = st.columns(2)
+        with hist_col1:
+            st.plotly_chart(
+                create_chart('bar', hist_regions, x='region_of_sales', y='final_price_after_discount'),
+                use_container_width=True
+            )
+        with hist_col2:
+            st.plotly_chart(
+                create_chart('bar', hist_categories, x='product_category', y='final_price_after_discount'),
+                use_container_width=True
+            )
 
-# Auto-refresh
-time.sleep(3)
-st.rerun()
+# Share the timings of this Streamlit process with the Flask /metrics route
+metrics.publish("dashboard")
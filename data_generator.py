@@ -1,9 +1,16 @@
 import sqlite3
-import json
 import random
 import time
-import os
+import argparse
+import itertools
+import multiprocessing
 from datetime import datetime
+import metrics
+from live_data import bump_data_version
+from sales_schema import (CATALOG_TABLE, SALES_DB, DimensionEncoder, apply_retention, compact_partitions,
+                          create_partition, create_sales_schema, drop_sales_schema, fix_null_total_keys,
+                          has_day_totals, has_null_total_keys, insert_fact_sql, is_legacy_schema, is_unpartitioned,
+                          migrate_sales_table, partition_day, partition_fact_table, rebuild_day_totals)
 
 # Configuration for sales data - Updated for AI solutions company
 PRODUCT_CATEGORIES = [
@@ -28,97 +35,110 @@ SALES_REPS = [
     "Emily Davis", 
     "David Wilson"
 ]
+METHODS = ["GET", "POST"]
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+    "AppleWebKit/537.36 (KHTML, like Gecko)",
+    "Chrome/91.0.4472.124 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X)"
+]
+DISCOUNTS = [0, 5, 10, 15, 20, 25]  # Larger possible discounts
+RESPONSE_CODES = [200, 201, 400, 404, 500]
+
+# Product names are "<prefix> <base> v<1-5>.<0-9>" with words that suit the category
+PRODUCT_PREFIXES = {
+    "Business Intelligence": ["Enterprise", "Advanced", "Executive", "Strategic"],
+    "Data Analytics": ["Insight", "Analytic", "Data", "Intelligence"],
+    "AI Solutions": ["AI", "Smart", "Cognitive", "Automated"],
+    "ICT Infrastructure": ["Secure", "Cloud", "Network", "Infra"],
+    "Cloud Services": ["Cloud", "Hybrid", "Enterprise", "Secure"],
+    "Predictive Modeling": ["Predict", "Forecast", "Trend", "Future"]
+}
+PRODUCT_BASES = {
+    "Business Intelligence": ["Dashboard", "Suite", "Platform", "Analytics"],
+    "Data Analytics": ["Engine", "Workbench", "Studio", "Hub"],
+    "AI Solutions": ["Assistant", "Engine", "Solution", "Service"],
+    "ICT Infrastructure": ["Framework", "Architecture", "System", "Solution"],
+    "Cloud Services": ["Hosting", "Computing", "Storage", "Services"],
+    "Predictive Modeling": ["Modeler", "Analyzer", "Forecaster", "Planner"]
+}
+
+# Seed values for the dimension tables, in code order
+DIMENSION_VOCABULARIES = {
+    "product_category": PRODUCT_CATEGORIES,
+    "payment_method": PAYMENT_METHODS,
+    "country": COUNTRIES,
+    "region_of_sales": REGIONS,
+    "city": CITIES,
+    "customer_type": CUSTOMER_TYPES,
+    "industry": INDUSTRIES,
+    "sales_rep": SALES_REPS,
+    "user_agent": USER_AGENTS,
+    "method": METHODS
+}
+
+JOURNAL_MODES = ["DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"]
+
+# Per-process sequence so IDs stay unique even when many rows share a millisecond
+_sale_sequence = itertools.count(random.randint(0, 8999))
 
 def generate_product_name(category):
     """Generate realistic AI/tech product names based on category"""
-    prefixes = {
-        "Business Intelligence": ["Enterprise", "Advanced", "Executive", "Strategic"],
-        "Data Analytics": ["Insight", "Analytic", "Data", "Intelligence"],
-        "AI Solutions": ["AI", "Smart", "Cognitive", "Automated"],
-        "ICT Infrastructure": ["Secure", "Cloud", "Network", "Infra"],
-        "Cloud Services": ["Cloud", "Hybrid", "Enterprise", "Secure"],
-        "Predictive Modeling": ["Predict", "Forecast", "Trend", "Future"]
-    }
-    base_names = {
-        "Business Intelligence": ["Dashboard", "Suite", "Platform", "Analytics"],
-        "Data Analytics": ["Engine", "Workbench", "Studio", "Hub"],
-        "AI Solutions": ["Assistant", "Engine", "Solution", "Service"],
-        "ICT Infrastructure": ["Framework", "Architecture", "System", "Solution"],
-        "Cloud Services": ["Hosting", "Computing", "Storage", "Services"],
-        "Predictive Modeling": ["Modeler", "Analyzer", "Forecaster", "Planner"]
-    }
-    prefix = random.choice(prefixes.get(category, ["Advanced", "Enterprise"]))
-    base = random.choice(base_names.get(category, ["Solution", "Platform"]))
+    prefix = random.choice(PRODUCT_PREFIXES.get(category, ["Advanced", "Enterprise"]))
+    base = random.choice(PRODUCT_BASES.get(category, ["Solution", "Platform"]))
     return f"{prefix} {base} v{random.randint(1, 5)}.{random.randint(0, 9)}"
 
 def create_sales_database():
-    """Create SQLite database with updated sales table structure including sales rep"""
-    conn = sqlite3.connect("sales_data.db")
-    cursor = conn.cursor()
+    """Create an empty sales schema: dimension tables, partition catalog, daily summary and sales view"""
+    conn = sqlite3.connect(SALES_DB)
     
-    # First drop the existing table if it has the old schema
-    cursor.execute("DROP TABLE IF EXISTS sales")
+    # First drop whatever schema is there, old or new
+    drop_sales_schema(conn)
     
-    # Create new table with updated schema
-    cursor.execute("""
-    CREATE TABLE sales (
-        sales_id TEXT PRIMARY KEY,
-        product_id TEXT,
-        product_name TEXT,
-        product_category TEXT,
-        total_sales_revenue REAL,
-        number_of_transactions INTEGER,
-        quantity_sold INTEGER,
-        unit_price REAL,
-        discount_applied_pct REAL,
-        final_price_after_discount REAL,
-        payment_method TEXT,
-        country TEXT,
-        region_of_sales TEXT,
-        city TEXT,
-        customer_type TEXT,
-        industry TEXT,
-        sales_rep TEXT,  -- This is the new column
-        timestamp TEXT,
-        date TEXT,
-        ip_address TEXT,
-        method TEXT,
-        page_accessed TEXT,
-        response_code INTEGER,
-        user_agent TEXT
-    )
-    """)
+    # Repeated strings are stored once in the dimension tables, seeded from the vocabularies above.
+    # Day partitions (with their indexes) are created as the first row of each day arrives.
+    create_sales_schema(conn, DIMENSION_VOCABULARIES)
     conn.commit()
     conn.close()
 
 def verify_table_structure():
-    """Verify the table has the correct structure before inserting data"""
-    conn = sqlite3.connect("sales_data.db")
-    cursor = conn.cursor()
+    """Verify the database has the current schema before inserting data"""
+    conn = sqlite3.connect(SALES_DB)
     
     try:
-        # Get table info
-        cursor.execute("PRAGMA table_info(sales)")
-        columns = cursor.fetchall()
-        
-        # Check if sales_rep column exists
-        has_sales_rep = any(col[1] == 'sales_rep' for col in columns)
-        
-        if not has_sales_rep:
-            print("⚠️ Table structure outdated - recreating table")
+        if is_legacy_schema(conn):
+            # Keep the existing rows, just move the strings into dimension tables and split them by day
+            print("🔄 Moving sales table to day partitions with dictionary-encoded dimensions")
+            migrate_sales_table(conn, DIMENSION_VOCABULARIES)
+        elif is_unpartitioned(conn):
+            print("🔄 Splitting sales_facts into day partitions")
+            partition_fact_table(conn, DIMENSION_VOCABULARIES)
+        elif conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (CATALOG_TABLE,)).fetchone() is None:
+            print("⚠️ Sales tables missing - creating them")
             create_sales_database()
+        elif not has_day_totals(conn):
+            # New partitions get day totals triggers, so the table must exist before the next insert
+            print("🔄 Summing existing partitions into the day totals")
+            with conn:
+                conn.execute("BEGIN")
+                rebuild_day_totals(conn)
+        if has_null_total_keys(conn):
+            # Totals written before missing values were keyed by sentinels
+            with conn:
+                conn.execute("BEGIN")
+                fix_null_total_keys(conn)
     finally:
         conn.close()
 
 def generate_sales_record():
     """Generate a complete sales transaction record with guaranteed unique ID"""
     timestamp = datetime.now()
-    unique_id = f"SALE-{int(timestamp.timestamp() * 1000)}-{random.randint(1000, 9999)}"
+    unique_id = f"SALE-{int(timestamp.timestamp() * 1000)}-{1000 + next(_sale_sequence) % 9000}"
     
     product_category = random.choice(PRODUCT_CATEGORIES)
     unit_price = round(random.uniform(1000, 25000), 2)  # Higher prices for enterprise software
     quantity = random.randint(1, 5)  # Typically selling fewer high-value items
-    discount = random.choice([0, 5, 10, 15, 20, 25])  # Larger possible discounts
+    discount = random.choice(DISCOUNTS)
     
     total_sales = unit_price * quantity
     final_price = total_sales * (1 - discount/100)
@@ -144,60 +164,28 @@ def generate_sales_record():
         "timestamp": timestamp.isoformat(),
         "date": timestamp.strftime("%Y-%m-%d"),
         "ip_address": f"{random.randint(1, 255)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(0, 255)}",
-        "method": random.choice(["GET", "POST"]),
+        "method": random.choice(METHODS),
         "page_accessed": f"/solution/{random.randint(1000, 9999)}",
-        "response_code": random.choice([200, 201, 400, 404, 500]),
-        "user_agent": random.choice([
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
-            "AppleWebKit/537.36 (KHTML, like Gecko)",
-            "Chrome/91.0.4472.124 Safari/537.36",
-            "Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X)"
-        ])
+        "response_code": random.choice(RESPONSE_CODES),
+        "user_agent": random.choice(USER_AGENTS)
     }
 
 def generate_batch_data(num_records=5):
     """Generate multiple sales records at once"""
     return [generate_sales_record() for _ in range(num_records)]
 
-def update_json_file(new_records):
-    """Update the JSON file with new records while maintaining last 100 records"""
-    try:
-        # Try to load existing data
-        if os.path.exists("sales_dashboard_data.json"):
-            with open("sales_dashboard_data.json", "r") as f:
-                existing_data = json.load(f)
-        else:
-            existing_data = []
-    except (FileNotFoundError, json.JSONDecodeError):
-        existing_data = []
-    
-    # Combine and limit to last 100 records
-    updated_data = (existing_data + new_records)[-100:]
-    
-    # Save to file
-    with open("sales_dashboard_data.json", "w") as f:
-        json.dump(updated_data, f, indent=2, default=str)
-    
-    return len(new_records)
-
+@metrics.timed("generator_insert_sales_record_seconds", "Time to insert one record with insert_sales_record")
 def insert_sales_record(record):
     """Insert a sales record into the database with error handling"""
     try:
         # Verify table structure before inserting
         verify_table_structure()
         
-        conn = sqlite3.connect("sales_data.db")
+        conn = sqlite3.connect(SALES_DB)
         cursor = conn.cursor()
         
-        cursor.execute("""
-        INSERT INTO sales VALUES (
-            :sales_id, :product_id, :product_name, :product_category,
-            :total_sales_revenue, :number_of_transactions, :quantity_sold, :unit_price,
-            :discount_applied_pct, :final_price_after_discount, :payment_method,
-            :country, :region_of_sales, :city, :customer_type, :industry, :sales_rep,
-            :timestamp, :date, :ip_address, :method, :page_accessed, :response_code, :user_agent
-        )
-        """, record)
+        table = create_partition(conn, partition_day(record))
+        cursor.execute(insert_fact_sql(table), DimensionEncoder(conn).encode(record))
         
         conn.commit()
         return True
@@ -208,13 +196,253 @@ def insert_sales_record(record):
         if 'conn' in locals():
             conn.close()
 
+class SalesWriter:
+    """
+    Batched writer that keeps one connection open to the sales database
+
+    The schema is checked once when the writer is opened. Each call to write()
+    inserts a whole batch with executemany (one per day partition it touches),
+    and rows are committed together once commit_size of them are pending
+    (group commit). With retain_days set, partitions that fall out of the
+    retention period are folded into the daily summary whenever a new day's
+    partition is created.
+    """
+
+    def __init__(self, db_path=SALES_DB, commit_size=1, journal_mode="WAL", retain_days=None):
+        if journal_mode.upper() not in JOURNAL_MODES:
+            raise ValueError(f"Unknown journal mode: {journal_mode}")
+
+        verify_table_structure()
+
+        self.commit_size = max(1, commit_size)
+        self.retain_days = retain_days
+        self.pending = 0
+        self.partitions = {}  # day -> partition table, for the days written so far
+        self.conn = sqlite3.connect(db_path, isolation_level=None)
+        self.conn.execute(f"PRAGMA journal_mode={journal_mode.upper()}")
+        if journal_mode.upper() == "WAL":
+            # WAL only needs an fsync at checkpoints when synchronous is NORMAL
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.encoder = DimensionEncoder(self.conn)
+
+    def partition(self, day):
+        """Table for one day's rows, created (and old days compacted) on first use"""
+        table = self.partitions.get(day)
+        if table is None:
+            table = self.partitions[day] = create_partition(self.conn, day)
+            if self.retain_days is not None:
+                folded, rows = compact_partitions(self.conn, self.retain_days)
+                if folded:
+                    print(f"🗜️ Folded {folded} old partitions ({rows:,} rows) into the daily summary")
+        return table
+
+    def write(self, records):
+        """Insert a batch of records, returning how many were written"""
+        if not records:
+            return 0
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN")
+
+        # A savepoint lets a bad batch roll back without losing earlier pending rows
+        self.conn.execute("SAVEPOINT batch")
+        try:
+            with metrics.span("generator_write_batch_seconds", "Time to insert one batch with SalesWriter"):
+                by_day = {}
+                for record in records:
+                    by_day.setdefault(partition_day(record), []).append(record)
+                for day, rows in by_day.items():
+                    self.conn.executemany(insert_fact_sql(self.partition(day)), self.encoder.encode_all(rows))
+            self.conn.execute("RELEASE batch")
+        except sqlite3.Error as e:
+            self.conn.execute("ROLLBACK TO batch")
+            self.conn.execute("RELEASE batch")
+            self.encoder.reload()  # Codes and partitions added by the failed batch were rolled back too
+            self.partitions.clear()
+            metrics.count("generator_write_errors_total", help="Batches rolled back after a database error")
+            print(f"⚠️ Database error: {e}")
+            return 0
+
+        metrics.count("generator_rows_written_total", len(records), help="Sales rows inserted")
+        self.pending += len(records)
+        if self.pending >= self.commit_size:
+            self.commit()
+        return len(records)
+
+    def commit(self):
+        """Commit any pending rows"""
+        if self.conn.in_transaction:
+            with metrics.span("generator_commit_seconds", "Time to commit pending rows"):
+                self.conn.execute("COMMIT")
+        self.pending = 0
+
+    def close(self):
+        self.commit()
+        self.conn.execute("PRAGMA optimize")  # Refresh planner statistics for the indexes
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def paced_batches(rate, burst, duration=None):
+    """Yield generated batches as fast as the token bucket allows (rate rows/sec, burst rows max per batch)"""
+    tokens = burst
+    last = started = time.monotonic()
+
+    while duration is None or last - started < duration:
+        now = time.monotonic()
+        tokens = min(burst, tokens + (now - last) * rate)
+        last = now
+
+        if tokens < 1:
+            time.sleep((1 - tokens) / rate)
+            continue
+
+        batch = generate_batch_data(int(tokens))
+        tokens -= len(batch)
+        yield batch
+
+def interactive_batches(duration=None):
+    """Yield 3-8 records every 2-5 seconds, like the interactive generator"""
+    started = time.monotonic()
+    while duration is None or time.monotonic() - started < duration:
+        yield generate_batch_data(random.randint(3, 8))
+        time.sleep(random.uniform(2, 5))  # Random delay between 2-5 seconds
+
+def run_load_test(writer, rate, burst, duration=None):
+    """Generate rows as fast as the token bucket allows (rate rows/sec, burst rows max per batch)"""
+    started = report_at = time.monotonic()
+    written = reported = 0
+
+    for batch in paced_batches(rate, burst, duration):
+        written += writer.write(batch)
+        if not writer.pending:
+            bump_data_version()  # Only once the rows are committed, or dashboards would read nothing new
+        metrics.publish("generator")
+
+        now = time.monotonic()
+        if now - report_at >= 1:
+            print(f"⚡ {written - reported:,} rows in {now - report_at:.1f}s | "
+                  f"{(written - reported) / (now - report_at):,.0f} rows/s | total {written:,}")
+            report_at, reported = now, written
+
+    writer.commit()
+    bump_data_version()
+    metrics.publish("generator", force=True)
+    elapsed = time.monotonic() - started
+    print(f"✅ Load test wrote {written:,} rows in {elapsed:.1f}s ({written / max(elapsed, 1e-9):,.0f} rows/s)")
+
+def produce(sink, index=0, producers=1, rate=0, burst=1, duration=None):
+    """
+    Producer process: generate batches and put them on the ingest queue
+
+    rate is this producer's share of the rows per second; 0 paces it like
+    the interactive generator.
+    """
+    global _sale_sequence
+    random.seed()  # Forked producers would otherwise all generate the same records
+    # Producer i takes every producers-th sequence number, so IDs made in the same millisecond differ
+    _sale_sequence = itertools.count(index, producers)
+
+    batches = paced_batches(rate, burst, duration) if rate > 0 else interactive_batches(duration)
+    try:
+        for batch in batches:
+            sink.put(batch)
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as e:
+        print(f"⚠️ Producer {index} stopping: {e}")
+
+def run_producers(args):
+    """Generate in several processes and insert everything through one ingest service writer"""
+    # Imported here because ingest_service itself builds on this module
+    from ingest_service import QUEUE_BATCHES, IngestService, report_progress
+
+    context = multiprocessing.get_context()
+    rate = args.rate / args.producers
+    burst = args.burst or max(1, int(rate / 10))
+    service = IngestService(commit_rows=args.commit_size or max(burst * args.producers, 1000),
+                            journal_mode=args.journal_mode, retain_days=args.retain_days,
+                            queue=context.Queue(QUEUE_BATCHES), failed=context.Event())
+    workers = [
+        context.Process(target=produce, args=(service.producer(), index, args.producers, rate, burst, args.duration),
+                        daemon=True)
+        for index in range(args.producers)
+    ]
+    for worker in workers:
+        worker.start()
+    service.start()  # After the producers are forked, so they do not inherit the writer thread
+    print(f"🏭 {args.producers} producers feeding one writer")
+
+    started = time.monotonic()
+    try:
+        while any(worker.is_alive() for worker in workers):
+            since, written = time.monotonic(), service.written
+            for worker in workers:
+                worker.join(timeout=max(0.0, since + 1 - time.monotonic()))
+            report_progress(service, since, written)
+    except KeyboardInterrupt:
+        print("\n🛑 Data generator stopped by user")
+        for worker in workers:
+            worker.join()  # Producers stop on the same Ctrl+C
+    finally:
+        service.stop()  # Writes and commits whatever is still queued
+    elapsed = time.monotonic() - started
+    print(f"✅ Wrote {service.written:,} rows in {elapsed:.1f}s ({service.written / max(elapsed, 1e-9):,.0f} rows/s), "
+          f"{service.errors} failed batches")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic sales data")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="Rows per second for load testing (default: interactive 3-8 rows every 2-5s)")
+    parser.add_argument("--burst", type=int, default=None,
+                        help="Largest batch generated at once in load-test mode (default: rate / 10)")
+    parser.add_argument("--commit-size", type=int, default=None,
+                        help="Rows to group into one commit (default: one batch per commit)")
+    parser.add_argument("--journal-mode", default="WAL", choices=JOURNAL_MODES, type=str.upper,
+                        help="SQLite journal mode for the writer connection")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="Stop the load test after this many seconds")
+    parser.add_argument("--retain-days", type=int, default=None,
+                        help="Fold day partitions older than this into the daily summary (default: keep all)")
+    parser.add_argument("--producers", type=int, default=0,
+                        help="Generate in this many processes, all inserting through one ingest service writer")
+    parser.add_argument("--reset", action="store_true",
+                        help="Delete all stored sales and start from an empty database")
+    return parser.parse_args()
+
 def main():
     """Main data generation loop"""
-    # Remove old database if it exists
-    if os.path.exists("sales_data.db"):
-        os.remove("sales_data.db")
-    
-    create_sales_database()  # Create fresh database with new schema
+    args = parse_args()
+
+    # Sales collected so far are kept across restarts unless asked otherwise
+    if args.reset:
+        create_sales_database()
+    verify_table_structure()  # Creates, migrates or partitions the database as needed
+
+    if args.retain_days is not None:
+        folded, rows = apply_retention(SALES_DB, args.retain_days)
+        if folded:
+            print(f"🗜️ Folded {folded} old partitions ({rows:,} rows) into the daily summary and vacuumed")
+
+    if args.producers > 0:
+        run_producers(args)
+        return
+
+    if args.rate > 0:
+        burst = args.burst or max(1, int(args.rate / 10))
+        with SalesWriter(commit_size=args.commit_size or burst, journal_mode=args.journal_mode,
+                         retain_days=args.retain_days) as writer:
+            try:
+                run_load_test(writer, args.rate, burst, args.duration)
+            except KeyboardInterrupt:
+                print("\n🛑 Data generator stopped by user")
+        return
+
+    writer = SalesWriter(commit_size=args.commit_size or 1, journal_mode=args.journal_mode,
+                         retain_days=args.retain_days)
     
     while True:
         try:
@@ -223,15 +451,13 @@ def main():
             sales_data = generate_batch_data(batch_size)
             
             # Insert into database
-            successful_inserts = 0
-            for record in sales_data:
-                if insert_sales_record(record):
-                    successful_inserts += 1
+            successful_inserts = writer.write(sales_data)
             
-            # Update JSON file
-            json_count = update_json_file(sales_data)
+            if not writer.pending:
+                bump_data_version()  # Wakes up any open dashboards once the rows are committed
+            metrics.publish("generator")
             
-            print(f"✅ Generated {batch_size} records | DB: {successful_inserts}/{batch_size} inserted | JSON: {json_count} updated at {datetime.now().strftime('%H:%M:%S')}")
+            print(f"✅ Generated {batch_size} records | DB: {successful_inserts}/{batch_size} inserted at {datetime.now().strftime('%H:%M:%S')}")
             
             time.sleep(random.uniform(2, 5))  # Random delay between 2-5 seconds
             
@@ -242,5 +468,9 @@ def main():
             print(f"⚠️ Unexpected error: {e}")
             time.sleep(5)  # Wait before retrying
 
+    writer.close()
+    bump_data_version()
+    metrics.publish("generator", force=True)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,165 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from export_reports import ROW_COMPRESSIONS, ROW_DATASETS, ROW_FORMATS, export_rows, resolve_time_range
+
+EXPORT_DIR = "exports"
+MAX_WORKERS = 2
+MAX_PENDING_JOBS = 20
+RETENTION_SECONDS = 24 * 60 * 60
+CLEANUP_INTERVAL = 60  # Status and download requests sweep expired exports at most this often (seconds)
+
+def run_export_job(job_id, params, filename, progress):
+    """Runs in a worker process; reports rows written through the shared progress dict"""
+    def report(rows):
+        progress[job_id] = rows
+    return export_rows(progress=report, filename=filename, **params)
+
+class ExportJobManager:
+    """
+    Runs row exports in a bounded process pool and tracks their status
+
+    Jobs are kept in memory for the life of the app process. Finished files
+    live under exports/ and are removed once they are older than the
+    retention period, swept on every submit and now and then on status and
+    download requests.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, export_dir=EXPORT_DIR, retention=RETENTION_SECONDS):
+        self.max_workers = max_workers
+        self.export_dir = export_dir
+        self.retention = retention
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.executor = None
+        self.progress = None
+        self.last_cleanup = float("-inf")
+
+    def _start(self):
+        # The pool and progress manager are only spun up for the first job
+        if self.executor is None:
+            self.progress = multiprocessing.Manager().dict()
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def submit(self, dataset='sales', file_format='csv', time_range='last_hour', compression=None):
+        """Queue an export and return its job id"""
+        if dataset not in ROW_DATASETS:
+            raise ValueError(f"Unknown dataset: {dataset}")
+        if file_format not in ROW_FORMATS:
+            raise ValueError(f"Unsupported export format: {file_format}")
+        if compression is not None and compression not in ROW_COMPRESSIONS[file_format]:
+            raise ValueError(f"Unsupported compression for {file_format}: {compression}")
+        try:
+            resolve_time_range(time_range)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid time range: {e}")
+
+        self.cleanup()
+        with self.lock:
+            pending = sum(1 for job in self.jobs.values() if job["status"] in ("queued", "running"))
+            if pending >= MAX_PENDING_JOBS:
+                raise RuntimeError("Too many exports in progress, try again later")
+
+            self._start()
+            job_id = uuid.uuid4().hex
+            extension = ROW_FORMATS[file_format]
+            if compression == "gzip" and extension in (".csv", ".jsonl"):
+                extension += ".gz"
+            os.makedirs(self.export_dir, exist_ok=True)
+            filename = os.path.join(self.export_dir, f"{dataset}_export_{job_id}{extension}")
+
+            params = {
+                "dataset": dataset,
+                "file_format": file_format,
+                "time_range": time_range,
+                "compression": compression
+            }
+            job = {
+                "id": job_id,
+                "status": "queued",
+                "params": params,
+                "filename": filename,
+                "created": time.time(),
+                "finished": None,
+                "report": None,
+                "error": None
+            }
+            self.jobs[job_id] = job
+            job["future"] = self.executor.submit(run_export_job, job_id, params, filename, self.progress)
+
+        job["future"].add_done_callback(lambda future: self._finished(job_id, future))
+        return job_id
+
+    def _finished(self, job_id, future):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job["finished"] = time.time()
+            try:
+                job["report"] = future.result()
+                job["status"] = "done"
+            except Exception as e:
+                job["error"] = str(e)
+                job["status"] = "failed"
+            self.progress.pop(job_id, None)
+
+    def status(self, job_id):
+        """JSON-friendly status for a job, or None if it is unknown"""
+        self.sweep()
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] == "queued" and job["future"].running():
+                job["status"] = "running"
+            status = {key: value for key, value in job.items() if key not in ("future", "filename")}
+
+        if status["status"] in ("queued", "running"):
+            status["rows"] = self.progress.get(job_id, 0)
+        elif status["report"]:
+            status["rows"] = status["report"]["rows"]
+        return status
+
+    def download_path(self, job_id):
+        """Path of a finished export, or None if it is not ready"""
+        self.sweep()
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job["status"] != "done" or not os.path.exists(job["filename"]):
+                return None
+            return job["filename"]
+
+    def sweep(self):
+        """cleanup(), unless it already ran within the last CLEANUP_INTERVAL seconds"""
+        if time.monotonic() - self.last_cleanup >= CLEANUP_INTERVAL:
+            self.cleanup()
+
+    def cleanup(self):
+        """Delete exports older than the retention period and forget their jobs"""
+        self.last_cleanup = time.monotonic()
+        cutoff = time.time() - self.retention
+        if os.path.isdir(self.export_dir):
+            for name in os.listdir(self.export_dir):
+                path = os.path.join(self.export_dir, name)
+                try:
+                    if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass  # Still being written or already gone
+
+        with self.lock:
+            expired = [
+                job_id for job_id, job in self.jobs.items()
+                if job["finished"] is not None and job["finished"] < cutoff
+            ]
+            for job_id in expired:
+                del self.jobs[job_id]
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
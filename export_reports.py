@@ -1,17 +1,313 @@
 import json
 import csv
-import pandas as pd
-from datetime import datetime
+import io
+import sqlite3
+import time
+import zlib
+import gzip
+import argparse
+from filters import build_where
+from sales_queries import history_query
+from sales_schema import partition_tables
+from datetime import datetime, timedelta
 import os
 
-def export_data(file_format='csv', time_range='last_hour'):
+HISTORY_CHUNK_SIZE = 5000
+EXPORT_CHUNK_SIZE = 10000
+
+# Raw row sources: database and table (both filter on their indexed timestamp column)
+ROW_DATASETS = {
+    'sales': ('sales_data.db', 'sales'),
+    'logs': ('logs.db', 'access_logs')
+}
+
+ROW_FORMATS = {
+    'csv': '.csv',
+    'jsonl': '.jsonl',
+    'json': '.jsonl',  # Rows are always written as JSON Lines so they can stream
+    'parquet': '.parquet',
+    'feather': '.feather'
+}
+
+# Codecs each row format can write with (None for uncompressed)
+ROW_COMPRESSIONS = {
+    'csv': ('gzip',),
+    'jsonl': ('gzip',),
+    'json': ('gzip',),
+    'parquet': ('snappy', 'zstd', 'gzip'),
+    'feather': ('zstd', 'lz4')
+}
+
+# Formats export_summary() writes, which export_data() still produces when no time range is given
+SUMMARY_FORMATS = ('csv', 'excel', 'json')
+DEFAULT_ROW_RANGE = 'last_hour'
+
+def stream_sales_history(db_path='sales_data.db', chunk_size=HISTORY_CHUNK_SIZE, compress=False,
+                         regions=None, categories=None):
     """
-    Export dashboard data in various formats
-    
+    Yield the full sales history as CSV bytes, newest first, one chunk at a time
+
+    Rows are pulled from SQLite with fetchmany so memory stays bounded by
+    chunk_size no matter how large the table grows. With compress=True the
+    chunks form a single gzip stream. Region and category filters are
+    applied in SQL.
+    """
+    gzip_stream = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return gzip_stream.compress(data) if gzip_stream else data
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.execute(*history_query(regions, categories, tables=partition_tables(conn)))
+        writer.writerow([col[0] for col in cursor.description])
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            writer.writerows(rows)
+            chunk = flush()
+            if chunk:
+                yield chunk
+        chunk = flush()
+        if gzip_stream:
+            chunk += gzip_stream.flush()
+        if chunk:
+            yield chunk
+    finally:
+        conn.close()
+
+def export_sales_history(compress=False, db_path='sales_data.db', regions=None, categories=None):
+    """Write the full sales history to exports/ in chunks and return the file path"""
+    os.makedirs('exports', exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"exports/full_sales_history_{timestamp}.csv"
+    if compress:
+        filename += '.gz'
+
+    with open(filename, 'wb') as f:
+        for chunk in stream_sales_history(db_path, compress=compress, regions=regions, categories=categories):
+            f.write(chunk)
+    return filename
+
+def resolve_time_range(time_range, now=None):
+    """
+    Turn a time range into (start, end) datetimes, either of which may be None
+
+    Accepts 'last_hour', 'today', 'all', or a (start, end) pair of
+    datetimes or ISO strings.
+    """
+    now = now or datetime.now()
+    if time_range == 'last_hour':
+        return now - timedelta(hours=1), None
+    if time_range == 'today':
+        return now.replace(hour=0, minute=0, second=0, microsecond=0), None
+    if time_range == 'all' or time_range is None:
+        return None, None
+    if isinstance(time_range, (tuple, list)) and len(time_range) == 2:
+        start, end = (
+            datetime.fromisoformat(value) if isinstance(value, str) else value
+            for value in time_range
+        )
+        if any(value is not None and not isinstance(value, datetime) for value in (start, end)):
+            raise ValueError(f"Unknown time range: {time_range}")
+        if start is not None and end is not None and start > end:
+            raise ValueError(f"Time range starts after it ends: {start} > {end}")
+        return start, end
+    raise ValueError(f"Unknown time range: {time_range}")
+
+def iter_row_chunks(dataset, start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield (columns, rows) chunks for a dataset and time range
+
+    The timestamp bounds are pushed into SQL so SQLite answers with an
+    index range scan (on just the day partitions in range, for sales), and
+    rows are fetched chunk_size at a time.
+    """
+    db_path, table = ROW_DATASETS[dataset]
+    conn = sqlite3.connect(db_path)
+    try:
+        if dataset == 'sales':
+            tables = partition_tables(conn, start, end)
+            cursor = conn.execute(*history_query(start=start, end=end, tables=tables, descending=False))
+        else:
+            where, params = build_where(start=start, end=end)
+            cursor = conn.execute(f"SELECT * FROM {table}{where} ORDER BY timestamp", params)
+        columns = [col[0] for col in cursor.description]
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield columns, rows
+    finally:
+        conn.close()
+
+def open_text_output(filename, compression):
+    if compression == 'gzip':
+        return gzip.open(filename, 'wt', newline='', encoding='utf-8')
+    return open(filename, 'w', newline='', encoding='utf-8')
+
+def write_csv(filename, chunks, compression, on_chunk):
+    with open_text_output(filename, compression) as f:
+        writer = csv.writer(f)
+        header_written = False
+        for columns, rows in chunks:
+            if not header_written:
+                writer.writerow(columns)
+                header_written = True
+            writer.writerows(rows)
+            on_chunk(len(rows))
+
+def write_jsonl(filename, chunks, compression, on_chunk):
+    with open_text_output(filename, compression) as f:
+        for columns, rows in chunks:
+            f.writelines(json.dumps(dict(zip(columns, row)), default=str) + '\n' for row in rows)
+            on_chunk(len(rows))
+
+def write_arrow(filename, chunks, compression, on_chunk, file_format):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        import pyarrow.ipc as ipc
+    except ImportError:
+        raise ImportError(f"pyarrow is required for {file_format} exports (pip install pyarrow)")
+
+    writer = None
+    schema = None
+    try:
+        for columns, rows in chunks:
+            # Build the columns directly so each chunk becomes one record batch
+            arrays = dict(zip(columns, zip(*rows)))
+            batch = pa.RecordBatch.from_pydict({name: list(values) for name, values in arrays.items()})
+            if writer is None:
+                schema = batch.schema
+                if file_format == 'parquet':
+                    writer = pq.ParquetWriter(filename, schema, compression=compression or 'snappy')
+                else:
+                    options = ipc.IpcWriteOptions(compression=compression) if compression else None
+                    writer = ipc.new_file(filename, schema, options=options)
+            else:
+                batch = batch.cast(schema)
+
+            if file_format == 'parquet':
+                writer.write_table(pa.Table.from_batches([batch]))
+            else:
+                writer.write_batch(batch)
+            on_chunk(len(rows))
+    finally:
+        if writer is not None:
+            writer.close()
+
+def export_rows(dataset='sales', file_format='csv', time_range='last_hour', compression=None,
+                chunk_size=EXPORT_CHUNK_SIZE, progress=None, filename=None):
+    """
+    Stream raw rows for a time range to exports/ and return a throughput report
+
     Parameters:
-    - file_format: 'csv', 'excel', or 'json'
-    - time_range: 'last_hour', 'today', or 'all'
+    - dataset: 'sales' (sales_data.db) or 'logs' (access_logs in logs.db)
+    - file_format: 'csv', 'jsonl', 'parquet' or 'feather'
+    - time_range: 'last_hour', 'today', 'all', or a (start, end) pair
+    - compression: 'gzip' for csv/jsonl; 'snappy', 'zstd' or 'gzip' for
+      parquet; 'zstd' or 'lz4' for feather
+    - progress: optional callback receiving the running row count
+    - filename: output path (default: a timestamped name under exports/)
+
+    Only one chunk of rows is held in memory at a time.
+    """
+    if dataset not in ROW_DATASETS:
+        raise ValueError(f"Unknown dataset: {dataset}")
+    if file_format not in ROW_FORMATS:
+        raise ValueError(f"Unsupported row export format: {file_format}")
+    if compression is not None and compression not in ROW_COMPRESSIONS[file_format]:
+        raise ValueError(f"Unsupported compression for {file_format}: {compression} "
+                         f"(choose from {', '.join(ROW_COMPRESSIONS[file_format])})")
+    start, end = resolve_time_range(time_range)
+
+    if filename is None:
+        os.makedirs('exports', exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"exports/{dataset}_export_{timestamp}{ROW_FORMATS[file_format]}"
+        if compression == 'gzip' and file_format in ('csv', 'jsonl', 'json'):
+            filename += '.gz'
+
+    rows_written = 0
+    def on_chunk(count):
+        nonlocal rows_written
+        rows_written += count
+        if progress:
+            progress(rows_written)
+
+    started = time.perf_counter()
+    chunks = iter_row_chunks(dataset, start, end, chunk_size)
+    if file_format == 'csv':
+        write_csv(filename, chunks, compression, on_chunk)
+    elif file_format in ('jsonl', 'json'):
+        write_jsonl(filename, chunks, compression, on_chunk)
+    else:
+        write_arrow(filename, chunks, compression, on_chunk, file_format)
+    elapsed = time.perf_counter() - started
+
+    if not os.path.exists(filename):
+        # Columnar writers only create the file once the first chunk arrives
+        open(filename, 'wb').close()
+
+    return {
+        'filename': filename,
+        'dataset': dataset,
+        'format': file_format,
+        'rows': rows_written,
+        'bytes': os.path.getsize(filename),
+        'seconds': elapsed,
+        'rows_per_second': rows_written / elapsed if elapsed else 0.0
+    }
+
+def resolve_dataset(dataset, file_format, time_range):
+    """
+    The dataset export_data() exports: the one asked for, else the summary
+    when no time range is given and the format has one, else sales rows
     """
+    if dataset is None:
+        dataset = 'summary' if time_range is None and file_format in SUMMARY_FORMATS else 'sales'
+    if dataset == 'summary' and time_range is not None:
+        raise ValueError("The dashboard summary covers no time range; export rows for a time range instead")
+    return dataset
+
+def export_data(file_format='csv', time_range=None, dataset=None, compression=None):
+    """
+    Export data in various formats
+
+    Parameters:
+    - file_format: 'csv', 'jsonl'/'json', 'parquet' or 'feather' for row
+      exports; 'csv', 'excel' or 'json' for the summary
+    - time_range: 'last_hour', 'today', 'all', or a (start, end) pair;
+      rows from the last hour when left out
+    - dataset: 'sales', 'logs', or 'summary' for the dashboard summary.
+      Any time range selects rows ('sales' by default); without one,
+      csv, excel and json export the summary as before
+    - compression: see export_rows
+    """
+    try:
+        dataset = resolve_dataset(dataset, file_format, time_range)
+    except ValueError as e:
+        return False, str(e)
+    if dataset == 'summary':
+        return export_summary(file_format)
+
+    try:
+        report = export_rows(dataset, file_format, time_range or DEFAULT_ROW_RANGE, compression)
+        print(f"📤 Exported {report['rows']:,} {dataset} rows in {report['seconds']:.2f}s "
+              f"({report['rows_per_second']:,.0f} rows/s, {report['bytes']:,} bytes)")
+        return True, report['filename']
+    except Exception as e:
+        return False, str(e)
+
+def export_summary(file_format='csv'):
+    """Export the dashboard summary in dashboard_data.json as csv, excel or json"""
     try:
         # Load the latest data
         with open("dashboard_data.json", "r") as f:
@@ -34,6 +330,7 @@ def export_data(file_format='csv', time_range='last_hour'):
         }
         
         # Convert to DataFrame for CSV/Excel exports
+        import pandas as pd  # Only needed here; the web app starts faster without it
         status_df = pd.DataFrame({
             'status_code': list(export_data['status_codes'].keys()),
             'count': list(export_data['status_codes'].values())
@@ -90,9 +387,22 @@ def generate_report():
     pass
 
 if __name__ == "__main__":
-    # Example usage
-    success, result = export_data(file_format='excel')
+    parser = argparse.ArgumentParser(description="Export sales or log rows for a time range")
+    parser.add_argument("--dataset", choices=list(ROW_DATASETS) + ['summary'], default=None,
+                        help="Default: sales rows for a --range, else the summary for csv, excel and json")
+    parser.add_argument("--format", dest="file_format", default='csv',
+                        choices=sorted(set(ROW_FORMATS) | {'excel'}))
+    parser.add_argument("--range", dest="time_range", default=None,
+                        help="last_hour, today, all, or START/END as ISO timestamps (rows default to last_hour)")
+    parser.add_argument("--compression", default=None)
+    args = parser.parse_args()
+
+    time_range = args.time_range
+    if time_range and '/' in time_range:
+        time_range = tuple(time_range.split('/', 1))
+
+    success, result = export_data(args.file_format, time_range, args.dataset, args.compression)
     if success:
         print(f"Export successful: {result}")
     else:
-        print(f"Export failed: {result}") 
+        print(f"Export failed: {result}")
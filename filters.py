@@ -1 +1,78 @@
- 
+from datetime import datetime, time, timedelta
+
+from sales_schema import code_column, dimension_table
+
+def dimension_filter(column, values, encoded):
+    placeholders = ', '.join('?' for _ in values)
+    if encoded:
+        # Match the integer codes so the sales_facts indexes can be used
+        return f"{code_column(column)} IN (SELECT id FROM {dimension_table(column)} WHERE value IN ({placeholders}))"
+    return f"{column} IN ({placeholders})"
+
+def build_where(regions=None, categories=None, start=None, end=None, encoded=False):
+    """
+    Turn dashboard filter selections into a parameterised WHERE clause
+
+    Returns (clause, params); clause is empty when nothing is selected.
+    start and end may be datetimes or ISO strings and bound the timestamp.
+    With encoded=True the clause targets sales_facts instead of the sales view.
+    """
+    clauses, params = [], []
+
+    if regions:
+        clauses.append(dimension_filter("region_of_sales", regions, encoded))
+        params.extend(regions)
+    if categories:
+        clauses.append(dimension_filter("product_category", categories, encoded))
+        params.extend(categories)
+    if start is not None:
+        clauses.append("timestamp >= ?")
+        params.append(start.isoformat() if isinstance(start, datetime) else start)
+    if end is not None:
+        clauses.append("timestamp < ?")
+        params.append(end.isoformat() if isinstance(end, datetime) else end)
+
+    clause = " WHERE " + " AND ".join(clauses) if clauses else ""
+    return clause, params
+
+def whole_days(start=None, end=None):
+    """
+    (first, stop) ISO dates bounding the whole days inside [start, end)
+
+    A day D lies fully inside the range when first <= D < stop; either
+    bound is None when the range is open on that side.
+    """
+    first = stop = None
+    if start is not None:
+        start = datetime.fromisoformat(start) if isinstance(start, str) else start
+        day = start.date()
+        first = day if start == datetime.combine(day, time()) else day + timedelta(days=1)
+    if end is not None:
+        end = datetime.fromisoformat(end) if isinstance(end, str) else end
+        stop = end.date()
+    return (first.isoformat() if first else None), (stop.isoformat() if stop else None)
+
+def build_summary_where(dimension, regions=None, categories=None, start=None, end=None):
+    """
+    WHERE clause for the daily summary rows of one dimension
+
+    The summary only knows whole days, so just the days lying entirely
+    inside [start, end) are matched.
+    """
+    clauses, params = ["dimension = ?"], [dimension]
+
+    if regions:
+        clauses.append(dimension_filter("region_of_sales", regions, True))
+        params.extend(regions)
+    if categories:
+        clauses.append(dimension_filter("product_category", categories, True))
+        params.extend(categories)
+    first, stop = whole_days(start, end)
+    if first is not None:
+        clauses.append("date >= ?")
+        params.append(first)
+    if stop is not None:
+        clauses.append("date < ?")
+        params.append(stop)
+
+    return " WHERE " + " AND ".join(clauses), params
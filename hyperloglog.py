@@ -0,0 +1,126 @@
+import hashlib
+import math
+import zlib
+
+DEFAULT_PRECISION = 12
+
+# numpy is imported inside the functions that use it, so importing this
+# module (and the web app through it) stays cheap
+
+def _sigma(x):
+    if x == 1:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+def _tau(x):
+    if x == 0 or x == 1:
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+class HyperLogLog:
+    """
+    Fixed-size, mergeable distinct-count sketch
+
+    With precision p the sketch keeps m = 2**p one-byte registers and the
+    estimate has a relative standard error of about 1.04 / sqrt(m): 1.6%
+    for the default p = 12 (4 KB of registers), so roughly 95% of counts
+    land within 3.3% of the true value. Small counts are close to exact.
+
+    Values are hashed with 64-bit BLAKE2b, which is stable across processes,
+    so sketches built anywhere can be merged with a register-wise max.
+    """
+
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+        if len(self.registers) != self.m:
+            raise ValueError("register count does not match precision")
+
+    @property
+    def error(self):
+        """Relative standard error of count()"""
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, value):
+        self.update((value,))
+
+    def update(self, values):
+        # Hot loop for the rollups, so everything it touches is a local
+        registers = self.registers
+        bits = 64 - self.precision
+        mask = (1 << bits) - 1
+        blake2b, from_bytes = hashlib.blake2b, int.from_bytes
+        for value in values:
+            h = from_bytes(blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "big")
+            rank = bits - (h & mask).bit_length() + 1
+            index = h >> bits
+            if rank > registers[index]:
+                registers[index] = rank
+        return self
+
+    def merge(self, other):
+        """Fold another sketch of the same precision into this one"""
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches of different precision")
+        import numpy as np
+        merged = np.maximum(np.frombuffer(self.registers, np.uint8), np.frombuffer(other.registers, np.uint8))
+        self.registers = bytearray(merged.tobytes())
+        return self
+
+    def count(self):
+        """
+        Estimated number of distinct values
+
+        Uses Ertl's improved estimator, which stays unbiased from empty
+        sketches up to very large counts without the usual switch-over to
+        linear counting and its bias around the switching point.
+        """
+        import numpy as np
+        q = 64 - self.precision
+        histogram = np.bincount(np.frombuffer(self.registers, np.uint8), minlength=q + 2)
+        m = self.m
+        z = m * _tau(1 - histogram[q + 1] / m)
+        for k in range(q, 0, -1):
+            z = 0.5 * (z + histogram[k])
+        z += m * _sigma(histogram[0] / m)
+        if z == math.inf:
+            return 0
+        return int(round(m * m / (2 * math.log(2) * z)))
+
+    def to_bytes(self):
+        """Precision byte followed by the zlib-compressed registers (sparse sketches shrink to a few bytes)"""
+        return bytes([self.precision]) + zlib.compress(bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(data[0], zlib.decompress(data[1:]))
+
+def merge_all(blobs, precision=DEFAULT_PRECISION):
+    """Merge serialized sketches (None entries are skipped) into one sketch"""
+    import numpy as np
+    merged = np.zeros(1 << precision, np.uint8)
+    for blob in blobs:
+        if blob is None:
+            continue
+        sketch = HyperLogLog.from_bytes(blob)
+        if sketch.precision != precision:
+            raise ValueError("cannot merge sketches of different precision")
+        np.maximum(merged, np.frombuffer(sketch.registers, np.uint8), out=merged)
+    return HyperLogLog(precision, merged.tobytes())
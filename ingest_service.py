@@ -0,0 +1,367 @@
+import argparse
+import ipaddress
+import os
+import secrets
+import socket
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from queue import Empty, Full, Queue
+
+import metrics
+from data_generator import JOURNAL_MODES, SalesWriter
+from live_data import bump_data_version
+from sales_schema import SALES_DB
+
+DEFAULT_ADDRESS = ("localhost", 6010)
+# Batches arrive pickled, and unpickling runs code, so only processes that
+# know the key may connect. Without INGEST_AUTHKEY the service makes up a
+# random key, listens on loopback only and leaves the key in KEY_PATH
+# (readable by its user alone) for local clients.
+AUTHKEY_ENV = "INGEST_AUTHKEY"
+KEY_PATH = "ingest.key"
+
+QUEUE_BATCHES = 64  # Batches waiting for the writer before producers block
+COMMIT_ROWS = 5000  # Commit once this many rows are pending...
+COMMIT_INTERVAL = 0.25  # ...or once the oldest pending row has waited this many seconds
+COMMIT_ROW_BUCKETS = (1, 10, 100, 500, 1000, 2500, 5000, 10000, 25000, 50000)
+
+STOP = None  # Put on the queue to make the writer finish
+POLL_INTERVAL = 0.5  # How often a producer blocked on a full queue checks that the writer is still alive
+
+def configured_authkey():
+    """The key from INGEST_AUTHKEY, or None if it is not set"""
+    key = os.environ.get(AUTHKEY_ENV)
+    return key.encode("utf-8") if key else None
+
+def client_authkey(key_path=KEY_PATH):
+    """INGEST_AUTHKEY, or else the key a local service wrote to key_path"""
+    key = configured_authkey()
+    if key is None:
+        try:
+            with open(key_path, "rb") as f:
+                key = f.read().strip()
+        except FileNotFoundError:
+            raise RuntimeError(f"No ingest key: set {AUTHKEY_ENV} or start the service on this machine first")
+    return key
+
+def write_key(key, key_path=KEY_PATH):
+    fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+
+def is_loopback(host):
+    try:
+        return all(ipaddress.ip_address(info[4][0]).is_loopback for info in socket.getaddrinfo(host, None))
+    except (socket.gaierror, ValueError):
+        return False
+
+def put_batch(queue, batch, failed, timeout=None):
+    """Put a batch on the ingest queue, waiting while it is full but never for a writer that has died"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        if failed.is_set():
+            raise RuntimeError("The ingest writer has stopped after an error")
+        wait = POLL_INTERVAL if deadline is None else min(POLL_INTERVAL, deadline - time.monotonic())
+        try:
+            queue.put(batch, timeout=max(0.0, wait))
+            return
+        except Full:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise
+
+class QueueProducer:
+    """What producer processes put batches through: the service's queue plus its failure flag"""
+
+    def __init__(self, queue, failed):
+        self.queue = queue
+        self.failed = failed
+
+    def put(self, records, timeout=None):
+        put_batch(self.queue, list(records), self.failed, timeout)
+
+def parse_address(text):
+    """'host:port' or just 'port' as a (host, port) tuple"""
+    host, _, port = text.rpartition(":")
+    try:
+        return (host or DEFAULT_ADDRESS[0], int(port))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid address: {text}")
+
+class IngestService:
+    """
+    The one writer of the sales database, fed by any number of producers
+
+    Producers hand over whole batches of records through a bounded queue and
+    a single thread, which owns the only write connection, inserts them. Rows
+    are committed in groups: once commit_rows are pending or the oldest has
+    waited commit_interval seconds. When the writer falls behind, the full
+    queue blocks the producers instead of leaving them to fight over SQLite's
+    write lock.
+
+    Threads call submit(). Producer processes started alongside the service
+    put batches through producer() if the queue is a multiprocessing queue
+    (pass a multiprocessing event as failed too), and independent processes
+    connect with IngestClient once serve() is listening. If the writer
+    dies, submit() and put() raise instead of blocking on the full queue.
+    """
+
+    def __init__(self, db_path=SALES_DB, max_batches=QUEUE_BATCHES, commit_rows=COMMIT_ROWS,
+                 commit_interval=COMMIT_INTERVAL, journal_mode="WAL", retain_days=None, queue=None,
+                 failed=None):
+        self.db_path = db_path
+        self.commit_rows = max(1, commit_rows)
+        self.commit_interval = commit_interval
+        self.journal_mode = journal_mode
+        self.retain_days = retain_days
+        self.queue = queue if queue is not None else Queue(maxsize=max(1, max_batches))
+        self.written = 0
+        self.committed = 0
+        self.errors = 0
+        self.last_commit_seconds = 0.0
+        self.listener = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.startup_error = None
+        self.failed = failed if failed is not None else threading.Event()
+        self.failure = None  # The exception that stopped the writer
+
+    def queue_depth(self):
+        try:
+            return self.queue.qsize()
+        except NotImplementedError:  # multiprocessing queues on macOS
+            return 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+        self.thread.start()
+        self.ready.wait()  # The writer has checked the schema and opened its connection
+        if self.startup_error is not None:
+            self.thread = None
+            raise self.startup_error
+        return self
+
+    def producer(self):
+        return QueueProducer(self.queue, self.failed)
+
+    def submit(self, records, timeout=None):
+        """Queue a batch for the writer, waiting while the queue is full"""
+        if not records:
+            return
+        started = time.perf_counter()
+        try:
+            put_batch(self.queue, list(records), self.failed, timeout)
+        except RuntimeError as e:
+            raise RuntimeError(f"The ingest writer has stopped: {self.failure}") from (self.failure or e)
+        metrics.count("ingest_submitted_rows_total", len(records), help="Rows handed to the ingest queue")
+        waited = time.perf_counter() - started
+        if metrics.ENABLED:
+            metrics.histogram("ingest_submit_wait_seconds", "Time producers waited for room in the queue").observe(waited)
+
+    def _commit(self, writer):
+        rows = writer.pending
+        started = time.perf_counter()
+        writer.commit()
+        self.last_commit_seconds = time.perf_counter() - started
+        self.committed += rows
+        if metrics.ENABLED:
+            metrics.histogram("ingest_commit_seconds", "Time to commit one group of rows").observe(self.last_commit_seconds)
+            metrics.histogram("ingest_commit_rows", "Rows per group commit", COMMIT_ROW_BUCKETS).observe(rows)
+        bump_data_version()  # Wakes up any open dashboards
+
+    def _fail(self, error):
+        self.failure = error
+        self.failed.set()
+        metrics.count("ingest_writer_failures_total", help="Times the ingest writer stopped after an error")
+        print(f"❌ Ingest writer stopped: {error}")
+
+    def _run(self):
+        # sqlite3 connections belong to the thread that opened them, so the writer opens its own.
+        # It commits itself, so SalesWriter's own group commit is never triggered.
+        try:
+            writer = SalesWriter(self.db_path, commit_size=sys.maxsize, journal_mode=self.journal_mode,
+                                 retain_days=self.retain_days)
+        except Exception as e:
+            self.startup_error = e
+            return
+        finally:
+            self.ready.set()
+        pending_since = None
+        try:
+            while True:
+                timeout = None
+                if pending_since is not None:
+                    timeout = max(0.0, pending_since + self.commit_interval - time.monotonic())
+                try:
+                    batch = self.queue.get(timeout=timeout)
+                except Empty:
+                    batch = []  # The oldest pending row is due, so just commit
+
+                if batch is STOP:
+                    break
+                if batch:
+                    try:
+                        written = writer.write(batch)
+                    except Exception as e:
+                        print(f"⚠️ Unexpected error writing a batch: {e}")
+                        written = 0
+                    self.written += written
+                    if written < len(batch):
+                        self.errors += 1
+                    if writer.pending and pending_since is None:
+                        pending_since = time.monotonic()
+
+                metrics.set_gauge("ingest_queue_depth", self.queue_depth(), "Batches waiting for the writer")
+                if writer.pending and (writer.pending >= self.commit_rows
+                                       or time.monotonic() - pending_since >= self.commit_interval):
+                    self._commit(writer)
+                    pending_since = None
+                metrics.publish("ingest")
+        except Exception as e:
+            self._fail(e)
+        finally:
+            try:
+                if self.failure is None:
+                    if writer.pending:
+                        self._commit(writer)
+                    writer.close()
+                else:
+                    writer.conn.close()  # Rolls back whatever was not committed
+            except Exception as e:
+                self._fail(e)
+            metrics.publish("ingest", force=True)
+
+    def serve(self, address=DEFAULT_ADDRESS, authkey=None, key_path=KEY_PATH):
+        """
+        Accept IngestClient connections in the background until stop()
+
+        The key is authkey, else INGEST_AUTHKEY. With neither, only a
+        loopback address is accepted and a random key is written to key_path.
+        """
+        authkey = authkey or configured_authkey()
+        if authkey is None:
+            if not is_loopback(address[0]):
+                raise ValueError(f"Refusing to listen on {address[0]} without a key: set {AUTHKEY_ENV}")
+            authkey = secrets.token_hex(32).encode("ascii")
+            write_key(authkey, key_path)
+        self.listener = Listener(address, authkey=authkey)
+        threading.Thread(target=self._accept, name="ingest-listener", daemon=True).start()
+        return self.listener.address
+
+    def _accept(self):
+        listener = self.listener
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError:
+                if self.listener is None:
+                    return  # Closed by stop()
+                continue
+            except Exception as e:  # e.g. a client with the wrong authkey
+                print(f"⚠️ Rejected ingest connection: {e}")
+                continue
+            threading.Thread(target=self._receive, args=(conn,), name="ingest-receiver", daemon=True).start()
+
+    def _receive(self, conn):
+        # Blocking in submit() stops reading the socket, so a full queue slows remote producers down too
+        with conn:
+            while True:
+                try:
+                    batch = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    self.submit(batch)
+                except RuntimeError:
+                    return  # The writer is gone; closing the connection tells the client
+
+    def stop(self):
+        """Stop listening, write and commit everything already queued, and close the connection"""
+        if self.listener is not None:
+            listener, self.listener = self.listener, None
+            listener.close()
+        if self.thread is not None:
+            try:
+                put_batch(self.queue, STOP, self.failed)
+            except RuntimeError:
+                pass  # The writer already stopped
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+class IngestClient:
+    """Producer side for another process: sends batches to a service started with serve()"""
+
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None, key_path=KEY_PATH):
+        self.conn = Client(address, authkey=authkey or client_authkey(key_path))
+
+    def submit(self, records):
+        if records:
+            self.conn.send(list(records))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def report_progress(service, since, written_before):
+    """Print throughput since the previous report, queue depth and commit latency"""
+    elapsed = max(time.monotonic() - since, 1e-9)
+    print(f"⚡ {(service.written - written_before) / elapsed:,.0f} rows/s | total {service.written:,} | "
+          f"queue {service.queue_depth()} | last commit {service.last_commit_seconds * 1000:.1f} ms")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the single writer for sales_data.db")
+    parser.add_argument("--address", type=parse_address, default=DEFAULT_ADDRESS,
+                        help="host:port to accept producers on (default: localhost:6010)")
+    parser.add_argument("--max-queue", type=int, default=QUEUE_BATCHES,
+                        help="Batches queued before producers have to wait")
+    parser.add_argument("--commit-rows", type=int, default=COMMIT_ROWS,
+                        help="Commit once this many rows are pending")
+    parser.add_argument("--commit-interval", type=float, default=COMMIT_INTERVAL,
+                        help="Commit once the oldest pending row has waited this many seconds")
+    parser.add_argument("--journal-mode", default="WAL", choices=JOURNAL_MODES, type=str.upper,
+                        help="SQLite journal mode for the writer connection")
+    parser.add_argument("--retain-days", type=int, default=None,
+                        help="Fold day partitions older than this into the daily summary (default: keep all)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    service = IngestService(max_batches=args.max_queue, commit_rows=args.commit_rows,
+                            commit_interval=args.commit_interval, journal_mode=args.journal_mode,
+                            retain_days=args.retain_days)
+    service.start()
+    try:
+        host, port = service.serve(args.address)
+    except ValueError as e:
+        service.stop()
+        raise SystemExit(f"❌ {e}")
+    print(f"📥 Ingest service accepting producers on {host}:{port}")
+    if configured_authkey() is None:
+        print(f"🔑 No {AUTHKEY_ENV} set - local clients read the generated key from {KEY_PATH}")
+    try:
+        while True:
+            since, written = time.monotonic(), service.written
+            time.sleep(5)
+            report_progress(service, since, written)
+            if service.failed.is_set():
+                break
+    except KeyboardInterrupt:
+        print("\n🛑 Ingest service stopping, committing queued rows")
+    finally:
+        service.stop()
+    print(f"✅ Wrote {service.written:,} rows ({service.errors} failed batches)")
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,113 @@
- 
+import os
+import sqlite3
+from datetime import datetime
+
+from sales_schema import CATALOG_TABLE, SALES_COLUMNS, SALES_DB, partition_select_sql, to_day
+
+# Counter bumped by the generator whenever new data has landed
+VERSION_PATH = "sales_data.version"
+
+# Columns SalesDatabaseReader hands over, in sales table order
+SALES_FIELDS = [name for name, _ in SALES_COLUMNS]
+
+def read_data_version(path=VERSION_PATH):
+    """Current data version, or 0 if nothing has been published yet"""
+    try:
+        with open(path, 'r') as f:
+            return int(f.read() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+def bump_data_version(path=VERSION_PATH):
+    """Publish that new data has landed by incrementing the version counter"""
+    version = read_data_version(path) + 1
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(str(version))
+    try:
+        os.replace(tmp_path, path)
+    except PermissionError:
+        # Windows refuses while a reader has the file open - the next batch bumps it
+        return None
+    return version
+
+class SalesDatabaseReader:
+    """
+    Reads the sales rows committed to sales_data.db since the last poll
+
+    Day partitions are only ever appended to, so the reader keeps the
+    highest rowid it has read from each one and a poll is one rowid range
+    scan per partition, however large the window it feeds. The first poll
+    reads just what the window will hold: the newest `rows` rows and/or the
+    rows since now - span. Rows come back column by column, oldest first.
+
+    Partitions are told apart by table name and creation time, so a day
+    dropped and recreated (e.g. by bulk_generator --reset) is read from the
+    start again; partitions dropped by retention are simply forgotten.
+    """
+
+    def __init__(self, db_path=SALES_DB, rows=None, span=None):
+        self.db_path = db_path
+        self.rows = rows
+        self.span = span
+        self.watermarks = {}  # (table, created_at) -> highest rowid read; empty until a partition exists
+        self.since = ''  # Oldest day polled when the window has no span
+
+    def poll(self):
+        """The new rows as {column: [values]}; the lists are empty if nothing was committed"""
+        rows = []
+        if os.path.exists(self.db_path):
+            conn = sqlite3.connect(self.db_path)
+            try:
+                start = datetime.now() - self.span if self.span is not None else None
+                conn.execute("BEGIN")  # One snapshot, so no row lands between reading it and the watermark
+                partitions = conn.execute(
+                    f"SELECT day, table_name, created_at FROM {CATALOG_TABLE} WHERE day >= ? ORDER BY day",
+                    (to_day(start) if start else self.since,)
+                ).fetchall()
+                if self.watermarks:
+                    rows = self._read_new(conn, partitions)
+                elif partitions:
+                    rows = self._read_window(conn, partitions, start)
+            except sqlite3.OperationalError:
+                pass  # No catalog yet: nothing has been written
+            finally:
+                conn.close()
+
+        columns = [list(values) for values in zip(*rows)] if rows else [[] for _ in range(len(SALES_FIELDS) + 1)]
+        return dict(zip(SALES_FIELDS, columns[1:]))  # columns[0] holds the rowids
+
+    def _read_new(self, conn, partitions):
+        rows, watermarks = [], {}
+        for _, table, created_at in partitions:
+            key = (table, created_at)
+            mark = self.watermarks.get(key, 0)
+            new = conn.execute(
+                f"{partition_select_sql(table, with_rowid=True)} WHERE {table}.rowid > ? ORDER BY {table}.rowid",
+                (mark,)
+            ).fetchall()
+            rows.extend(new)
+            watermarks[key] = new[-1][0] if new else mark
+        self.watermarks = watermarks
+        return rows
+
+    def _read_window(self, conn, partitions, start):
+        # Newest partition first, each newest row first, until the window is full
+        params = (start.isoformat(),) if start is not None else ()
+        rows, watermarks = [], {}
+        for day, table, created_at in reversed(partitions):
+            if self.rows is None or len(rows) < self.rows:
+                where = f" WHERE {table}.timestamp >= ?" if start is not None else ""
+                limit = f" LIMIT {self.rows - len(rows)}" if self.rows is not None else ""
+                newest = conn.execute(
+                    f"{partition_select_sql(table, with_rowid=True)}{where} ORDER BY {table}.rowid DESC{limit}", params
+                ).fetchall()
+                if newest:
+                    rows.extend(newest)
+                    self.since = day
+            # Older rows of the partition are outside the window, so it starts at its last row
+            watermarks[(table, created_at)] = conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0
+        self.since = self.since or partitions[-1][0]
+        self.watermarks = watermarks
+        rows.reverse()
+        return rows
@@ -0,0 +1,115 @@
+import csv
+import io
+import os
+import threading
+from collections import Counter
+
+import metrics
+from hyperloglog import HyperLogLog
+from topk import SpaceSaving
+
+# Endpoints tracked at once; counts overstate by at most total requests / this
+ENDPOINT_CAPACITY = 200
+
+class AccessLogAggregator:
+    """
+    Process-wide, tail-incremental counts over the CSV access log
+
+    The aggregator remembers how far into the file it has read along with
+    the partial counts so far. Each call only parses lines appended since
+    the previous call, and returns the cached result outright when the file
+    has not changed. A lock makes concurrent requests share one read.
+    """
+
+    def __init__(self, path='synthetic_logs.csv', top_endpoints=5):
+        self.path = path
+        self.top_endpoints = top_endpoints
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget everything read so far"""
+        self.offset = 0
+        self.file_id = None
+        self.stamp = None
+        self.columns = None
+        self.total_requests = 0
+        self.rejected = 0  # Malformed rows skipped, as upload_logs rejects them
+        self.visitors = HyperLogLog()  # Constant memory however many IPs appear
+        self.status_counts = Counter()
+        self.endpoints = SpaceSaving(ENDPOINT_CAPACITY)  # Constant memory however many endpoints appear
+        self.result = None
+
+    def _consume(self, text):
+        rows = csv.reader(io.StringIO(text))
+        if self.columns is None:
+            header = next(rows, None)
+            if header is None:
+                return
+            self.columns = {name.strip(): index for index, name in enumerate(header)}
+
+        ip_col = self.columns['IP Address']
+        status_col = self.columns['Status Code']
+        endpoint_col = self.columns['Endpoint']
+
+        addresses = set()  # Hash each IP once per chunk rather than once per row
+        endpoints = Counter()  # Likewise one summary update per endpoint per chunk
+        rejected = 0
+        while True:
+            try:
+                row = next(rows)
+            except StopIteration:
+                break
+            except csv.Error:
+                rejected += 1
+                continue
+            if not row:
+                continue
+            try:
+                address, status, endpoint = row[ip_col], int(row[status_col]), row[endpoint_col]
+            except (IndexError, ValueError):
+                rejected += 1
+                continue
+            self.total_requests += 1
+            addresses.add(address)
+            self.status_counts[status] += 1
+            endpoints[endpoint] += 1
+        if rejected:
+            self.rejected += rejected
+            metrics.count("log_aggregator_rejected_rows_total", rejected,
+                          help="Malformed access log rows skipped by the dashboard")
+        self.visitors.update(addresses)
+        self.endpoints.update_all(endpoints)
+
+    def snapshot(self):
+        """Return dashboard totals, reading only what was appended since the last call"""
+        with self.lock:
+            with open(self.path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                stamp = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+                if stamp == self.stamp and self.result is not None:
+                    return self.result
+
+                # Start over if the log was replaced or truncated
+                if (stat.st_dev, stat.st_ino) != self.file_id or stat.st_size < self.offset:
+                    self.reset()
+                    self.file_id = (stat.st_dev, stat.st_ino)
+
+                f.seek(self.offset)
+                data = f.read(stat.st_size - self.offset)
+
+            # A partially written last line is left for the next call
+            end = data.rfind(b'\n')
+            if end >= 0:
+                self._consume(data[:end + 1].decode('utf-8', errors='replace'))
+                self.offset += end + 1
+            self.stamp = stamp
+
+            self.result = {
+                "total_requests": self.total_requests,
+                "unique_visitors": self.visitors.count(),
+                "status_counts": dict(self.status_counts.most_common()),
+                "top_endpoints": {key: count for key, count, _ in self.endpoints.top(self.top_endpoints)},
+                "top_endpoints_error": self.endpoints.max_error
+            }
+            return self.result
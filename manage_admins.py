@@ -1,18 +1,13 @@
-import sqlite3
 from flask import Flask, render_template, request, redirect, url_for, flash
 from werkzeug.security import generate_password_hash
 from flask_login import login_required
+import admin_store
 
 app = Flask(__name__)
 
 # Function to get all admins
 def get_all_admins():
-    conn = sqlite3.connect("database/admins.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, username FROM admins")
-    admins = cursor.fetchall()
-    conn.close()
-    return admins
+    return admin_store.get_all_admins()
 
 # Add new admin
 @app.route('/add_admin', methods=['POST'])
@@ -22,12 +17,8 @@ def add_admin():
     password = request.form['password']
 
     if username and password:
-        conn = sqlite3.connect("database/admins.db")
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO admins (username, password_hash) VALUES (?, ?)", 
-                       (username, generate_password_hash(password)))
-        conn.commit()
-        conn.close()
+        # Also invalidates any cached lookup for this username
+        admin_store.add_admin(username, generate_password_hash(password))
         flash("New admin added successfully!", "success")
     else:
         flash("Please provide both username and password!", "error")
@@ -38,11 +29,8 @@ def add_admin():
 @app.route('/delete_admin/<int:admin_id>', methods=['POST'])
 @login_required
 def delete_admin(admin_id):
-    conn = sqlite3.connect("database/admins.db")
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM admins WHERE id = ?", (admin_id,))
-    conn.commit()
-    conn.close()
+    # Also drops the cached user so the session stops authenticating
+    admin_store.delete_admin(admin_id)
     flash("Admin deleted successfully!", "success")
 
     return redirect(url_for('manage_admins'))
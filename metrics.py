@@ -0,0 +1,281 @@
+import functools
+import glob
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Instrumentation is on unless METRICS_ENABLED is set to 0/false/no/off.
+# When it is off, timed() returns functions unchanged and span() yields
+# without reading the clock, so the hot paths pay next to nothing.
+ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() not in ("0", "false", "no", "off")
+
+# Processes other than the Flask app publish their metrics here as textfiles
+METRICS_DIR = os.environ.get("METRICS_DIR", "metrics")
+PUBLISH_INTERVAL = 5.0  # seconds
+# Textfiles not rewritten for this long belong to processes that have exited
+STALE_AFTER = 600.0  # seconds
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in items) + "}"
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic count, one series per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        for key, value in items:
+            yield f"{self.name}{format_labels(key)} {format_value(value)}"
+
+class Gauge:
+    """Current value that can go up or down, one series per label combination"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = value
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        for key, value in items:
+            yield f"{self.name}{format_labels(key)} {format_value(value)}"
+
+class Histogram:
+    """Cumulative bucket counts plus sum and count, one series per label combination"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self.lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self.values.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{format_labels(key, ('le', format_value(float(bound))))} {cumulative}"
+            yield f"{self.name}_bucket{format_labels(key, ('le', '+Inf'))} {count}"
+            yield f"{self.name}_sum{format_labels(key)} {format_value(total)}"
+            yield f"{self.name}_count{format_labels(key)} {count}"
+
+class Registry:
+    """The metrics of one process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get(self, cls, name, help, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help=""):
+        return self._get(Counter, name, help)
+
+    def gauge(self, name, help=""):
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def render(self):
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n" if lines else ""
+
+registry = Registry()
+
+def counter(name, help=""):
+    return registry.counter(name, help)
+
+def gauge(name, help=""):
+    return registry.gauge(name, help)
+
+def histogram(name, help="", buckets=DEFAULT_BUCKETS):
+    return registry.histogram(name, help, buckets)
+
+@contextmanager
+def _span(metric, labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric.observe(time.perf_counter() - started, **labels)
+
+@contextmanager
+def _no_span():
+    yield
+
+def span(name, help="", **labels):
+    """Time the enclosed block into the histogram called name (seconds)"""
+    if not ENABLED:
+        return _no_span()
+    return _span(histogram(name, help), labels)
+
+def timed(name, help="", **labels):
+    """Decorator form of span(); leaves the function untouched when metrics are disabled"""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        metric = histogram(name, help)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                metric.observe(time.perf_counter() - started, **labels)
+        return wrapper
+    return decorate
+
+def count(name, amount=1, help="", **labels):
+    """Increment the counter called name"""
+    if ENABLED:
+        counter(name, help).inc(amount, **labels)
+
+def set_gauge(name, value, help="", **labels):
+    """Set the gauge called name"""
+    if ENABLED:
+        gauge(name, help).set(value, **labels)
+
+_last_published = {}
+
+def publish(process, force=False):
+    """
+    Write this process's metrics to METRICS_DIR/<process>.prom for the
+    Flask /metrics route to pick up, at most every PUBLISH_INTERVAL seconds
+    """
+    if not ENABLED:
+        return
+    now = time.monotonic()
+    if not force and now - _last_published.get(process, float("-inf")) < PUBLISH_INTERVAL:
+        return
+    _last_published[process] = now
+
+    path = os.path.join(METRICS_DIR, f"{process}.prom")
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            f.write(registry.render())
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass  # Metrics must never take the process down
+
+def with_label(sample, key, value):
+    """Add key="value" to a sample line unless it already has that label"""
+    name_end = min(index for index in (sample.find("{"), sample.find(" ")) if index >= 0)
+    if sample[name_end] == "{":
+        if f'{{{key}="' in sample or f',{key}="' in sample[:sample.rfind("}")]:
+            return sample
+        return f'{sample[:name_end + 1]}{key}="{escape(value)}",{sample[name_end + 1:]}'
+    return f'{sample[:name_end]}{{{key}="{escape(value)}"}}{sample[name_end:]}'
+
+def render_all(now=None):
+    """
+    This process's metrics merged with the textfiles published by the others
+
+    Processes can share metric families (the ingest service reuses
+    SalesWriter's generator_* metrics), so every family is written once
+    with its samples labelled by the process they came from. Textfiles
+    older than STALE_AFTER are left out.
+    """
+    sources = [("app", registry.render())]
+    now = time.time() if now is None else now
+    for path in sorted(glob.glob(os.path.join(METRICS_DIR, "*.prom"))):
+        try:
+            if now - os.path.getmtime(path) > STALE_AFTER:
+                continue
+            with open(path) as f:
+                sources.append((os.path.splitext(os.path.basename(path))[0], f.read()))
+        except OSError:
+            continue
+
+    families = {}  # name -> [help, kind, samples]
+    for process, text in sources:
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# HELP "):
+                name, _, help = line[len("# HELP "):].partition(" ")
+                family = families.setdefault(name, [help, None, []])
+            elif line.startswith("# TYPE "):
+                name, _, kind = line[len("# TYPE "):].partition(" ")
+                family = families.setdefault(name, ["", None, []])
+                if family[1] is None:
+                    family[1] = kind
+                elif family[1] != kind:
+                    family = None  # Registered as another type elsewhere; skip rather than emit invalid output
+            elif line and family is not None:
+                family[2].append(with_label(line, "process", process))
+
+    lines = []
+    for name, (help, kind, samples) in sorted(families.items()):
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind or 'untyped'}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n" if lines else ""
@@ -0,0 +1,30 @@
+import threading
+import time
+
+import metrics
+
+def run(process, steps):
+    """Run (name, fn) steps in order, timing each into prewarm_seconds; a failed step is skipped"""
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"⚠️ Prewarm step {name} failed: {e}")
+            continue
+        if metrics.ENABLED:
+            metrics.histogram("prewarm_seconds", "Time to load one startup dependency in the background").observe(
+                time.perf_counter() - started, process=process, step=name
+            )
+
+def start(process, steps):
+    """Run the steps in a daemon thread, so the process can serve requests while they load"""
+    thread = threading.Thread(target=run, args=(process, steps), name=f"{process}-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+def plotting():
+    """Import pandas and plotly.express, building one figure so plotly loads its validators too"""
+    import pandas as pd
+    import plotly.express as px
+    px.bar(pd.DataFrame({"x": [0], "y": [0]}), x="x", y="y").to_json()
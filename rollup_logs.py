@@ -0,0 +1,312 @@
+import argparse
+import sqlite3
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from hyperloglog import HyperLogLog, merge_all
+from topk import SpaceSaving, merge_summaries
+from upload_logs import LOGS_DB, create_logs_table
+
+ANALYTICS_DB = "analytics_data.db"
+
+# Endpoints kept per bucket summary, and so in a merged range
+ENDPOINT_CAPACITY = 64
+
+STATUS_CODES = [200, 201, 204, 301, 302, 304, 400, 401, 403, 404, 405, 429, 500, 502, 503, 504]
+PAGE_COLUMNS = ["home", "products", "contact", "about", "demo"]
+
+# Bucket label is the first N characters of the ISO timestamp plus zero padding
+GRANULARITIES = {
+    "minute": (16, ":00", "+1 minute"),
+    "hour": (13, ":00:00", "+1 hour")
+}
+
+# Maps an endpoint onto one of the analytics page columns
+PAGE_CASE = """
+    CASE
+        WHEN lower(endpoint) LIKE '%demo%' THEN 'demo'
+        WHEN lower(endpoint) LIKE '%contact%' THEN 'contact'
+        WHEN lower(endpoint) LIKE '%about%' THEN 'about'
+        WHEN lower(endpoint) LIKE '%product%' OR lower(endpoint) LIKE '%prototype%'
+             OR lower(endpoint) LIKE '/solution/%' THEN 'products'
+        WHEN endpoint IN ('/', '/index.html', '/home') THEN 'home'
+    END
+"""
+
+def ensure_rollup_schema(conn, schema="main"):
+    """Add the bucket columns and tables the rollups need to analytics_data.db"""
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {schema}.analytics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        unique_visitors INTEGER,
+        total_requests INTEGER,
+        """ + ",\n        ".join(f"status_{code} INTEGER" for code in STATUS_CODES) + """,
+        """ + ",\n        ".join(f"{page} INTEGER" for page in PAGE_COLUMNS) + """
+    )
+    """)
+    columns = [col[1] for col in conn.execute(f"PRAGMA {schema}.table_info(analytics)")]
+    if "granularity" not in columns:
+        conn.execute(f"ALTER TABLE {schema}.analytics ADD COLUMN granularity TEXT")
+    if "visitors_sketch" not in columns:
+        # HyperLogLog of the bucket's IPs; unlike unique_visitors it can be merged across buckets
+        conn.execute(f"ALTER TABLE {schema}.analytics ADD COLUMN visitors_sketch BLOB")
+    if "endpoints_summary" not in columns:
+        # Space-Saving summary of the bucket's endpoints, a fixed size however many distinct pages there are
+        conn.execute(f"ALTER TABLE {schema}.analytics ADD COLUMN endpoints_summary BLOB")
+    conn.execute(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {schema}.idx_analytics_bucket ON analytics (granularity, timestamp)"
+    )
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {schema}.rollup_state (
+        name TEXT PRIMARY KEY,
+        last_id INTEGER
+    )
+    """)
+    conn.commit()
+
+def rollup_bucket_sql(granularity):
+    """Upsert per-bucket totals for access_logs rows in (?, ?]"""
+    width, padding, _ = GRANULARITIES[granularity]
+    bucket = f"substr(timestamp, 1, {width}) || '{padding}'"
+    counters = ["total_requests"] + [f"status_{code}" for code in STATUS_CODES] + PAGE_COLUMNS
+    selects = (
+        ["COUNT(*)"]
+        + [f"SUM(status_code = {code})" for code in STATUS_CODES]
+        + [f"SUM(page = '{page}')" for page in PAGE_COLUMNS]
+    )
+    return f"""
+    INSERT INTO analytics.analytics (granularity, timestamp, unique_visitors, {", ".join(counters)})
+    SELECT '{granularity}', bucket, 0, {", ".join(selects)}
+    FROM (
+        SELECT {bucket} AS bucket, status_code, {PAGE_CASE} AS page
+        FROM access_logs WHERE id > ? AND id <= ?
+    )
+    GROUP BY bucket
+    ON CONFLICT (granularity, timestamp) DO UPDATE SET
+        {", ".join(f"{col} = {col} + excluded.{col}" for col in counters)}
+    """
+
+def store_sketch(conn, granularity, bucket, sketch):
+    conn.execute(
+        "UPDATE analytics.analytics SET visitors_sketch = ?, unique_visitors = ? "
+        "WHERE granularity = ? AND timestamp = ?",
+        (sketch.to_bytes(), sketch.count(), granularity, bucket)
+    )
+
+def store_endpoints(conn, granularity, bucket, summary):
+    conn.execute(
+        "UPDATE analytics.analytics SET endpoints_summary = ? WHERE granularity = ? AND timestamp = ?",
+        (summary.to_bytes(), granularity, bucket)
+    )
+
+def update_bucket_summaries(conn, lower, upper):
+    """Add the IPs and endpoints of access_logs rows in (lower, upper] to the summaries of their buckets"""
+    visitors = {granularity: defaultdict(set) for granularity in GRANULARITIES}
+    endpoints = {granularity: defaultdict(Counter) for granularity in GRANULARITIES}
+    rows = conn.execute(
+        "SELECT timestamp, ip_address, endpoint FROM access_logs WHERE id > ? AND id <= ?", (lower, upper)
+    )
+    for timestamp, ip_address, endpoint in rows:
+        for granularity, (width, padding, _) in GRANULARITIES.items():
+            bucket = timestamp[:width] + padding
+            visitors[granularity][bucket].add(ip_address)
+            endpoints[granularity][bucket][endpoint] += 1
+
+    for granularity, buckets in visitors.items():
+        for bucket, addresses in buckets.items():
+            row = conn.execute(
+                "SELECT visitors_sketch, endpoints_summary FROM analytics.analytics "
+                "WHERE granularity = ? AND timestamp = ?",
+                (granularity, bucket)
+            ).fetchone()
+            sketch = HyperLogLog.from_bytes(row[0]) if row and row[0] else HyperLogLog()
+            store_sketch(conn, granularity, bucket, sketch.update(addresses))
+            summary = SpaceSaving.from_bytes(row[1]) if row and row[1] else SpaceSaving(ENDPOINT_CAPACITY)
+            store_endpoints(conn, granularity, bucket, summary.update_all(endpoints[granularity][bucket]))
+
+def backfill_summaries(conn, last_id):
+    """
+    Build sketches and endpoint summaries for buckets rolled up before they existed
+
+    Only rows up to the rollup watermark are read, so rows that are rolled
+    up later are not double counted (re-adding an IP to a sketch has no
+    effect anyway, but endpoint counts would grow twice).
+    """
+    backfilled = 0
+    for granularity, (_, _, step) in GRANULARITIES.items():
+        bucket_range = (
+            f"id <= ? AND timestamp >= ? "
+            f"AND timestamp < strftime('%Y-%m-%dT%H:%M:%S', ?, '{step}')"
+        )
+        buckets = conn.execute(
+            "SELECT timestamp, visitors_sketch IS NULL, endpoints_summary IS NULL FROM analytics.analytics "
+            "WHERE granularity = ? AND (visitors_sketch IS NULL OR endpoints_summary IS NULL)",
+            (granularity,)
+        ).fetchall()
+        for bucket, missing_sketch, missing_endpoints in buckets:
+            params = (last_id, bucket, bucket)
+            if missing_sketch:
+                addresses = conn.execute(f"SELECT DISTINCT ip_address FROM access_logs WHERE {bucket_range}", params)
+                store_sketch(conn, granularity, bucket, HyperLogLog().update(address for (address,) in addresses))
+            if missing_endpoints:
+                counts = conn.execute(
+                    f"SELECT endpoint, COUNT(*) FROM access_logs WHERE {bucket_range} GROUP BY endpoint", params
+                )
+                store_endpoints(conn, granularity, bucket, SpaceSaving(ENDPOINT_CAPACITY).update_all(counts))
+            backfilled += 1
+    return backfilled
+
+def update_rollups(logs_db=LOGS_DB, analytics_db=ANALYTICS_DB, batch_size=50000):
+    """Fold access_logs rows added since the last run into minute and hour buckets"""
+    conn = sqlite3.connect(logs_db)
+    try:
+        create_logs_table(conn)
+        conn.execute("ATTACH DATABASE ? AS analytics", (analytics_db,))
+        ensure_rollup_schema(conn, "analytics")
+
+        row = conn.execute("SELECT last_id FROM analytics.rollup_state WHERE name = 'access_logs'").fetchone()
+        last_id = row[0] if row else 0
+
+        with conn:
+            backfill_summaries(conn, last_id)
+        max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM access_logs").fetchone()[0]
+        rolled_up = 0
+
+        while last_id < max_id:
+            upper = min(last_id + batch_size, max_id)
+            # Buckets and watermark move together, so a crash never double counts
+            with conn:
+                for granularity in GRANULARITIES:
+                    conn.execute(rollup_bucket_sql(granularity), (last_id, upper))
+                update_bucket_summaries(conn, last_id, upper)
+                conn.execute("""
+                INSERT INTO analytics.rollup_state (name, last_id) VALUES ('access_logs', ?)
+                ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id
+                """, (upper,))
+            rolled_up += upper - last_id
+            last_id = upper
+        return rolled_up
+    finally:
+        conn.close()
+
+def pick_granularity(start, end):
+    """Minute buckets for short ranges, hour buckets otherwise"""
+    if start is not None and (end or datetime.now()) - start <= timedelta(hours=6):
+        return "minute"
+    return "hour"
+
+def bucket_range_sql(start, end):
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("timestamp >= ?")
+        params.append(start.isoformat(timespec="seconds"))
+    if end is not None:
+        clauses.append("timestamp < ?")
+        params.append(end.isoformat(timespec="seconds"))
+    return "".join(f" AND {clause}" for clause in clauses), params
+
+def prepare_rollups(analytics_db=ANALYTICS_DB):
+    """Create or upgrade the rollup schema once at startup, so reads need not check it"""
+    conn = sqlite3.connect(analytics_db)
+    try:
+        ensure_rollup_schema(conn)
+    finally:
+        conn.close()
+
+def fetch_rollup_totals(start=None, end=None, analytics_db=ANALYTICS_DB, top_endpoints=5):
+    """
+    Dashboard totals for a time range, summed from the rollup buckets
+
+    Returns None only before the first rollup (no schema or watermark yet);
+    a range without buckets gives zero totals.
+    """
+    granularity = pick_granularity(start, end)
+    where, params = bucket_range_sql(start, end)
+
+    conn = sqlite3.connect(analytics_db)
+    try:
+        status_columns = [f"status_{code}" for code in STATUS_CODES]
+        try:
+            if conn.execute("SELECT 1 FROM rollup_state WHERE name = 'access_logs'").fetchone() is None:
+                return None  # Nothing rolled up yet
+            row = conn.execute(
+                f"SELECT COUNT(*), SUM(total_requests), {', '.join(f'SUM({col})' for col in status_columns)} "
+                f"FROM analytics WHERE granularity = ?{where}",
+                [granularity] + params
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None  # The rollup schema has not been created yet
+
+        status_counts = {
+            code: count for code, count in zip(STATUS_CODES, row[2:]) if count
+        }
+        endpoints = merged_endpoints(conn, granularity, where, params)
+        series = conn.execute(
+            f"SELECT timestamp, total_requests FROM analytics "
+            f"WHERE granularity = ?{where} ORDER BY timestamp",
+            [granularity] + params
+        ).fetchall()
+        unique_visitors = merged_visitors(conn, granularity, where, params).count()
+    finally:
+        conn.close()
+
+    total_requests = row[1] or 0
+    return {
+        "total_requests": total_requests,
+        # The sketch can overshoot by its error; there are never more visitors than requests
+        "unique_visitors": min(unique_visitors, total_requests),
+        "status_counts": dict(sorted(status_counts.items(), key=lambda item: item[1], reverse=True)),
+        "top_endpoints": {key: count for key, count, _ in endpoints.top(top_endpoints)},
+        "top_endpoints_error": endpoints.max_error,
+        "requests_over_time": series,
+        "granularity": granularity
+    }
+
+def merged_visitors(conn, granularity, where, params):
+    """One sketch covering every bucket in the range, streamed a bucket at a time"""
+    blobs = conn.execute(
+        f"SELECT visitors_sketch FROM analytics WHERE granularity = ?{where}", [granularity] + params
+    )
+    return merge_all(blob for (blob,) in blobs)
+
+def merged_endpoints(conn, granularity, where, params):
+    """One endpoint summary covering every bucket in the range; its max_error bounds the counts"""
+    blobs = conn.execute(
+        f"SELECT endpoints_summary FROM analytics WHERE granularity = ?{where}", [granularity] + params
+    )
+    return merge_summaries((blob for (blob,) in blobs), ENDPOINT_CAPACITY)
+
+def count_unique_visitors(start=None, end=None, analytics_db=ANALYTICS_DB):
+    """Approximate distinct IPs in a time range (about 1.6% standard error), merged from the bucket sketches"""
+    granularity = pick_granularity(start, end)
+    where, params = bucket_range_sql(start, end)
+    conn = sqlite3.connect(analytics_db)
+    try:
+        ensure_rollup_schema(conn)
+        return merged_visitors(conn, granularity, where, params).count()
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Roll access logs up into analytics_data.db")
+    parser.add_argument("--interval", type=float, default=None,
+                        help="Keep running, rolling up new rows every N seconds")
+    args = parser.parse_args()
+
+    while True:
+        started = time.monotonic()
+        rows = update_rollups()
+        print(f"✅ Rolled up {rows:,} log rows in {time.monotonic() - started:.2f}s "
+              f"at {datetime.now().strftime('%H:%M:%S')}")
+        if args.interval is None:
+            break
+        try:
+            time.sleep(args.interval)
+        except KeyboardInterrupt:
+            print("\n🛑 Rollup job stopped by user")
+            break
+
+if __name__ == "__main__":
+    main()
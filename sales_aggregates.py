@@ -0,0 +1,281 @@
+import heapq
+import itertools
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+
+from data_generator import DIMENSION_VOCABULARIES
+from sales_schema import DIMENSION_COLUMNS, SALES_COLUMNS
+
+REVENUE_COLUMN = 'final_price_after_discount'
+
+# Columns the dashboard groups on
+DIMENSIONS = [
+    'region_of_sales',
+    'customer_type',
+    'product_name',
+    'sales_rep',
+    'product_category',
+    'payment_method'
+]
+
+# The window keeps every sales column, so its frame looks like the sales table
+COLUMNS = [name for name, _ in SALES_COLUMNS]
+# The columns a row's totals are made of
+TOTAL_COLUMNS = DIMENSIONS + [REVENUE_COLUMN]
+
+def data_frame(rows, columns=None):
+    """pandas is imported on first use, so the dashboard can draw its header before it loads"""
+    import pandas as pd
+    return pd.DataFrame(rows, columns=columns)
+
+def categorize(df):
+    """Store the dimension columns as pandas categoricals, known values first in vocabulary order"""
+    for column in DIMENSION_COLUMNS:
+        if column in df:
+            values = df[column].astype('category')
+            known = list(DIMENSION_VOCABULARIES.get(column, []))
+            extra = sorted(set(values.cat.categories) - set(known))
+            df[column] = values.cat.set_categories(known + extra)
+    return df
+
+# Versions are unique across instances so a version identifies one exact state
+_versions = itertools.count(1)
+
+class SalesAggregates:
+    """Running KPI and chart totals over a sliding window of sales records.
+
+    Records are folded in as they arrive and subtracted again when they fall
+    out of the window, so an update costs time proportional to the new rows
+    rather than the size of the window. The window holds at most `window`
+    rows (None for no limit) and, given a span, only rows whose timestamp is
+    within span of now. Rows are kept column by column, which keeps large
+    windows small in memory, and the DataFrame of the window is extended
+    and trimmed by the same delta instead of being rebuilt.
+    """
+
+    def __init__(self, window=100, regions=None, categories=None, span=None):
+        self.window = window
+        self.span = span
+        self.regions = set(regions or [])
+        self.categories = set(categories or [])
+        self.reset()
+
+    def reset(self):
+        """Forget every record and total"""
+        self.columns = {name: deque() for name in COLUMNS}
+        self.last_id = None
+        self.version = next(_versions)
+        self.order_count = 0
+        self.revenue_total = 0.0
+        self.revenue = {dim: {} for dim in DIMENSIONS}
+        self.counts = {dim: Counter() for dim in DIMENSIONS}
+        self._frame = None
+        self._frame_version = -1
+        self._framed = 0  # Rows at the front of the window that are already in _frame
+        self._frame_dropped = 0  # Of those, matching rows evicted since _frame was built
+
+    def matches(self, record):
+        """Check a record against the region and category filters"""
+        if self.regions and record.get('region_of_sales') not in self.regions:
+            return False
+        if self.categories and record.get('product_category') not in self.categories:
+            return False
+        return True
+
+    def _matching(self, fields):
+        """Positions of the rows of a batch ({column: values}) that pass the filters, or None for all of them"""
+        if not self.regions and not self.categories:
+            return None
+        regions = fields['region_of_sales'] if self.regions else itertools.repeat(None)
+        categories = fields['product_category'] if self.categories else itertools.repeat(None)
+        return [
+            index for index, (region, category) in enumerate(zip(regions, categories))
+            if (not self.regions or region in self.regions) and (not self.categories or category in self.categories)
+        ]
+
+    def _fold(self, fields, sign):
+        """
+        Add (sign 1) or take away (sign -1) a batch given as {column: values}
+
+        The batch is grouped once per dimension and each group is merged
+        into the running totals, so the totals are touched once per
+        distinct value rather than once per row. Returns how many rows
+        passed the filters.
+        """
+        matching = self._matching(fields)
+        if matching is not None:
+            fields = {name: [values[index] for index in matching] for name, values in fields.items()}
+        prices = [float(price or 0) for price in fields[REVENUE_COLUMN]]
+        if not prices:
+            return 0
+        self.order_count += sign * len(prices)
+        self.revenue_total += sign * sum(prices)
+
+        for dim in DIMENSIONS:
+            keys = fields[dim]
+            batch_revenue = defaultdict(float)
+            for key, price in zip(keys, prices):
+                batch_revenue[key] += price
+            counts = self.counts[dim]
+            revenue = self.revenue[dim]
+            for key, count in Counter(keys).items():
+                counts[key] += sign * count
+                if counts[key] <= 0:
+                    # Drop empty groups so they disappear from the charts
+                    del counts[key]
+                    revenue.pop(key, None)
+                else:
+                    revenue[key] = revenue.get(key, 0.0) + sign * batch_revenue[key]
+
+        if self.order_count <= 0:
+            self.revenue_total = 0.0
+        return len(prices)
+
+    def __len__(self):
+        return len(self.columns['sales_id'])
+
+    def rows(self):
+        """The window as record dicts, oldest first"""
+        return [dict(zip(COLUMNS, values)) for values in zip(*self.columns.values())]
+
+    def add(self, records):
+        """Fold new records into the totals, evicting the oldest beyond the window"""
+        return self.add_columns({name: [record.get(name) for record in records] for name in COLUMNS})
+
+    def add_columns(self, columns):
+        """Like add, for a batch given as {column: values}; missing columns are stored as None"""
+        added = len(columns.get('sales_id', ()))
+        if not added:
+            return 0
+        for name, values in self.columns.items():
+            values.extend(columns[name] if name in columns else itertools.repeat(None, added))
+
+        self._fold({name: list(columns[name]) if name in columns else [None] * added for name in TOTAL_COLUMNS}, 1)
+        self.last_id = self.columns['sales_id'][-1]
+        self.evict()
+        self.version = next(_versions)
+        return added
+
+    def evict(self, now=None):
+        """Drop rows from the front of the window beyond its size or older than its span"""
+        timestamps = self.columns['timestamp']
+        evicted = max(0, len(timestamps) - self.window) if self.window is not None else 0
+        if self.span is not None:
+            cutoff = ((now or datetime.now()) - self.span).isoformat()
+            for timestamp in itertools.islice(timestamps, evicted, None):
+                if (timestamp or '') >= cutoff:
+                    break
+                evicted += 1
+        if not evicted:
+            return 0
+
+        fields = {}
+        for name, values in self.columns.items():
+            # map() pops without a Python-level loop
+            popped = map(deque.popleft, itertools.repeat(values, evicted))
+            if name in TOTAL_COLUMNS:
+                fields[name] = list(popped)
+            else:
+                deque(popped, maxlen=0)
+
+        framed = min(evicted, self._framed)
+        if framed:
+            # Rows of _frame that were evicted, counted the way _filtered_frame filters them
+            head = {name: values[:framed] for name, values in fields.items()}
+            matching = self._matching(head)
+            self._framed -= framed
+            self._frame_dropped += framed if matching is None else len(matching)
+        self._fold(fields, -1)
+        self.version = next(_versions)
+        return evicted
+
+    def sync(self, snapshot):
+        """Add the records from an ordered snapshot that arrived since the last sync"""
+        if self.last_id is None:
+            return self.add(snapshot)
+
+        # New records sit at the end, so walk backwards to the last one seen
+        for index in range(len(snapshot) - 1, -1, -1):
+            if snapshot[index].get('sales_id') == self.last_id:
+                return self.add(snapshot[index + 1:])
+
+        # The window rolled past everything seen so far - start again
+        self.reset()
+        return self.add(snapshot)
+
+    @property
+    def total_revenue(self):
+        return self.revenue_total
+
+    @property
+    def avg_order(self):
+        if not self.order_count:
+            return float('nan')
+        return self.revenue_total / self.order_count
+
+    @property
+    def top_product(self):
+        """Most frequently sold product, ties broken alphabetically like Series.mode()"""
+        counts = self.counts['product_name']
+        if not counts:
+            return None
+        best = max(counts.values())
+        return min(name for name, count in counts.items() if count == best)
+
+    def revenue_by(self, dim):
+        """Revenue per value of a dimension, sorted by value like DataFrame.groupby"""
+        items = sorted(self.revenue[dim].items())
+        return data_frame(items, [dim, REVENUE_COLUMN])
+
+    def counts_by(self, dim):
+        """Row count per value of a dimension, largest first like Series.value_counts"""
+        items = self.counts[dim].most_common()
+        return data_frame(items, [dim, 'count'])
+
+    def top_products(self, n=5):
+        """Products with the highest revenue"""
+        revenue = self.revenue['product_name']
+        items = heapq.nlargest(n, revenue.items(), key=lambda item: item[1])
+        return data_frame(items, ['product_name', REVENUE_COLUMN])
+
+    def sales_rep_performance(self):
+        """Revenue and transaction count per sales rep"""
+        counts = self.counts['sales_rep']
+        rows = [
+            (rep, revenue, counts[rep])
+            for rep, revenue in sorted(self.revenue['sales_rep'].items())
+        ]
+        return data_frame(rows, ['sales_rep', REVENUE_COLUMN, 'number_of_transactions'])
+
+    def _filtered_frame(self, start):
+        """The rows of the window from position start on, filtered, as a DataFrame"""
+        count = len(self) - start
+        df = data_frame({
+            name: list(itertools.islice(reversed(values), count))[::-1]
+            for name, values in self.columns.items()
+        })
+        if self.regions:
+            df = df[df['region_of_sales'].isin(self.regions)]
+        if self.categories:
+            df = df[df['product_category'].isin(self.categories)]
+        return categorize(df.reset_index(drop=True))
+
+    def frame(self):
+        """Filtered window as a DataFrame, updated by the rows added and evicted since the last call"""
+        if self._frame_version == self.version:
+            return self._frame
+
+        if self._frame is None or not self._framed:
+            self._frame = self._filtered_frame(0)
+        else:
+            import pandas as pd
+            kept = self._frame.iloc[self._frame_dropped:]
+            new = self._filtered_frame(self._framed)
+            df = pd.concat([kept, new], ignore_index=True) if len(new) else kept.reset_index(drop=True)
+            if any(df[column].dtype != kept[column].dtype for column in DIMENSION_COLUMNS if column in df):
+                df = categorize(df)  # A value new to the vocabularies changed the categories
+            self._frame = df
+        self._framed = len(self)
+        self._frame_dropped = 0
+        self._frame_version = self.version
+        return self._frame
@@ -0,0 +1,214 @@
+import argparse
+import sqlite3
+import sys
+
+from filters import build_summary_where, build_where, whole_days
+from sales_schema import (DAY_TOTALS_TABLE, DIMENSION_COLUMNS, MISSING_VALUE, PARTITION_PREFIX, SALES_INDEXES,
+                          SUMMARY_COLUMNS, SUMMARY_TABLE, code_column, create_indexes, dimension_table,
+                          partition_select_sql, partition_tables, summarized_tables, table_day, to_day, union_all)
+
+SALES_DB = "sales_data.db"
+REVENUE_COLUMN = "final_price_after_discount"
+
+# Dimensions the dashboard charts group on
+GROUP_COLUMNS = SUMMARY_COLUMNS
+
+def ensure_indexes(conn):
+    """Create any missing sales indexes on every partition"""
+    for table in partition_tables(conn):
+        create_indexes(conn, table)
+    conn.commit()
+
+# Each query below reads only the partitions it is given (those overlapping
+# the time range, from partition_tables) plus the whole days of the range
+# that were folded into the daily summary, so its cost follows the range
+# rather than the size of the history. Partitions listed as summarized
+# (from summarized_tables) that lie wholly inside the range are read from
+# their day totals instead, leaving at most the first and last day to scan.
+
+def scanned_partitions(tables, summarized, start, end):
+    """The partitions not covered by the day totals of the whole days inside [start, end)"""
+    first, stop = whole_days(start, end)
+    return [
+        table for table in tables
+        if table not in summarized
+        or (first is not None and table_day(table) < first)
+        or (stop is not None and table_day(table) >= stop)
+    ]
+
+def summary_parts(select, dimension, regions, categories, start, end, summarized):
+    """select run on the daily summary, and on the day totals if any partition is summarized"""
+    where, params = build_summary_where(dimension, regions, categories, start, end)
+    parts, part_params = [select.format(table=SUMMARY_TABLE, where=where)], list(params)
+    if summarized:
+        # A total whose orders were all deleted is left behind at zero
+        parts.append(select.format(table=DAY_TOTALS_TABLE, where=where + " AND orders != 0"))
+        part_params.extend(params)
+    return parts, part_params
+
+def partition_filters(tables, regions, categories, start, end):
+    """
+    (table, where, params) per partition
+
+    Only the partitions the range starts or ends in need the timestamp
+    bounds; the days in between lie wholly inside the range, and leaving
+    the bounds off lets SQLite use the covering indexes on them.
+    """
+    first = to_day(start) if start is not None else None
+    last = to_day(end) if end is not None else None
+    for table in tables:
+        day = table_day(table)
+        where, params = build_where(
+            regions, categories,
+            start if first is not None and day <= first else None,
+            end if last is not None and day >= last else None,
+            encoded=True
+        )
+        yield table, where, params
+
+def kpi_query(regions=None, categories=None, start=None, end=None, tables=(), summarized=()):
+    parts, params = [], []
+    scanned = scanned_partitions(tables, summarized, start, end)
+    for table, where, table_params in partition_filters(scanned, regions, categories, start, end):
+        parts.append(f"SELECT COUNT(*) AS orders, TOTAL({REVENUE_COLUMN}) AS revenue FROM {table}{where}")
+        params.extend(table_params)
+    summary_sql, summary_params = summary_parts(
+        "SELECT SUM(orders) AS orders, SUM(revenue) AS revenue FROM {table}{where}",
+        "region_of_sales", regions, categories, start, end, summarized
+    )
+    parts.extend(summary_sql)
+    sql = (
+        f"SELECT COALESCE(SUM(orders), 0), SUM(revenue), SUM(revenue) / SUM(orders) "
+        f"FROM ({union_all(parts)})"
+    )
+    return sql, params + summary_params
+
+def revenue_by_query(column, regions=None, categories=None, start=None, end=None, tables=(), summarized=()):
+    if column not in GROUP_COLUMNS:
+        raise ValueError(f"Cannot group sales by {column}")
+    parts, params = [], []
+    scanned = scanned_partitions(tables, summarized, start, end)
+    for partition, where, table_params in partition_filters(scanned, regions, categories, start, end):
+        if column in DIMENSION_COLUMNS:
+            # Group on the integer codes first, then decode the handful of result rows
+            code, table = code_column(column), dimension_table(column)
+            parts.append(
+                f"SELECT {table}.value AS value, totals.revenue, totals.orders FROM ("
+                f"SELECT {code}, TOTAL({REVENUE_COLUMN}) AS revenue, COUNT(*) AS orders "
+                f"FROM {partition}{where} GROUP BY {code}"
+                f") AS totals LEFT JOIN {table} ON {table}.id = totals.{code}"
+            )
+        else:
+            parts.append(
+                f"SELECT {column} AS value, TOTAL({REVENUE_COLUMN}) AS revenue, COUNT(*) AS orders "
+                f"FROM {partition}{where} GROUP BY {column}"
+            )
+        params.extend(table_params)
+    summary_sql, summary_params = summary_parts(
+        f"SELECT NULLIF(value, '{MISSING_VALUE}') AS value, SUM(revenue) AS revenue, SUM(orders) AS orders "
+        "FROM {table}{where} GROUP BY 1",
+        column, regions, categories, start, end, summarized
+    )
+    parts.extend(summary_sql)
+    sql = (
+        f"SELECT value, SUM(revenue) AS revenue, SUM(orders) AS orders "
+        f"FROM ({union_all(parts)}) GROUP BY value ORDER BY value"
+    )
+    return sql, params + summary_params
+
+def history_query(regions=None, categories=None, start=None, end=None, limit=None, tables=(), descending=True):
+    """Decoded rows from the given partitions, newest first (or oldest first)"""
+    if not tables:
+        return "SELECT * FROM sales WHERE 0", []
+    parts, params = [], []
+    for table, where, table_params in partition_filters(tables, regions, categories, start, end):
+        parts.append(partition_select_sql(table) + where)
+        params.extend(table_params)
+    sql = union_all(parts)
+    sql += " ORDER BY timestamp DESC" if descending else " ORDER BY timestamp"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return sql, params
+
+def fetch_kpis(conn, regions=None, categories=None, start=None, end=None):
+    """Order count, total revenue and average order value"""
+    tables = partition_tables(conn, start, end)
+    summarized = summarized_tables(conn)
+    orders, revenue, average = conn.execute(*kpi_query(regions, categories, start, end, tables, summarized)).fetchone()
+    return {"orders": orders, "total_revenue": revenue or 0.0, "avg_order": average}
+
+def fetch_revenue_by(conn, column, regions=None, categories=None, start=None, end=None):
+    """(value, revenue, orders) rows for one dimension, aggregated inside SQLite"""
+    tables = partition_tables(conn, start, end)
+    summarized = summarized_tables(conn)
+    return conn.execute(*revenue_by_query(column, regions, categories, start, end, tables, summarized)).fetchall()
+
+def explain(conn, sql, params=()):
+    """Return the detail lines of EXPLAIN QUERY PLAN"""
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+def uses_index(plan):
+    """True when no step of the plan reads a sales partition without an index"""
+    for step in plan:
+        if step.startswith(("SCAN", "SEARCH")) and f" {PARTITION_PREFIX}" in step and "INDEX" not in step:
+            return False
+    return True
+
+def dashboard_queries(regions=None, categories=None, tables=(), summarized=()):
+    """Every query the dashboard issues, for the given filter selection"""
+    queries = {"kpis": kpi_query(regions, categories, tables=tables, summarized=summarized)}
+    for column in GROUP_COLUMNS:
+        queries[f"revenue_by_{column}"] = revenue_by_query(
+            column, regions, categories, tables=tables, summarized=summarized
+        )
+    queries["history"] = history_query(regions, categories, tables=tables)
+    return queries
+
+def check_query_plans(conn):
+    """
+    EXPLAIN each dashboard query with and without filters
+
+    Returns (name, ok, plan) tuples; ok is False for any query that falls
+    back to a full scan of a sales partition.
+    """
+    tables = partition_tables(conn)
+    summarized = summarized_tables(conn)
+    results = []
+    selections = {
+        "unfiltered": (None, None),
+        "region": (["North", "East"], None),
+        "category": (None, ["AI Solutions"]),
+        "region+category": (["North"], ["AI Solutions", "Cloud Services"])
+    }
+    for label, (regions, categories) in selections.items():
+        for name, (sql, params) in dashboard_queries(regions, categories, tables, summarized).items():
+            plan = explain(conn, sql, params)
+            results.append((f"{name} [{label}]", uses_index(plan), plan))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain and check the sales_data.db partition indexes")
+    parser.add_argument("--db", default=SALES_DB)
+    parser.add_argument("--explain", action="store_true", help="Check every dashboard query uses an index")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        ensure_indexes(conn)
+        conn.execute("ANALYZE")
+        print(f"✅ {len(SALES_INDEXES)} indexes in place on each of {len(partition_tables(conn))} partitions in {args.db}")
+
+        if args.explain:
+            failures = 0
+            for name, ok, plan in check_query_plans(conn):
+                failures += not ok
+                print(f"{'✅' if ok else '❌'} {name}: {' | '.join(plan)}")
+            if failures:
+                print(f"⚠️ {failures} queries scan a sales partition without an index")
+                sys.exit(1)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,634 @@
+import argparse
+import os
+import sqlite3
+from datetime import date, datetime, timedelta
+
+SALES_DB = "sales_data.db"
+FACT_TABLE = "sales_facts"  # The single fact table used before partitioning
+REVENUE_COLUMN = "final_price_after_discount"
+
+# Sales rows live in one table per day, listed in the catalog. Days past
+# the retention period are folded into the daily summary and dropped.
+# The day totals hold the same sums for the partitions still present,
+# kept current by triggers on each partition.
+PARTITION_PREFIX = "sales_facts_"
+CATALOG_TABLE = "sales_partitions"
+SUMMARY_TABLE = "sales_daily_summary"
+DAY_TOTALS_TABLE = "sales_day_totals"
+
+# SQLite treats NULLs as distinct in a UNIQUE constraint, so the totals
+# store a missing value or code as these instead; dimension ids start at 1
+MISSING_VALUE = ""
+MISSING_CODE = 0
+
+# SQLite refuses compound SELECTs with more than 500 terms
+MAX_UNION_TERMS = 200
+
+# Columns of the sales view, in the order of the original sales table
+SALES_COLUMNS = [
+    ("sales_id", "TEXT PRIMARY KEY"),
+    ("product_id", "TEXT"),
+    ("product_name", "TEXT"),
+    ("product_category", "TEXT"),
+    ("total_sales_revenue", "REAL"),
+    ("number_of_transactions", "INTEGER"),
+    ("quantity_sold", "INTEGER"),
+    ("unit_price", "REAL"),
+    ("discount_applied_pct", "REAL"),
+    ("final_price_after_discount", "REAL"),
+    ("payment_method", "TEXT"),
+    ("country", "TEXT"),
+    ("region_of_sales", "TEXT"),
+    ("city", "TEXT"),
+    ("customer_type", "TEXT"),
+    ("industry", "TEXT"),
+    ("sales_rep", "TEXT"),
+    ("timestamp", "TEXT"),
+    ("date", "TEXT"),
+    ("ip_address", "TEXT"),
+    ("method", "TEXT"),
+    ("page_accessed", "TEXT"),
+    ("response_code", "INTEGER"),
+    ("user_agent", "TEXT")
+]
+
+# Low-cardinality columns stored as integer codes into dim_<column> tables
+DIMENSION_COLUMNS = [
+    "product_category",
+    "payment_method",
+    "country",
+    "region_of_sales",
+    "city",
+    "customer_type",
+    "industry",
+    "sales_rep",
+    "user_agent",
+    "method"
+]
+
+# Groupings the daily summary keeps totals for (the dashboard charts)
+SUMMARY_COLUMNS = [
+    "region_of_sales",
+    "customer_type",
+    "product_name",
+    "sales_rep",
+    "product_category",
+    "payment_method"
+]
+
+def dimension_table(column):
+    return f"dim_{column}"
+
+def code_column(column):
+    return f"{column}_id"
+
+def fact_columns():
+    """Column names of a fact table, dimensions replaced by their code columns"""
+    return [code_column(name) if name in DIMENSION_COLUMNS else name for name, _ in SALES_COLUMNS]
+
+# Filter columns go right after the grouping column so each index also
+# covers the WHERE clause, and the revenue column last so GROUP BY queries
+# never have to visit the table itself. Dimensions are indexed by code.
+# Every partition gets all of them as idx_<partition>_<name>.
+REGION = code_column("region_of_sales")
+CATEGORY = code_column("product_category")
+SALES_INDEXES = {
+    "timestamp": ["timestamp"],
+    "region": [REGION, CATEGORY, REVENUE_COLUMN],
+    "category": [CATEGORY, REGION, REVENUE_COLUMN],
+    "rep": [code_column("sales_rep"), REGION, CATEGORY, REVENUE_COLUMN],
+    "customer_type": [code_column("customer_type"), REGION, CATEGORY, REVENUE_COLUMN],
+    "payment_method": [code_column("payment_method"), REGION, CATEGORY, REVENUE_COLUMN],
+    "product": ["product_name", REGION, CATEGORY, REVENUE_COLUMN]
+}
+
+def to_day(value):
+    """YYYY-MM-DD for a date, datetime or ISO string"""
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    return str(value)[:10]
+
+def partition_table(day):
+    """Table holding the rows of one day, e.g. sales_facts_20250101"""
+    # Parsing the day also keeps anything but a date out of the table name
+    return PARTITION_PREFIX + datetime.strptime(to_day(day), "%Y-%m-%d").strftime("%Y%m%d")
+
+def table_day(table):
+    """The day a partition table holds"""
+    return datetime.strptime(table[len(PARTITION_PREFIX):], "%Y%m%d").strftime("%Y-%m-%d")
+
+def partition_day(record):
+    """The day a sales record belongs to, from its date (or timestamp)"""
+    return record.get("date") or to_day(record.get("timestamp") or datetime.now())
+
+def insert_fact_sql(table):
+    return f"INSERT INTO {table} VALUES ({', '.join('?' for _ in SALES_COLUMNS)})"
+
+def union_all(selects):
+    """Join SELECTs with UNION ALL, nesting them so no compound exceeds SQLite's term limit"""
+    while len(selects) > MAX_UNION_TERMS:
+        selects = [
+            "SELECT * FROM (" + " UNION ALL ".join(selects[i:i + MAX_UNION_TERMS]) + ")"
+            for i in range(0, len(selects), MAX_UNION_TERMS)
+        ]
+    return " UNION ALL ".join(selects)
+
+def create_dimension_tables(conn, vocabularies=None):
+    """
+    Create the dim_<column> tables and seed them with the known vocabularies
+
+    Seeding in vocabulary order gives the fixed values the same small codes
+    in every database; anything else gets a code the first time it is seen.
+    """
+    vocabularies = vocabularies or {}
+    for column in DIMENSION_COLUMNS:
+        table = dimension_table(column)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE)")
+        values = vocabularies.get(column)
+        if values:
+            conn.executemany(f"INSERT OR IGNORE INTO {table} (value) VALUES (?)", [(value,) for value in values])
+
+def create_fact_table(conn, table):
+    definitions = [
+        f"{code_column(name)} INTEGER" if name in DIMENSION_COLUMNS else f"{name} {sql_type}"
+        for name, sql_type in SALES_COLUMNS
+    ]
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (\n    " + ",\n    ".join(definitions) + "\n)")
+
+def create_indexes(conn, table):
+    for name, columns in SALES_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{name} ON {table} ({', '.join(columns)})")
+
+def create_catalog(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {CATALOG_TABLE} (
+        day TEXT PRIMARY KEY,
+        table_name TEXT NOT NULL UNIQUE,
+        created_at TEXT
+    )
+    """)
+
+def create_summary_table(conn):
+    """
+    Per-day totals of folded partitions, one row per day, region, category
+    and value of each summary column
+
+    Region and category codes are kept on every row so the dashboard
+    filters still apply; each order appears once per summary column.
+    Missing values and codes are keyed as MISSING_VALUE and MISSING_CODE.
+    """
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (
+        date TEXT NOT NULL,
+        dimension TEXT NOT NULL,
+        value TEXT,
+        {REGION} INTEGER,
+        {CATEGORY} INTEGER,
+        orders INTEGER NOT NULL,
+        revenue REAL NOT NULL,
+        UNIQUE (date, dimension, value, {REGION}, {CATEGORY})
+    )
+    """)
+
+def create_day_totals_table(conn):
+    """
+    Per-day totals of the partitions still present, shaped like the daily summary
+
+    Keyed by dimension first, as every reader asks for one dimension over a
+    range of days. Rows are only ever added to, so a total whose orders have
+    all been deleted stays behind with orders = 0.
+    """
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {DAY_TOTALS_TABLE} (
+        dimension TEXT NOT NULL,
+        date TEXT NOT NULL,
+        value TEXT,
+        {REGION} INTEGER,
+        {CATEGORY} INTEGER,
+        orders INTEGER NOT NULL,
+        revenue REAL NOT NULL,
+        UNIQUE (dimension, date, value, {REGION}, {CATEGORY})
+    )
+    """)
+
+def total_key_sql(value, region, category):
+    """The value, region and category key of a totals row, with missing ones replaced by the sentinels"""
+    return f"COALESCE({value}, '{MISSING_VALUE}'), COALESCE({region}, {MISSING_CODE}), COALESCE({category}, {MISSING_CODE})"
+
+def summary_value_sql(column, row=None):
+    """The decoded value of a summary column, for a whole partition or one trigger row (NEW/OLD)"""
+    prefix = f"{row}." if row else ""
+    if column in DIMENSION_COLUMNS:
+        return f"(SELECT value FROM {dimension_table(column)} WHERE id = {prefix}{code_column(column)})"
+    return f"{prefix}{column}"
+
+def day_totals_upsert_sql(table, column, row, sign):
+    """Add (sign 1) or take away (sign -1) one trigger row in the day totals"""
+    return f"""
+        INSERT INTO {DAY_TOTALS_TABLE} (dimension, date, value, {REGION}, {CATEGORY}, orders, revenue)
+        VALUES ('{column}', '{table_day(table)}',
+                {total_key_sql(summary_value_sql(column, row), f"{row}.{REGION}", f"{row}.{CATEGORY}")},
+                {sign}, {sign} * IFNULL({row}.{REVENUE_COLUMN}, 0.0))
+        ON CONFLICT (dimension, date, value, {REGION}, {CATEGORY}) DO UPDATE SET
+            orders = orders + excluded.orders,
+            revenue = revenue + excluded.revenue;"""
+
+def day_totals_trigger_sql(table):
+    """Triggers keeping the day totals in step with every insert, delete and update on a partition"""
+    add = "".join(day_totals_upsert_sql(table, column, "NEW", 1) for column in SUMMARY_COLUMNS)
+    remove = "".join(day_totals_upsert_sql(table, column, "OLD", -1) for column in SUMMARY_COLUMNS)
+    return [
+        f"CREATE TRIGGER {table}_totals_insert AFTER INSERT ON {table} BEGIN{add}\nEND",
+        f"CREATE TRIGGER {table}_totals_delete AFTER DELETE ON {table} BEGIN{remove}\nEND",
+        f"CREATE TRIGGER {table}_totals_update AFTER UPDATE ON {table} BEGIN{remove}{add}\nEND"
+    ]
+
+def summarized_tables(conn):
+    """Partitions whose rows are kept in the day totals"""
+    rows = conn.execute(
+        "SELECT tbl_name FROM sqlite_master WHERE type = 'trigger' AND name = tbl_name || '_totals_insert'"
+    ).fetchall()
+    return {table for (table,) in rows}
+
+def install_day_totals_triggers(conn, table):
+    for action in ("insert", "delete", "update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {table}_totals_{action}")
+    for sql in day_totals_trigger_sql(table):
+        conn.execute(sql)
+
+def summarize_partition(conn, table):
+    """
+    Recount a partition's day totals and (re)install its triggers
+
+    Call inside a transaction, so readers see either the old totals or the
+    new ones along with the triggers that keep them current.
+    """
+    conn.execute(f"DELETE FROM {DAY_TOTALS_TABLE} WHERE date = ?", (table_day(table),))
+    for column in SUMMARY_COLUMNS:
+        group = code_column(column) if column in DIMENSION_COLUMNS else column
+        # Groups can share a key once missing values become sentinels, hence the upsert
+        conn.execute(f"""
+        INSERT INTO {DAY_TOTALS_TABLE} (dimension, date, value, {REGION}, {CATEGORY}, orders, revenue)
+        SELECT '{column}', '{table_day(table)}', {total_key_sql(summary_value_sql(column), REGION, CATEGORY)},
+               COUNT(*), TOTAL({REVENUE_COLUMN})
+        FROM {table} WHERE 1
+        GROUP BY {group}, {REGION}, {CATEGORY}
+        ON CONFLICT (dimension, date, value, {REGION}, {CATEGORY}) DO UPDATE SET
+            orders = orders + excluded.orders,
+            revenue = revenue + excluded.revenue
+        """)
+    install_day_totals_triggers(conn, table)
+
+def has_null_total_keys(conn):
+    """True when totals rows or day totals triggers from before the sentinels still key missing values by NULL"""
+    stale = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = tbl_name || '_totals_insert' "
+        "AND instr(sql, 'COALESCE') = 0"
+    ).fetchone()
+    if stale:
+        return True
+    for table in (SUMMARY_TABLE, DAY_TOTALS_TABLE):
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() and \
+                conn.execute(f"SELECT 1 FROM {table} WHERE value IS NULL OR {REGION} IS NULL OR {CATEGORY} IS NULL "
+                             f"LIMIT 1").fetchone():
+            return True
+    return False
+
+def fix_null_total_keys(conn):
+    """
+    Merge totals rows keyed by NULL into their sentinel rows and reinstall the day totals triggers
+
+    Call inside a transaction.
+    """
+    keys = {SUMMARY_TABLE: "date, dimension", DAY_TOTALS_TABLE: "dimension, date"}
+    for table, leading in keys.items():
+        conn.execute(f"""
+        INSERT INTO {table} ({leading}, value, {REGION}, {CATEGORY}, orders, revenue)
+        SELECT {leading}, {total_key_sql("value", REGION, CATEGORY)}, SUM(orders), SUM(revenue)
+        FROM {table}
+        WHERE value IS NULL OR {REGION} IS NULL OR {CATEGORY} IS NULL
+        GROUP BY {leading}, value, {REGION}, {CATEGORY}
+        ON CONFLICT ({leading}, value, {REGION}, {CATEGORY}) DO UPDATE SET
+            orders = orders + excluded.orders,
+            revenue = revenue + excluded.revenue
+        """)
+        conn.execute(f"DELETE FROM {table} WHERE value IS NULL OR {REGION} IS NULL OR {CATEGORY} IS NULL")
+    for table in summarized_tables(conn):
+        install_day_totals_triggers(conn, table)
+
+def has_day_totals(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (DAY_TOTALS_TABLE,)).fetchone() is not None
+
+def rebuild_day_totals(conn, everything=False):
+    """
+    Create the day totals if needed and summarize the partitions that lack them (or all of them)
+
+    Call inside a transaction. Returns the number of partitions summarized.
+    """
+    create_day_totals_table(conn)
+    done = set() if everything else summarized_tables(conn)
+    tables = [table for table in partition_tables(conn) if table not in done]
+    if everything:
+        conn.execute(f"DELETE FROM {DAY_TOTALS_TABLE}")  # Also clears the totals of days no longer present
+    for table in tables:
+        summarize_partition(conn, table)
+    return len(tables)
+
+def partition_select_sql(table, with_rowid=False):
+    """One partition with every dimension decoded, in sales column order (after its rowid if asked for)"""
+    selects, joins = [f"{table}.rowid"] if with_rowid else [], []
+    for name, _ in SALES_COLUMNS:
+        if name in DIMENSION_COLUMNS:
+            dim = dimension_table(name)
+            selects.append(f"{dim}.value AS {name}")
+            joins.append(f"LEFT JOIN {dim} ON {dim}.id = {table}.{code_column(name)}")
+        else:
+            selects.append(f"{table}.{name} AS {name}")
+    return f"SELECT {', '.join(selects)} FROM {table} " + " ".join(joins)
+
+def list_partitions(conn, start=None, end=None):
+    """(day, table) of the partitions that can hold rows between start and end, oldest first"""
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("day >= ?")
+        params.append(to_day(start))
+    if end is not None:
+        clauses.append("day <= ?")
+        params.append(to_day(end))
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    return conn.execute(f"SELECT day, table_name FROM {CATALOG_TABLE}{where} ORDER BY day", params).fetchall()
+
+def partition_tables(conn, start=None, end=None):
+    return [table for _, table in list_partitions(conn, start, end)]
+
+def sales_view_sql(tables):
+    """The sales view decodes every partition, so ad-hoc readers see the original columns"""
+    if not tables:
+        columns = ", ".join(f"NULL AS {name}" for name, _ in SALES_COLUMNS)
+        return f"CREATE VIEW sales AS SELECT {columns} WHERE 0"
+    return "CREATE VIEW sales AS " + union_all([partition_select_sql(table) for table in tables])
+
+def refresh_sales_view(conn):
+    """Rebuild the sales view over the current partitions"""
+    conn.execute("DROP VIEW IF EXISTS sales")
+    conn.execute(sales_view_sql(partition_tables(conn)))
+
+def create_partition(conn, day, refresh_view=True, indexed=True, summarized=True):
+    """
+    Create, index and register the partition for a day if needed, returning its table name
+
+    Bulk loads can pass indexed=False and call create_indexes once the day's
+    rows are in, which is much faster than maintaining the indexes per row.
+    Likewise summarized=False leaves out the day totals triggers until
+    summarize_partition is called; readers scan the partition meanwhile.
+    """
+    day = to_day(day)
+    table = partition_table(day)
+    if conn.execute(f"SELECT 1 FROM {CATALOG_TABLE} WHERE day = ?", (day,)).fetchone():
+        return table
+
+    create_fact_table(conn, table)
+    if indexed:
+        create_indexes(conn, table)
+    if summarized:
+        for sql in day_totals_trigger_sql(table):
+            conn.execute(sql)
+    conn.execute(
+        f"INSERT INTO {CATALOG_TABLE} (day, table_name, created_at) VALUES (?, ?, ?)",
+        (day, table, datetime.now().isoformat(timespec="seconds"))
+    )
+    if refresh_view:
+        refresh_sales_view(conn)
+    return table
+
+def create_sales_schema(conn, vocabularies=None):
+    """Dimension tables, the partition catalog, the daily summary, the day totals and the decoding sales view"""
+    create_dimension_tables(conn, vocabularies)
+    create_catalog(conn)
+    create_summary_table(conn)
+    create_day_totals_table(conn)
+    refresh_sales_view(conn)
+
+def drop_sales_schema(conn):
+    """Drop every sales table and view, partitioned or not"""
+    conn.execute("DROP VIEW IF EXISTS sales")
+    conn.execute("DROP TABLE IF EXISTS sales")
+    tables = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND (name = ? OR name LIKE ? OR name IN (?, ?, ?))",
+        (FACT_TABLE, PARTITION_PREFIX + "%", CATALOG_TABLE, SUMMARY_TABLE, DAY_TOTALS_TABLE)
+    ).fetchall()
+    for (table,) in tables:
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+    for column in DIMENSION_COLUMNS:
+        conn.execute(f"DROP TABLE IF EXISTS {dimension_table(column)}")
+
+def is_legacy_schema(conn):
+    """True when sales is still a plain table holding the strings in every row"""
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'sales'").fetchone()
+    return row is not None and row[0] == "table"
+
+def is_unpartitioned(conn):
+    """True when the rows are still in the single sales_facts table"""
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FACT_TABLE,)).fetchone() is not None
+
+def split_into_partitions(conn, source, selects):
+    """Copy the rows of source into day partitions; selects produce the fact columns from source"""
+    day = "COALESCE(date, substr(timestamp, 1, 10))"
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{source}_day ON {source} ({day})")
+    moved = 0
+    for (value,) in conn.execute(f"SELECT DISTINCT {day} FROM {source} WHERE {day} IS NOT NULL").fetchall():
+        table = create_partition(conn, value, refresh_view=False, summarized=False)
+        moved += conn.execute(
+            f"INSERT INTO {table} ({', '.join(fact_columns())}) "
+            f"SELECT {', '.join(selects)} FROM {source} WHERE {day} = ?",
+            (value,)
+        ).rowcount
+        summarize_partition(conn, table)  # One GROUP BY instead of a trigger run per row
+    return moved
+
+def migrate_sales_table(conn, vocabularies=None):
+    """
+    Move a legacy sales table into day partitions plus dimension tables
+
+    Runs in one transaction; returns the number of rows migrated, or None
+    if the database was already migrated.
+    """
+    if not is_legacy_schema(conn):
+        return None
+
+    with conn:
+        conn.execute("BEGIN")  # The DDL below must not autocommit on its own
+        conn.execute("ALTER TABLE sales RENAME TO sales_legacy")
+        create_sales_schema(conn, vocabularies)
+        for column in DIMENSION_COLUMNS:
+            conn.execute(
+                f"INSERT OR IGNORE INTO {dimension_table(column)} (value) "
+                f"SELECT DISTINCT {column} FROM sales_legacy WHERE {column} IS NOT NULL"
+            )
+
+        selects = [
+            f"(SELECT id FROM {dimension_table(name)} WHERE value = sales_legacy.{name})"
+            if name in DIMENSION_COLUMNS else name
+            for name, _ in SALES_COLUMNS
+        ]
+        migrated = split_into_partitions(conn, "sales_legacy", selects)
+        conn.execute("DROP TABLE sales_legacy")
+        refresh_sales_view(conn)
+    return migrated
+
+def partition_fact_table(conn, vocabularies=None):
+    """
+    Split the single sales_facts table into day partitions
+
+    Runs in one transaction; returns the number of rows moved, or None if
+    there was nothing to split.
+    """
+    if not is_unpartitioned(conn):
+        return None
+
+    with conn:
+        conn.execute("BEGIN")
+        create_sales_schema(conn, vocabularies)
+        migrated = split_into_partitions(conn, FACT_TABLE, fact_columns())
+        conn.execute(f"DROP TABLE {FACT_TABLE}")
+        refresh_sales_view(conn)
+    return migrated
+
+def fold_partition_sql(table, column):
+    """Add one partition's totals per region, category and value of column to the daily summary"""
+    group = code_column(column) if column in DIMENSION_COLUMNS else column
+    return f"""
+    INSERT INTO {SUMMARY_TABLE} (date, dimension, value, {REGION}, {CATEGORY}, orders, revenue)
+    SELECT '{table_day(table)}', '{column}', {total_key_sql(summary_value_sql(column), REGION, CATEGORY)},
+           COUNT(*), TOTAL({REVENUE_COLUMN})
+    FROM {table} WHERE 1
+    GROUP BY {group}, {REGION}, {CATEGORY}
+    ON CONFLICT (date, dimension, value, {REGION}, {CATEGORY}) DO UPDATE SET
+        orders = orders + excluded.orders,
+        revenue = revenue + excluded.revenue
+    """
+
+def compact_partitions(conn, retain_days, today=None):
+    """
+    Fold partitions older than retain_days into the daily summary and drop them
+
+    Call inside a transaction. Returns (partitions, rows) folded; the freed
+    pages are reused by new partitions, and VACUUM hands them back to the
+    filesystem.
+    """
+    cutoff = to_day((today or date.today()) - timedelta(days=retain_days))
+    old = conn.execute(f"SELECT day, table_name FROM {CATALOG_TABLE} WHERE day < ? ORDER BY day", (cutoff,)).fetchall()
+    rows = 0
+    for day, table in old:
+        for column in SUMMARY_COLUMNS:
+            conn.execute(fold_partition_sql(table, column))
+        rows += conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        conn.execute(f"DROP TABLE {table}")  # Its triggers go with it
+        conn.execute(f"DELETE FROM {DAY_TOTALS_TABLE} WHERE date = ?", (day,))
+        conn.execute(f"DELETE FROM {CATALOG_TABLE} WHERE day = ?", (day,))
+    if old:
+        refresh_sales_view(conn)
+    return len(old), rows
+
+def apply_retention(db_path, retain_days):
+    """Compact partitions older than retain_days in one transaction, then VACUUM; returns (partitions, rows)"""
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.execute("BEGIN")
+            folded = compact_partitions(conn, retain_days)
+        if folded[0]:
+            conn.execute("VACUUM")
+        return folded
+    finally:
+        conn.close()
+
+class DimensionEncoder:
+    """
+    Turns sales records into fact rows, caching value -> code per column
+
+    Unknown values are added to their dimension table on first sight. Call
+    reload() after rolling back a transaction that may have added some.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.reload()
+
+    def reload(self):
+        self.codes = {
+            column: dict(self.conn.execute(f"SELECT value, id FROM {dimension_table(column)}"))
+            for column in DIMENSION_COLUMNS
+        }
+
+    def code(self, column, value):
+        if value is None:
+            return None
+        codes = self.codes[column]
+        code = codes.get(value)
+        if code is None:
+            table = dimension_table(column)
+            self.conn.execute(f"INSERT OR IGNORE INTO {table} (value) VALUES (?)", (value,))
+            code = self.conn.execute(f"SELECT id FROM {table} WHERE value = ?", (value,)).fetchone()[0]
+            codes[value] = code
+        return code
+
+    def encode(self, record):
+        """One record as a tuple in fact table column order"""
+        return tuple(
+            self.code(name, record.get(name)) if name in DIMENSION_COLUMNS else record.get(name)
+            for name, _ in SALES_COLUMNS
+        )
+
+    def encode_all(self, records):
+        return [self.encode(record) for record in records]
+
+def main():
+    # Imported here because data_generator itself builds on this module
+    from data_generator import DIMENSION_VOCABULARIES
+
+    parser = argparse.ArgumentParser(description="Move sales_data.db to day partitions and apply retention")
+    parser.add_argument("--db", default=SALES_DB, help="Sales database to maintain")
+    parser.add_argument("--retain-days", type=int, default=None,
+                        help="Fold partitions older than this many days into the daily summary")
+    parser.add_argument("--rebuild-totals", action="store_true",
+                        help=f"Recount {DAY_TOTALS_TABLE} from every partition and reinstall its triggers")
+    args = parser.parse_args()
+
+    size_before = os.path.getsize(args.db)
+    conn = sqlite3.connect(args.db)
+    try:
+        migrated = migrate_sales_table(conn, DIMENSION_VOCABULARIES)
+        if migrated is None:
+            migrated = partition_fact_table(conn, DIMENSION_VOCABULARIES)
+        if migrated is not None:
+            print(f"✅ Moved {migrated:,} rows into {len(list_partitions(conn))} day partitions")
+        if has_null_total_keys(conn):
+            with conn:
+                conn.execute("BEGIN")
+                fix_null_total_keys(conn)
+            print("✅ Keyed missing values in the totals by sentinels instead of NULL")
+        if args.rebuild_totals or not has_day_totals(conn):
+            with conn:
+                conn.execute("BEGIN")
+                summed = rebuild_day_totals(conn, everything=args.rebuild_totals)
+            print(f"✅ Summed {summed} partitions into {DAY_TOTALS_TABLE}")
+    finally:
+        conn.close()
+
+    if args.retain_days is not None:
+        partitions, rows = apply_retention(args.db, args.retain_days)
+        print(f"✅ Folded {partitions} partitions ({rows:,} rows) older than {args.retain_days} days into {SUMMARY_TABLE}")
+    elif migrated is not None:
+        conn = sqlite3.connect(args.db)
+        conn.execute("VACUUM")  # Hand the space of the old tables back to the filesystem
+        conn.close()
+    else:
+        print("✅ Sales data is already partitioned by day")
+        return
+
+    size_after = os.path.getsize(args.db)
+    print(f"✅ {size_before / 1024:,.0f} KB -> {size_after / 1024:,.0f} KB")
+
+if __name__ == "__main__":
+    main()
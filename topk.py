@@ -0,0 +1,215 @@
+import hashlib
+import heapq
+import json
+import math
+import zlib
+from array import array
+
+# Net weights at or below this count as gone (float revenue rarely cancels to exactly 0)
+EMPTY = 1e-6
+
+class SpaceSaving:
+    """
+    Heavy hitters of an insert-only stream in fixed memory (Space-Saving)
+
+    At most capacity keys are tracked. When a new key arrives and the table
+    is full it replaces the smallest counter and inherits its value as the
+    key's error. Each reported estimate overcounts by at most its own error,
+    and every error is at most total / capacity, so any key whose true
+    weight exceeds total / capacity is always tracked. Weights can be counts
+    (weight=1) or amounts such as revenue.
+    """
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.total = 0.0
+        # (count, key) entries, stale ones skipped lazily. merge() and from_bytes()
+        # set it to None, and the next update() rebuilds it
+        self.heap = []
+
+    def _rebuild_heap(self):
+        self.heap = [(count, key) for key, count in self.counts.items()]
+        heapq.heapify(self.heap)
+
+    def _push(self, key):
+        heapq.heappush(self.heap, (self.counts[key], key))
+        if len(self.heap) > 4 * self.capacity:
+            self._rebuild_heap()
+
+    def _pop_min(self):
+        while True:
+            count, key = heapq.heappop(self.heap)
+            if self.counts.get(key) == count:
+                return key, count
+
+    def update(self, key, weight=1):
+        if self.heap is None:
+            self._rebuild_heap()
+        self.total += weight
+        if key in self.counts:
+            self.counts[key] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = weight
+            self.errors[key] = 0
+        else:
+            smallest, count = self._pop_min()
+            del self.counts[smallest], self.errors[smallest]
+            self.counts[key] = count + weight
+            self.errors[key] = count
+        self._push(key)
+        return self
+
+    def update_all(self, weights):
+        """Fold in a mapping or (key, weight) pairs, e.g. a Counter of one batch"""
+        items = weights.items() if hasattr(weights, "items") else weights
+        for key, weight in items:
+            self.update(key, weight)
+        return self
+
+    @property
+    def max_error(self):
+        """
+        Upper bound on how far any estimate can overcount, and on the true
+        weight of any key that is not tracked: the smallest tracked count
+        once the table is full, which never exceeds total / capacity
+        """
+        if len(self.counts) < self.capacity:
+            return max(self.errors.values(), default=0)
+        return min(self.counts.values())
+
+    def top(self, k):
+        """[(key, estimate, error)] for the k largest, ties broken by key"""
+        items = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [(key, count, self.errors[key]) for key, count in items]
+
+    @property
+    def floor(self):
+        """Most a key missing from this summary can have had: the smallest count once full"""
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def merge(self, other):
+        """Combine with another summary; estimates stay upper bounds and max_error still holds"""
+        merged = merge_summaries([self, other], self.capacity)
+        self.counts, self.errors, self.total, self.heap = merged.counts, merged.errors, merged.total, None
+        return self
+
+    def to_bytes(self):
+        """zlib-compressed JSON, stored column-wise because flat lists parse fastest"""
+        keys = list(self.counts)
+        payload = {
+            "capacity": self.capacity,
+            "total": self.total,
+            "keys": keys,
+            "counts": [self.counts[key] for key in keys],
+            "errors": [self.errors[key] for key in keys]
+        }
+        return zlib.compress(json.dumps(payload).encode("utf-8"))
+
+    @classmethod
+    def from_bytes(cls, data):
+        payload = json.loads(zlib.decompress(data))
+        summary = cls(payload["capacity"])
+        summary.total = payload["total"]
+        summary.counts = dict(zip(payload["keys"], payload["counts"]))
+        summary.errors = dict(zip(payload["keys"], payload["errors"]))
+        summary.heap = None  # Only needed if the summary is updated
+        return summary
+
+def merge_summaries(summaries, capacity):
+    """
+    Merge SpaceSaving summaries (serialized ones and None entries are
+    accepted too) in one pass, keeping the capacity largest keys
+
+    A key missing from a summary gets that summary's floor, so each merged
+    count is still an upper bound on the key's true weight.
+    """
+    counts, errors = {}, {}
+    floors = total = 0
+    for summary in summaries:
+        if summary is None:
+            continue
+        if isinstance(summary, bytes):
+            summary = SpaceSaving.from_bytes(summary)
+        floor = summary.floor
+        floors += floor
+        total += summary.total
+        # Store each count less the floor; every key gets the sum of floors back below
+        for key, count in summary.counts.items():
+            counts[key] = counts.get(key, 0) + count - floor
+            errors[key] = errors.get(key, 0) + summary.errors[key] - floor
+
+    merged = SpaceSaving(capacity)
+    merged.total = total
+    for key, count in heapq.nlargest(capacity, counts.items(), key=lambda item: item[1]):
+        merged.counts[key] = count + floors
+        merged.errors[key] = errors[key] + floors
+    merged.heap = None
+    return merged
+
+class CountMinTopK:
+    """
+    Top-k of a stream that also removes items, e.g. a sliding window
+
+    A Count-Min sketch of width w and depth d estimates every key's weight.
+    With total weight N an estimate overcounts by at most e / w * N with
+    probability 1 - exp(-d), as long as no key's net weight goes negative.
+    Only a bounded set of candidate keys is kept for ranking; a key that
+    dropped out of the candidates rejoins the next time it is updated.
+    """
+
+    def __init__(self, k=5, width=8192, depth=4, candidates=None):
+        self.k = k
+        self.width = width
+        self.depth = depth
+        self.rows = [array("d", bytes(8 * width)) for _ in range(depth)]
+        self.total = 0.0
+        self.max_candidates = candidates or 4 * k
+        self.candidates = {}  # key -> cells, so candidate estimates need no rehashing
+
+    def _cells(self, key):
+        digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=4 * self.depth).digest()
+        return [int.from_bytes(digest[4 * i:4 * i + 4], "little") % self.width for i in range(self.depth)]
+
+    def _estimate(self, cells):
+        return min(row[cell] for row, cell in zip(self.rows, cells))
+
+    def _prune(self):
+        # Keep the heaviest candidates; pruning only when the set has doubled
+        # keeps the cost per update constant
+        ranked = sorted(self.candidates.items(), key=lambda item: self._estimate(item[1]), reverse=True)
+        self.candidates = dict(ranked[:self.max_candidates])
+
+    def update(self, key, weight=1):
+        cells = self.candidates.get(key) or self._cells(key)
+        for row, cell in zip(self.rows, cells):
+            row[cell] += weight
+        self.total += weight
+
+        if weight > 0:
+            self.candidates[key] = cells
+            if len(self.candidates) > 2 * self.max_candidates:
+                self._prune()
+        elif key in self.candidates and self._estimate(cells) <= EMPTY:
+            del self.candidates[key]
+        return self
+
+    def estimate(self, key):
+        return self._estimate(self.candidates.get(key) or self._cells(key))
+
+    @property
+    def max_error(self):
+        """Overcount bound that holds with probability 1 - exp(-depth)"""
+        return math.e / self.width * max(self.total, 0.0)
+
+    @property
+    def confidence(self):
+        return 1 - math.exp(-self.depth)
+
+    def top(self, k=None):
+        """[(key, estimate)] for the k heaviest candidates, ties broken by key"""
+        estimates = [(key, self._estimate(cells)) for key, cells in self.candidates.items()]
+        estimates = [(key, estimate) for key, estimate in estimates if estimate > EMPTY]
+        estimates.sort(key=lambda item: (-item[1], item[0]))
+        return estimates[:k or self.k]
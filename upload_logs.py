@@ -1 +1,291 @@
- 
+import argparse
+import csv
+import hashlib
+import ipaddress
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+LOGS_DB = "logs.db"
+BATCH_SIZE = 5000
+PREFETCH_BATCHES = 4
+DEDUP_WINDOW = 100000
+
+VALID_METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"}
+
+# Accepted spellings for each field, covering synthetic_logs.csv and exported sales rows
+FIELD_ALIASES = {
+    "timestamp": ["timestamp", "Timestamp", "time"],
+    "ip_address": ["ip_address", "IP Address", "ip"],
+    "method": ["method", "Method"],
+    "endpoint": ["endpoint", "Endpoint", "path", "page_accessed"],
+    "status_code": ["status_code", "Status Code", "status", "response_code"]
+}
+
+def create_logs_table(conn):
+    """Create the access log and checkpoint tables if they do not exist"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS access_logs (
+        id INTEGER PRIMARY KEY,
+        timestamp TEXT,
+        ip_address TEXT,
+        method TEXT,
+        endpoint TEXT,
+        status_code INTEGER,
+        source TEXT,
+        row_hash TEXT UNIQUE
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_access_logs_timestamp ON access_logs (timestamp)")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+        source TEXT PRIMARY KEY,
+        offset INTEGER,
+        rows INTEGER,
+        updated_at TEXT
+    )
+    """)
+    conn.commit()
+
+def load_checkpoint(conn, source):
+    """Return (byte offset, rows loaded) for a source file"""
+    row = conn.execute(
+        "SELECT offset, rows FROM ingest_checkpoints WHERE source = ?", (source,)
+    ).fetchone()
+    return row if row else (0, 0)
+
+def read_chunks(path, offset=0, batch_size=BATCH_SIZE, follow=False, poll_interval=1.0):
+    """
+    Yield (lines, end_offset) chunks of at most batch_size complete lines
+
+    With follow=True the reader keeps waiting for new lines like `tail -f`;
+    an unfinished last line is only yielded once its newline arrives.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        lines = []
+        while True:
+            line = f.readline()
+            if line and (line.endswith(b"\n") or not follow):
+                offset += len(line)
+                lines.append(line.decode("utf-8"))
+                if len(lines) >= batch_size:
+                    yield lines, offset
+                    lines = []
+                continue
+
+            if line:
+                # Half-written line - rewind and wait for the rest of it
+                f.seek(offset)
+            if lines:
+                yield lines, offset
+                lines = []
+            if not follow:
+                return
+            time.sleep(poll_interval)
+
+def read_csv_header(path):
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+def parse_chunks(chunks, fmt, header=None):
+    """Turn raw line chunks into dicts, skipping the CSV header line"""
+    for lines, end_offset in chunks:
+        if fmt == "csv":
+            rows = []
+            for row in csv.reader(lines):
+                if not row:
+                    continue
+                if row == header:
+                    continue
+                rows.append(dict(zip(header, row)))
+        else:
+            rows = []
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    rows.append(None)
+        yield rows, end_offset
+
+def pick(row, field):
+    for name in FIELD_ALIASES[field]:
+        if name in row and row[name] not in (None, ""):
+            return row[name]
+    return None
+
+def normalise_row(row, base_date):
+    """Return a clean (timestamp, ip, method, endpoint, status) tuple, or None if invalid"""
+    if not isinstance(row, dict):
+        return None
+    try:
+        raw_time = str(pick(row, "timestamp")).strip()
+        if "T" in raw_time or "-" in raw_time:
+            timestamp = datetime.fromisoformat(raw_time.replace(" ", "T"))
+        else:
+            # synthetic_logs.csv only records the time of day
+            timestamp = datetime.combine(base_date, datetime.strptime(raw_time, "%H:%M:%S").time())
+
+        ip = str(ipaddress.ip_address(str(pick(row, "ip_address")).strip()))
+        method = str(pick(row, "method")).strip().upper()
+        endpoint = str(pick(row, "endpoint")).strip()
+        status = int(pick(row, "status_code"))
+    except (TypeError, ValueError):
+        return None
+
+    if method not in VALID_METHODS or not endpoint.startswith("/") or not 100 <= status <= 599:
+        return None
+    return (timestamp.isoformat(timespec="seconds"), ip, method, endpoint, status)
+
+def normalise_chunks(chunks, base_date, stats):
+    for rows, end_offset in chunks:
+        clean = []
+        for row in rows:
+            values = normalise_row(row, base_date)
+            if values is None:
+                stats["rejected"] += 1
+            else:
+                clean.append(values)
+        yield clean, end_offset
+
+def deduplicate_chunks(chunks, stats, window=DEDUP_WINDOW):
+    """Drop rows seen recently; the UNIQUE row_hash catches anything older"""
+    recent = OrderedDict()
+    for rows, end_offset in chunks:
+        unique = []
+        for values in rows:
+            row_hash = hashlib.sha1("|".join(map(str, values)).encode("utf-8")).hexdigest()
+            if row_hash in recent:
+                stats["duplicates"] += 1
+                continue
+            recent[row_hash] = None
+            if len(recent) > window:
+                recent.popitem(last=False)
+            unique.append(values + (row_hash,))
+        yield unique, end_offset
+
+def prefetch(iterable, maxsize=PREFETCH_BATCHES):
+    """
+    Run the upstream stages on a background thread through a bounded queue
+
+    Parsing overlaps with database writes, and when the writer falls behind
+    the queue fills up and the reader blocks - so at most maxsize chunks are
+    ever held in memory.
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    done = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                buffer.put(item)
+        finally:
+            buffer.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = buffer.get()
+        if item is done:
+            return
+        yield item
+
+def load_chunks(conn, chunks, source, rows_loaded, stats, max_rate=None):
+    """Insert each chunk and advance the checkpoint in the same transaction"""
+    started = time.monotonic()
+    for rows, end_offset in chunks:
+        with conn:
+            before = conn.total_changes
+            conn.executemany("""
+            INSERT OR IGNORE INTO access_logs
+                (timestamp, ip_address, method, endpoint, status_code, row_hash, source)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [values + (source,) for values in rows])
+            inserted = conn.total_changes - before
+            rows_loaded += inserted
+            conn.execute("""
+            INSERT INTO ingest_checkpoints (source, offset, rows, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(source) DO UPDATE SET
+                offset = excluded.offset, rows = excluded.rows, updated_at = excluded.updated_at
+            """, (source, end_offset, rows_loaded, datetime.now().isoformat()))
+
+        stats["inserted"] += inserted
+        stats["already_loaded"] += len(rows) - inserted
+
+        elapsed = time.monotonic() - started
+        if max_rate and stats["inserted"] > max_rate * elapsed:
+            # Throttle continuous loads to the requested rows/second
+            time.sleep(stats["inserted"] / max_rate - elapsed)
+    return rows_loaded
+
+def detect_format(path):
+    return "jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+def ingest_file(path, db_path=LOGS_DB, fmt=None, batch_size=BATCH_SIZE, follow=False,
+                base_date=None, max_rate=None):
+    """Stream an access log file into SQLite, resuming from its checkpoint"""
+    fmt = fmt or detect_format(path)
+    source = os.path.abspath(path)
+    if base_date is None:
+        base_date = datetime.fromtimestamp(os.path.getmtime(path)).date()
+
+    stats = {"inserted": 0, "duplicates": 0, "already_loaded": 0, "rejected": 0}
+    conn = sqlite3.connect(db_path)
+    try:
+        create_logs_table(conn)
+        offset, rows_loaded = load_checkpoint(conn, source)
+        if offset > os.path.getsize(path):
+            # File was truncated or replaced - start again
+            offset = 0
+
+        header = read_csv_header(path) if fmt == "csv" else None
+        pipeline = read_chunks(path, offset, batch_size, follow)
+        pipeline = parse_chunks(pipeline, fmt, header)
+        pipeline = normalise_chunks(pipeline, base_date, stats)
+        pipeline = deduplicate_chunks(pipeline, stats)
+
+        started = time.monotonic()
+        load_chunks(conn, prefetch(pipeline), source, rows_loaded, stats, max_rate)
+        elapsed = time.monotonic() - started
+    finally:
+        conn.close()
+
+    stats["seconds"] = elapsed
+    stats["rows_per_second"] = stats["inserted"] / elapsed if elapsed else 0.0
+    return stats
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load CSV or JSONL access logs into logs.db")
+    parser.add_argument("paths", nargs="+", help="Log files to ingest")
+    parser.add_argument("--db", default=LOGS_DB, help="SQLite database to load into")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default=None,
+                        help="Input format (default: from the file extension)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows per transaction")
+    parser.add_argument("--follow", action="store_true", help="Keep loading lines as they are appended")
+    parser.add_argument("--date", type=lambda value: datetime.strptime(value, "%Y-%m-%d").date(),
+                        default=None, help="Date for time-only timestamps (default: file modified date)")
+    parser.add_argument("--max-rate", type=float, default=None, help="Cap on rows loaded per second")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    for path in args.paths:
+        try:
+            stats = ingest_file(path, args.db, args.format, args.batch_size, args.follow,
+                                args.date, args.max_rate)
+        except KeyboardInterrupt:
+            print("\n🛑 Log upload stopped by user")
+            break
+        print(f"✅ {path}: {stats['inserted']:,} rows loaded | "
+              f"{stats['duplicates'] + stats['already_loaded']:,} duplicates | "
+              f"{stats['rejected']:,} rejected | {stats['rows_per_second']:,.0f} rows/s")
+
+if __name__ == "__main__":
+    main()